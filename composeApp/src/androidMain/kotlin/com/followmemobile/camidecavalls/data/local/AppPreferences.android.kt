@@ -28,8 +28,17 @@ actual class AppPreferences(context: Context) {
         prefs.edit().putInt(KEY_POI_VERSION, version).apply()
     }
 
+    actual fun getDataHash(dataSet: String): String? {
+        return prefs.getString(KEY_DATA_HASH_PREFIX + dataSet, null)
+    }
+
+    actual fun setDataHash(dataSet: String, hash: String) {
+        prefs.edit().putString(KEY_DATA_HASH_PREFIX + dataSet, hash).apply()
+    }
+
     companion object {
         private const val KEY_DATABASE_VERSION = "database_version"
         private const val KEY_POI_VERSION = "poi_version"
+        private const val KEY_DATA_HASH_PREFIX = "data_hash_"
     }
 }
@@ -0,0 +1,14 @@
+package com.followmemobile.camidecavalls.data
+
+/**
+ * Content hashes of the bundled data sets.
+ *
+ * GENERATED by scripts/generate_data_versions.py - do not edit by hand.
+ * The app stores the hashes it last seeded with and only re-seeds the tables
+ * whose data changed.
+ */
+object DataVersions {
+    const val ROUTES_GEOMETRY = "e49450aebe73e608"
+    const val ROUTES_TEXT = "0cfcce25c00aa5dd"
+    const val POIS = "3409896378e90a13"
+}
@@ -25,4 +25,15 @@ expect class AppPreferences {
      * Set the POI data version.
      */
     fun setPOIVersion(version: Int)
+
+    /**
+     * Get the content hash of a data set at the time it was last seeded.
+     * @return The stored hash, or null if not set
+     */
+    fun getDataHash(dataSet: String): String?
+
+    /**
+     * Set the content hash of a seeded data set.
+     */
+    fun setDataHash(dataSet: String, hash: String)
 }
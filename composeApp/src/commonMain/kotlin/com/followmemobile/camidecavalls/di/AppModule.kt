@@ -152,7 +152,7 @@ val appModule = module {
     factoryOf(::NotebookScreenModel)
     factory { params -> SessionDetailScreenModel(params.get(), get(), get()) }
     factoryOf(::SettingsScreenModel)
-    factory { params -> RouteDetailScreenModel(params.get(), get(), get(), get()) }
+    factory { params -> RouteDetailScreenModel(params.get(), get(), get()) }
     factory { params ->
         TrackingScreenModel(
             trackingManager = get(),
@@ -1,6 +1,7 @@
 package com.followmemobile.camidecavalls.domain.usecase.poi
 
 import camidecavalls.composeapp.generated.resources.Res
+import com.followmemobile.camidecavalls.data.DataVersions
 import com.followmemobile.camidecavalls.data.local.AppPreferences
 import com.followmemobile.camidecavalls.domain.model.POIType
 import com.followmemobile.camidecavalls.domain.model.PointOfInterest
@@ -12,6 +13,7 @@ import org.jetbrains.compose.resources.ExperimentalResourceApi
 
 /**
  * Use case to initialize POIs from JSON file on first app launch
+ * or when the bundled pois.json changes (see [DataVersions.POIS]).
  */
 class InitializePOIsUseCase(
     private val poiRepository: POIRepository,
@@ -23,7 +25,7 @@ class InitializePOIsUseCase(
         val currentPoiVersion = appPreferences.getPOIVersion()
 
         // Check if we need to initialize or update POI data
-        if (currentPoiVersion < POI_VERSION) {
+        if (currentPoiVersion < POI_VERSION || appPreferences.getDataHash(POIS_DATA_SET) != DataVersions.POIS) {
             // Load POI data from JSON file
             val jsonBytes = Res.readBytes("files/pois.json")
             val jsonString = jsonBytes.decodeToString()
@@ -32,6 +34,7 @@ class InitializePOIsUseCase(
             // Save to database (will replace existing data)
             savePOIsUseCase(poiData)
             appPreferences.setPOIVersion(POI_VERSION)
+            appPreferences.setDataHash(POIS_DATA_SET, DataVersions.POIS)
             return true
         }
 
@@ -80,6 +83,7 @@ class InitializePOIsUseCase(
 
     companion object {
         private const val POI_VERSION = 3  // Updated: fixed coordinates from official map
+        private const val POIS_DATA_SET = "pois"
     }
 }
 
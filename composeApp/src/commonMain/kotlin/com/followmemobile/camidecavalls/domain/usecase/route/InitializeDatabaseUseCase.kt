@@ -1,13 +1,15 @@
 package com.followmemobile.camidecavalls.domain.usecase.route
 
+import com.followmemobile.camidecavalls.data.DataVersions
 import com.followmemobile.camidecavalls.data.RouteData
 import com.followmemobile.camidecavalls.data.local.AppPreferences
 import com.followmemobile.camidecavalls.domain.repository.RouteRepository
 import kotlinx.coroutines.flow.first
 
 /**
- * Use case to initialize the database with route data on first app launch
- * or when the database version changes.
+ * Use case to initialize the database with route data on first app launch,
+ * when the database version changes, or when the bundled route data changes
+ * (detected through the content hashes in [DataVersions]).
  */
 class InitializeDatabaseUseCase(
     private val routeRepository: RouteRepository,
@@ -20,6 +22,7 @@ class InitializeDatabaseUseCase(
      */
     suspend operator fun invoke(): Boolean {
         val currentDbVersion = appPreferences.getDatabaseVersion()
+        val routesHash = "${DataVersions.ROUTES_GEOMETRY}-${DataVersions.ROUTES_TEXT}"
 
         // If database version changed (migration needed), recreate the route table FIRST
         if (currentDbVersion > 0 && currentDbVersion < DATABASE_VERSION) {
@@ -27,6 +30,7 @@ class InitializeDatabaseUseCase(
             // Re-seed database with updated route data
             saveRoutesUseCase(RouteData.routes)
             appPreferences.setDatabaseVersion(DATABASE_VERSION)
+            appPreferences.setDataHash(ROUTES_DATA_SET, routesHash)
             return true
         }
 
@@ -35,6 +39,14 @@ class InitializeDatabaseUseCase(
             // New database - SQLDelight will create tables automatically
             saveRoutesUseCase(RouteData.routes)
             appPreferences.setDatabaseVersion(DATABASE_VERSION)
+            appPreferences.setDataHash(ROUTES_DATA_SET, routesHash)
+            return true
+        }
+
+        // Route data changed since the last seed - replace the rows, the table itself is unchanged
+        if (appPreferences.getDataHash(ROUTES_DATA_SET) != routesHash) {
+            saveRoutesUseCase(RouteData.routes)
+            appPreferences.setDataHash(ROUTES_DATA_SET, routesHash)
             return true
         }
 
@@ -50,7 +62,8 @@ class InitializeDatabaseUseCase(
     }
 
     companion object {
-        // Increment this version when RouteData changes to force re-seed
+        // Increment this version when the route table needs to be recreated.
+        // Plain RouteData changes are picked up through DataVersions (scripts/generate_data_versions.py).
         // Version 8: Fixed Route 11 duplicate coordinate issue
         // Version 9: Reordered Route 11 coordinates to fix 7.7km jump (start/end were swapped)
         // Version 10: Added multilingual route descriptions (CA, ES, EN, DE, FR, IT)
@@ -78,5 +91,7 @@ class InitializeDatabaseUseCase(
         // Version 32: Complete elevation profile update for all 20 routes from official camidecavalls.com images
         // Version 33: Added name field to TrackingSessionEntity for session naming in notebook
         private const val DATABASE_VERSION = 33
+
+        private const val ROUTES_DATA_SET = "routes"
     }
 }
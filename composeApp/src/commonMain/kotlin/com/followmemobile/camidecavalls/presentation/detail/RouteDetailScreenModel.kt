@@ -2,30 +2,28 @@ package com.followmemobile.camidecavalls.presentation.detail
 
 import cafe.adriel.voyager.core.model.ScreenModel
 import cafe.adriel.voyager.core.model.screenModelScope
+import camidecavalls.composeapp.generated.resources.Res
 import com.followmemobile.camidecavalls.domain.model.Difficulty
 import com.followmemobile.camidecavalls.domain.model.Route
 import com.followmemobile.camidecavalls.domain.repository.LanguageRepository
-import com.followmemobile.camidecavalls.domain.usecase.route.GetAllRoutesUseCase
 import com.followmemobile.camidecavalls.domain.usecase.route.GetRouteByIdUseCase
 import com.followmemobile.camidecavalls.domain.util.LocalizedStrings
 import kotlinx.coroutines.flow.MutableStateFlow
 import kotlinx.coroutines.flow.StateFlow
 import kotlinx.coroutines.flow.asStateFlow
-import kotlinx.coroutines.flow.first
 import kotlinx.coroutines.launch
+import kotlinx.serialization.Serializable
 import kotlinx.serialization.json.Json
-import kotlinx.serialization.json.jsonArray
-import kotlinx.serialization.json.jsonObject
+import org.jetbrains.compose.resources.ExperimentalResourceApi
 
 /**
  * ScreenModel for the Route Detail screen.
  * Displays detailed information about a specific route.
- * For routeId=0, builds a "Complete Route" from all 20 routes.
+ * For routeId=0, loads the "Complete Route" generated from all 20 routes.
  */
 class RouteDetailScreenModel(
     private val routeId: Int,
     private val getRouteByIdUseCase: GetRouteByIdUseCase,
-    private val getAllRoutesUseCase: GetAllRoutesUseCase,
     private val languageRepository: LanguageRepository
 ) : ScreenModel {
 
@@ -44,52 +42,12 @@ class RouteDetailScreenModel(
             val strings = LocalizedStrings(currentLanguage)
 
             if (routeId == 0) {
-                // Build complete route from all routes
-                val allRoutes = getAllRoutesUseCase().first()
-                if (allRoutes.isNotEmpty()) {
-                    // Combine GPX data from all routes
-                    val combinedGpx = combineGeoJsonLineStrings(allRoutes)
-
-                    // Weighted asphalt percentage by distance
-                    val totalDist = allRoutes.sumOf { it.distanceKm }
-                    val weightedAsphalt = if (totalDist > 0) {
-                        (allRoutes.sumOf { it.asphaltPercentage * it.distanceKm } / totalDist).toInt()
-                    } else 0
-
-                    // Localized about descriptions
-                    val caStrings = LocalizedStrings("ca")
-                    val esStrings = LocalizedStrings("es")
-                    val enStrings = LocalizedStrings("en")
-                    val deStrings = LocalizedStrings("de")
-                    val frStrings = LocalizedStrings("fr")
-                    val itStrings = LocalizedStrings("it")
-
-                    val completeRoute = Route(
-                        id = 0,
-                        number = 0,
-                        name = strings.completeRouteName,
-                        startPoint = "Maó",
-                        endPoint = "Maó",
-                        distanceKm = 185.0,
-                        elevationGainMeters = allRoutes.sumOf { it.elevationGainMeters },
-                        elevationLossMeters = allRoutes.sumOf { it.elevationLossMeters },
-                        maxAltitudeMeters = allRoutes.maxOf { it.maxAltitudeMeters },
-                        minAltitudeMeters = allRoutes.minOf { it.minAltitudeMeters },
-                        asphaltPercentage = weightedAsphalt,
-                        difficulty = Difficulty.HIGH,
-                        estimatedDurationMinutes = allRoutes.sumOf { it.estimatedDurationMinutes },
-                        description = enStrings.aboutDescription,
-                        gpxData = combinedGpx,
-                        descriptionCa = caStrings.aboutDescription,
-                        descriptionEs = esStrings.aboutDescription,
-                        descriptionEn = enStrings.aboutDescription,
-                        descriptionDe = deStrings.aboutDescription,
-                        descriptionFr = frStrings.aboutDescription,
-                        descriptionIt = itStrings.aboutDescription
-                    )
-                    _uiState.value = RouteDetailUiState.Success(completeRoute, currentLanguage, strings)
+                // Complete route, built from all routes at build time (scripts/generate_complete_route.py)
+                val completeRoute = loadCompleteRoute(strings)
+                _uiState.value = if (completeRoute != null) {
+                    RouteDetailUiState.Success(completeRoute, currentLanguage, strings)
                 } else {
-                    _uiState.value = RouteDetailUiState.Error("Route not found")
+                    RouteDetailUiState.Error("Route not found")
                 }
             } else {
                 val route = getRouteByIdUseCase(routeId)
@@ -103,25 +61,49 @@ class RouteDetailScreenModel(
     }
 
     /**
-     * Combine GeoJSON LineString coordinates from all routes into a single GeoJSON LineString.
+     * Load the complete route from files/complete_route.json: the 20 routes joined in order,
+     * with the aggregated fields and the measured length of the joined line.
      */
-    private fun combineGeoJsonLineStrings(routes: List<Route>): String? {
-        val allCoordinates = mutableListOf<String>()
-        // Sort routes by number to get correct order
-        for (route in routes.sortedBy { it.number }) {
-            val gpx = route.gpxData ?: continue
-            try {
-                val json = Json.parseToJsonElement(gpx).jsonObject
-                val coords = json["coordinates"]?.jsonArray ?: continue
-                for (coord in coords) {
-                    allCoordinates.add(coord.toString())
-                }
-            } catch (_: Exception) {
-                // Skip malformed GeoJSON
-            }
+    @OptIn(ExperimentalResourceApi::class)
+    private suspend fun loadCompleteRoute(strings: LocalizedStrings): Route? {
+        val completeRoute = try {
+            val json = Json { ignoreUnknownKeys = true }
+            json.decodeFromString<CompleteRouteJson>(Res.readBytes("files/complete_route.json").decodeToString())
+        } catch (_: Exception) {
+            return null
         }
-        if (allCoordinates.isEmpty()) return null
-        return """{"type":"LineString","coordinates":[${allCoordinates.joinToString(",")}]}"""
+
+        // Localized about descriptions
+        val caStrings = LocalizedStrings("ca")
+        val esStrings = LocalizedStrings("es")
+        val enStrings = LocalizedStrings("en")
+        val deStrings = LocalizedStrings("de")
+        val frStrings = LocalizedStrings("fr")
+        val itStrings = LocalizedStrings("it")
+
+        return Route(
+            id = 0,
+            number = 0,
+            name = strings.completeRouteName,
+            startPoint = completeRoute.startPoint,
+            endPoint = completeRoute.endPoint,
+            distanceKm = completeRoute.distanceKm,
+            elevationGainMeters = completeRoute.elevationGainMeters,
+            elevationLossMeters = completeRoute.elevationLossMeters,
+            maxAltitudeMeters = completeRoute.maxAltitudeMeters,
+            minAltitudeMeters = completeRoute.minAltitudeMeters,
+            asphaltPercentage = completeRoute.asphaltPercentage,
+            difficulty = Difficulty.HIGH,
+            estimatedDurationMinutes = completeRoute.estimatedDurationMinutes,
+            description = enStrings.aboutDescription,
+            gpxData = completeRoute.gpxData,
+            descriptionCa = caStrings.aboutDescription,
+            descriptionEs = esStrings.aboutDescription,
+            descriptionEn = enStrings.aboutDescription,
+            descriptionDe = deStrings.aboutDescription,
+            descriptionFr = frStrings.aboutDescription,
+            descriptionIt = itStrings.aboutDescription
+        )
     }
 
     private fun observeLanguageChanges() {
@@ -149,3 +131,20 @@ sealed interface RouteDetailUiState {
     ) : RouteDetailUiState
     data class Error(val message: String) : RouteDetailUiState
 }
+
+/**
+ * The Route fields of files/complete_route.json (written by scripts/generate_complete_route.py).
+ */
+@Serializable
+private data class CompleteRouteJson(
+    val startPoint: String,
+    val endPoint: String,
+    val distanceKm: Double,
+    val elevationGainMeters: Int,
+    val elevationLossMeters: Int,
+    val maxAltitudeMeters: Int,
+    val minAltitudeMeters: Int,
+    val asphaltPercentage: Int,
+    val estimatedDurationMinutes: Int,
+    val gpxData: String
+)
@@ -24,8 +24,17 @@ actual class AppPreferences {
         defaults.setInteger(version.toLong(), KEY_POI_VERSION)
     }
 
+    actual fun getDataHash(dataSet: String): String? {
+        return defaults.stringForKey(KEY_DATA_HASH_PREFIX + dataSet)
+    }
+
+    actual fun setDataHash(dataSet: String, hash: String) {
+        defaults.setObject(hash, KEY_DATA_HASH_PREFIX + dataSet)
+    }
+
     companion object {
         private const val KEY_DATABASE_VERSION = "database_version"
         private const val KEY_POI_VERSION = "poi_version"
+        private const val KEY_DATA_HASH_PREFIX = "data_hash_"
     }
 }
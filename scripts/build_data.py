@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Incremental build of the app data: runs the data scripts in dependency order.
+
+Usage:
+    python3 build_data.py [STEP ...] [--jobs N] [--force] [--remote] [--skip STEP ...] [--dry-run]
+    python3 build_data.py --list
+
+Every step declares the files it reads and writes (glob patterns relative to
+the project root); the scripts' own modules are inputs as well, found by
+walking the imports of the step script (local_modules). A step depends on
+the earlier steps that write one of its inputs or one of its outputs, which
+gives the graph:
+
+    extract_routes (remote) -> route_descriptions -> validate, data_versions,
+          |                                  route_stats, complete_route, hiking_times, elevation_series,
+          |                                  elevation_grid, mbtiles, flatgeobuf, seed_database, polylines,
+          |                                  trail_positions
+          +-> test_gpx -> emulator_gpx, simulator_gpx
+    poi_coordinates (remote) -> fix_pois -> data_versions, mbtiles, flatgeobuf, seed_database,
+                                            poi_search, trail_positions
+
+A step runs only when it is stale: it never ran, its script or one of its
+inputs changed (SHA-256 fingerprints, cached by size and mtime), or one of
+its outputs is missing or was modified since. Independent steps run in
+parallel (--jobs). With STEP arguments only those steps and the steps they
+depend on are considered.
+
+Remote steps (the scrapers and extract_routes, which downloads the profile
+images and needs Pillow) are skipped unless named or --remote is given; their
+outputs are then used as they are, so a default build works offline. --skip
+treats a step as up to date.
+
+The declared outputs of a step are backed up before it runs and restored if
+it fails, so a failed step never leaves half-written outputs behind;
+the scripts themselves also write through trail_data.atomic_write.
+
+Derived data the app does not bundle yet is written to scripts/generated/
+(gitignored); only pois.json, complete_route.json and poi_search_index.json
+go to the app resources.
+The fingerprints are kept in scripts/.build_state.json.
+"""
+
+import os
+import ast
+import sys
+import glob
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import trail_data
+
+STATE_PATH = os.path.join(trail_data.SCRIPTS_DIR, ".build_state.json")
+
+ROUTE_DATA = os.path.relpath(trail_data.ROUTE_DATA_PATH, trail_data.PROJECT_DIR)
+DATA_VERSIONS = "composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/data/DataVersions.kt"
+APP_FILES = os.path.relpath(trail_data.APP_FILES_DIR, trail_data.PROJECT_DIR)
+GENERATED = os.path.relpath(trail_data.GENERATED_DIR, trail_data.PROJECT_DIR)
+APP_POIS = f"{APP_FILES}/pois.json"
+POIS_DIR = "scripts/camidecavalls_pois"
+POIS = f"{POIS_DIR}/pois_all_translations_complete.json"
+
+
+def local_modules(script: str) -> list:
+    """The modules next to `script` it imports, directly or through each other (paths relative to the project root)."""
+    directory = os.path.dirname(script)
+    found, pending = set(), [script]
+    while pending:
+        with open(os.path.join(trail_data.PROJECT_DIR, pending.pop()), 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = f"{directory}/{name.split('.')[0]}.py"
+                if path not in found and path != script and \
+                        os.path.isfile(os.path.join(trail_data.PROJECT_DIR, path)):
+                    found.add(path)
+                    pending.append(path)
+    return sorted(found)
+
+
+class Step:
+    """A script invocation with its declared inputs and outputs; the modules it imports are inputs too."""
+
+    def __init__(self, name: str, script: str, args: list = None, inputs: list = None,
+                 outputs: list = None, remote: bool = False):
+        self.name = name
+        self.script = script
+        self.args = args or []
+        self.declared_inputs = [script] + (inputs or [])
+        self.outputs = outputs or []
+        self.remote = remote
+        self.dependencies = set()
+        self._modules = None
+
+    @property
+    def inputs(self) -> list:
+        """The declared inputs and the modules of the script, walked on first use (not at import)."""
+        if self._modules is None:
+            self._modules = local_modules(self.script)
+        return self.declared_inputs[:1] + self._modules + self.declared_inputs[1:]
+
+
+STEPS = [
+    # Downloads the profile images and decodes them with Pillow: remote, like the scrapers
+    Step("extract_routes", "scripts/extract_all_routes.py", ["all", "--update"], remote=True,
+         inputs=["scripts/trails.json", "scripts/perfil*d.png"],
+         outputs=[ROUTE_DATA, DATA_VERSIONS, "scripts/route*_profile.json"]),
+    Step("route_descriptions", "scripts/update_route_descriptions.py",
+         inputs=[f"{POIS_DIR}/routes_descriptions_complete.json", ROUTE_DATA],
+         outputs=[ROUTE_DATA, DATA_VERSIONS]),
+    Step("validate", "scripts/validate_route_data.py",
+         inputs=[ROUTE_DATA]),
+    Step("test_gpx", "scripts/update_test_gpx.py",
+         inputs=["scripts/route*_profile.json"],
+         outputs=["test-routes/android/route_*.gpx", "test-routes/ios/route_*.gpx"]),
+    Step("emulator_gpx", "test-routes/convert_gpx_for_emulator.py",
+         inputs=["test-routes/android/route_*.gpx"],
+         outputs=["test-routes/android/emulator/route_*_emulator.gpx"]),
+    Step("simulator_gpx", "test-routes/convert_gpx_for_ios.py",
+         inputs=["test-routes/ios/route_*.gpx"],
+         outputs=["test-routes/ios/simulator/route_*_simulator.gpx"]),
+    Step("poi_coordinates", "scripts/scrape_poi_coordinates.py", remote=True,
+         outputs=[f"{POIS_DIR}/coordinates_from_map.json"]),
+    Step("fix_pois", "scripts/fix_poi_coordinates.py",
+         inputs=[f"{POIS_DIR}/coordinates_from_map.json", POIS],
+         outputs=[POIS, APP_POIS]),
+    Step("data_versions", "scripts/generate_data_versions.py",
+         inputs=[ROUTE_DATA, APP_POIS],
+         outputs=[DATA_VERSIONS]),
+    Step("route_stats", "scripts/generate_route_stats.py",
+         inputs=[ROUTE_DATA],
+         outputs=[f"{GENERATED}/route_stats.json"]),
+    Step("complete_route", "scripts/generate_complete_route.py",
+         inputs=[ROUTE_DATA],
+         outputs=[f"{APP_FILES}/complete_route.json"]),
+    Step("hiking_times", "scripts/hiking_times.py",
+         inputs=[ROUTE_DATA],
+         outputs=[f"{GENERATED}/hiking_times.json"]),
+    Step("elevation_series", "scripts/elevation_series.py",
+         inputs=[ROUTE_DATA],
+         outputs=[f"{GENERATED}/elevation_series.json"]),
+    Step("elevation_grid", "scripts/elevation_grid.py", ["build"],
+         inputs=[ROUTE_DATA],
+         outputs=[f"{GENERATED}/elevation_grid.bin"]),
+    Step("mbtiles", "scripts/generate_mbtiles.py",
+         inputs=[ROUTE_DATA, POIS],
+         outputs=[f"{GENERATED}/camidecavalls.mbtiles"]),
+    Step("flatgeobuf", "scripts/export_flatgeobuf.py", ["export"],
+         inputs=[ROUTE_DATA, POIS],
+         outputs=[f"{GENERATED}/stages.fgb", f"{GENERATED}/pois.fgb"]),
+    Step("seed_database", "scripts/build_seed_database.py",
+         inputs=[ROUTE_DATA, APP_POIS,
+                 "composeApp/src/commonMain/sqldelight/**/*.sq",
+                 "composeApp/src/commonMain/sqldelight/migrations/*.sqm"],
+         outputs=[f"{GENERATED}/cami_seed.db"]),
+    Step("polylines", "scripts/polyline_codec.py", ["export"],
+         inputs=[ROUTE_DATA],
+         outputs=[f"{GENERATED}/route_polylines.json"]),
+    Step("poi_search", "scripts/poi_search_index.py", ["build"],
+         inputs=[POIS],
+         outputs=[f"{APP_FILES}/poi_search_index.json"]),
+    Step("trail_positions", "scripts/trail_positions.py", ["build"],
+         inputs=[ROUTE_DATA, APP_POIS],
+         outputs=[f"{GENERATED}/trail_positions.json"]),
+]
+
+
+def resolve_dependencies(steps: list):
+    """A step depends on every earlier step that writes one of its inputs or outputs."""
+    for i, step in enumerate(steps):
+        for earlier in steps[:i]:
+            if set(earlier.outputs) & (set(step.inputs) | set(step.outputs)):
+                step.dependencies.add(earlier.name)
+
+
+def expand(patterns: list) -> list:
+    """Existing files matching the patterns (relative to the project root), sorted."""
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(trail_data.PROJECT_DIR, pattern), recursive=True):
+            if os.path.isfile(path):
+                files.add(os.path.relpath(path, trail_data.PROJECT_DIR))
+    return sorted(files)
+
+
+class Fingerprints:
+    """SHA-256 of files, cached by (size, mtime) across runs."""
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+
+    def file(self, path: str) -> str:
+        full_path = os.path.join(trail_data.PROJECT_DIR, path)
+        stat = os.stat(full_path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        cached = self.cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self.cache[path] = [key, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def files(self, patterns: list) -> dict:
+        return {path: self.file(path) for path in expand(patterns)}
+
+    def step_key(self, step: Step) -> str:
+        """One hash over the command line and every input file."""
+        digest = hashlib.sha256(json.dumps([step.script, step.args]).encode('utf-8'))
+        for path, file_hash in self.files(step.inputs).items():
+            digest.update(f"{path}:{file_hash}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def load_state() -> dict:
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"steps": {}, "files": {}}
+
+
+def stale_reason(step: Step, state: dict, fingerprints: Fingerprints):
+    """Why the step has to run, or None if it is up to date."""
+    record = state["steps"].get(step.name)
+    if record is None:
+        return "never built"
+    if record["key"] != fingerprints.step_key(step):
+        return "inputs changed"
+    outputs = fingerprints.files(step.outputs)
+    if step.outputs and not outputs:
+        return "outputs missing"
+    if outputs != record["outputs"]:
+        return "outputs modified"
+    return None
+
+
+def backup_outputs(step: Step) -> tuple:
+    """Copy the current outputs of a step aside; returns (backup dir, existing files)."""
+    backup_dir = tempfile.mkdtemp(prefix=f"build_{step.name}_")
+    existing = expand(step.outputs)
+    for path in existing:
+        target = os.path.join(backup_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(trail_data.PROJECT_DIR, path), target)
+    return backup_dir, existing
+
+
+def restore_outputs(step: Step, backup_dir: str, existing: list):
+    """Put back the outputs saved by backup_outputs and remove the ones the step created."""
+    for path in expand(step.outputs):
+        if path not in existing:
+            os.remove(os.path.join(trail_data.PROJECT_DIR, path))
+    for path in existing:
+        os.replace(os.path.join(backup_dir, path), os.path.join(trail_data.PROJECT_DIR, path))
+
+
+def run_step(step: Step) -> tuple:
+    """Run the step's script; returns (success, seconds, combined output)."""
+    backup_dir, existing = backup_outputs(step)
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.join(trail_data.PROJECT_DIR, step.script)] + step.args,
+            cwd=trail_data.PROJECT_DIR, capture_output=True, text=True, stdin=subprocess.DEVNULL,
+        )
+        success = result.returncode == 0
+        output = result.stdout + result.stderr
+        if success and step.outputs and not expand(step.outputs):
+            success = False
+            output += "\nNo declared output was written"
+        if not success:
+            restore_outputs(step, backup_dir, existing)
+        return success, time.perf_counter() - start, output
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+def select_steps(steps: list, targets: list) -> list:
+    """The targets and everything they depend on, in declaration order."""
+    if not targets:
+        return steps
+    by_name = {step.name: step for step in steps}
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name].dependencies)
+    return [step for step in steps if step.name in selected]
+
+
+def build(targets: list, jobs: int, force: bool, remote: bool, skip: list, dry_run: bool) -> bool:
+    resolve_dependencies(STEPS)
+    steps = select_steps(STEPS, targets)
+    state = load_state()
+    fingerprints = Fingerprints(state["files"])
+
+    done = set()
+    failed = set()
+    blocked = set()
+    running = {}
+    remaining = list(steps)
+    ran = 0
+
+    def save_state():
+        with open(STATE_PATH + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while remaining or running:
+            for step in list(remaining):
+                if step.dependencies & failed:
+                    print(f"[skip] {step.name}: a dependency failed")
+                    failed.add(step.name)
+                    blocked.add(step.name)
+                    remaining.remove(step)
+                    continue
+                if not step.dependencies <= done:
+                    continue
+                # Steps writing a file another running step writes or reads must wait
+                if any(set(step.outputs) & (set(other.inputs) | set(other.outputs)) or
+                       set(step.inputs) & set(other.outputs) for other in running.values()):
+                    continue
+                remaining.remove(step)
+
+                if step.name in skip or (step.remote and not remote and step.name not in targets):
+                    print(f"[skip] {step.name}")
+                    done.add(step.name)
+                    continue
+                reason = "forced" if force else stale_reason(step, state, fingerprints)
+                if reason is None:
+                    print(f"[ok]   {step.name}")
+                    done.add(step.name)
+                    continue
+                if dry_run:
+                    print(f"[run]  {step.name} ({reason})")
+                    done.add(step.name)
+                    continue
+
+                print(f"[run]  {step.name} ({reason})")
+                running[pool.submit(run_step, step)] = step
+
+            if not running:
+                if remaining:
+                    # Only reachable if the dependencies cannot be satisfied
+                    print(f"Cannot schedule: {', '.join(step.name for step in remaining)}")
+                    return False
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                success, elapsed, output = future.result()
+                ran += 1
+                if success:
+                    print(f"[done] {step.name} in {elapsed:.1f}s")
+                    state["steps"][step.name] = {
+                        "key": fingerprints.step_key(step),
+                        "outputs": fingerprints.files(step.outputs),
+                    }
+                    done.add(step.name)
+                else:
+                    print(f"[FAIL] {step.name} after {elapsed:.1f}s, outputs restored")
+                    print("\n".join("       " + line for line in output.rstrip().splitlines()[-20:]))
+                    failed.add(step.name)
+                save_state()
+
+    if not dry_run:
+        save_state()
+    print(f"\n{ran} steps run, {len(failed - blocked)} failed, {len(blocked)} not run")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental build of the app data")
+    parser.add_argument("targets", nargs="*", help="steps to build (default: all)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="parallel steps")
+    parser.add_argument("--force", action="store_true", help="run the selected steps even if up to date")
+    parser.add_argument("--remote", action="store_true", help="also run the scrapers")
+    parser.add_argument("--skip", nargs="+", default=[], metavar="STEP", help="treat steps as up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would run")
+    parser.add_argument("--list", action="store_true", help="list the steps and their dependencies")
+    args = parser.parse_args()
+
+    names = [step.name for step in STEPS]
+    unknown = [name for name in args.targets + args.skip if name not in names]
+    if unknown:
+        print(f"Unknown steps: {', '.join(unknown)} (available: {', '.join(names)})")
+        sys.exit(1)
+
+    if args.list:
+        resolve_dependencies(STEPS)
+        for step in STEPS:
+            after = ", ".join(sorted(step.dependencies)) or "-"
+            print(f"{step.name:<20} after: {after}{'  (remote)' if step.remote else ''}")
+        return
+
+    if not build(args.targets, args.jobs, args.force, args.remote, args.skip, args.dry_run):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
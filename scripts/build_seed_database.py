@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Build a ready-to-ship SQLite seed database with the SQLDelight schema.
+
+Usage:
+    python3 build_seed_database.py [--output PATH]
+
+The script:
+1. Reads the CREATE TABLE / CREATE INDEX statements from the SQLDelight .sq files
+2. Inserts the 20 stages from RouteData.kt and the POIs from files/pois.json
+3. Builds the indexes after the bulk insert, sets the schema version and VACUUMs
+
+The resulting file is meant to be copied into place on first launch (or when
+the data version changes) instead of parsing RouteData.kt and running
+thousands of inserts. Neither DatabaseDriverFactory does that yet, so it is
+written to scripts/generated/cami_seed.db, outside the app resources and under
+a name distinct from the app's live cami_database.db. The file is written
+atomically, so a failed build never replaces a previous good database.
+"""
+
+import os
+import re
+import sqlite3
+import argparse
+
+import trail_data
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "cami_seed.db")
+SCHEMA_DIR = os.path.join(trail_data.SQLDELIGHT_DIR, "com/followmemobile/camidecavalls/database")
+MIGRATIONS_DIR = os.path.join(trail_data.SQLDELIGHT_DIR, "migrations")
+
+
+def read_schema_statements(schema_dir: str = SCHEMA_DIR) -> tuple:
+    """Return the (CREATE TABLE, CREATE INDEX) statements declared in the .sq files."""
+    tables = []
+    indexes = []
+    for filename in sorted(os.listdir(schema_dir)):
+        if not filename.endswith(".sq"):
+            continue
+        with open(os.path.join(schema_dir, filename), 'r', encoding='utf-8') as f:
+            content = f.read()
+        content = re.sub(r'--[^\n]*', '', content)
+        for statement in content.split(';'):
+            statement = statement.strip()
+            if re.match(r'CREATE\s+TABLE', statement, re.IGNORECASE):
+                tables.append(statement)
+            elif re.match(r'CREATE\s+(UNIQUE\s+)?INDEX', statement, re.IGNORECASE):
+                indexes.append(statement)
+    return tables, indexes
+
+
+def schema_version(migrations_dir: str = MIGRATIONS_DIR) -> int:
+    """SQLDelight schema version: last migration number + 1."""
+    numbers = [int(name[:-4]) for name in os.listdir(migrations_dir)
+               if name.endswith(".sqm") and name[:-4].isdigit()]
+    return max(numbers, default=0) + 1
+
+
+def insert_rows(db: sqlite3.Connection, table: str, rows: list) -> int:
+    """Insert a list of dicts, using only the keys that are columns of the table."""
+    columns = [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+    values = [[row.get(column) for column in columns] for row in rows]
+    placeholders = ", ".join("?" for _ in columns)
+    db.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values)
+    return len(values)
+
+
+def route_rows(stages: list) -> list:
+    """Map the RouteData.kt stages to RouteEntity rows (same mapping as RouteRepositoryImpl)."""
+    rows = []
+    for stage in stages:
+        row = {key: stage.get(key) for key in (
+            "id", "number", "name", "startPoint", "endPoint", "distanceKm",
+            "elevationGainMeters", "elevationLossMeters", "maxAltitudeMeters",
+            "minAltitudeMeters", "asphaltPercentage", "difficulty", "estimatedDurationMinutes",
+            "description", "descriptionCa", "descriptionEs", "descriptionEn",
+            "descriptionDe", "descriptionFr", "descriptionIt", "gpxData",
+        )}
+        row["imageUrl"] = None
+        rows.append(row)
+    return rows
+
+
+def poi_rows(pois: list) -> list:
+    """Map the pois.json entries to PointOfInterestEntity rows (same mapping as InitializePOIsUseCase)."""
+    rows = []
+    for poi in pois:
+        row = {
+            "id": int(poi["id"]),
+            "type": poi["type"],
+            "latitude": poi["latitude"],
+            "longitude": poi["longitude"],
+            "imageUrl": poi["image_url"],
+            "routeId": None,
+            "isAdvertisement": 0,
+        }
+        for lang in trail_data.LANGUAGES:
+            suffix = lang.capitalize()
+            row[f"name{suffix}"] = poi["names"].get(lang, "")
+            row[f"description{suffix}"] = poi["descriptions"].get(lang, "")
+        rows.append(row)
+    return rows
+
+
+def build_database(path: str):
+    """Create, fill, index and compact the seed database."""
+    tables, indexes = read_schema_statements()
+    version = schema_version()
+    print(f"Schema: {len(tables)} tables, {len(indexes)} indexes, version {version}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.execute("PRAGMA page_size = 4096")
+    db.execute("PRAGMA journal_mode = DELETE")
+
+    for statement in tables:
+        db.execute(statement)
+
+    with db:
+        routes = insert_rows(db, "RouteEntity", route_rows(trail_data.load_stages()))
+        pois = insert_rows(db, "PointOfInterestEntity", poi_rows(trail_data.load_pois(trail_data.APP_POIS_PATH)))
+    print(f"Inserted {routes} routes and {pois} POIs")
+
+    # Building the indexes after the bulk insert is cheaper than updating them row by row
+    for statement in indexes:
+        db.execute(statement)
+    db.execute("ANALYZE")
+    db.execute(f"PRAGMA user_version = {version}")
+    db.commit()
+    db.execute("VACUUM")
+
+    result = db.execute("PRAGMA integrity_check").fetchone()[0]
+    db.close()
+    if result != "ok":
+        os.remove(tmp_path)
+        raise RuntimeError(f"Integrity check failed: {result}")
+
+    os.replace(tmp_path, path)
+    print(f"Saved to {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the prebuilt SQLite seed database")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    build_database(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the data scripts.
+
+Usage:
+    camidecavalls-data <group> <command> [ARGS ...]
+    camidecavalls-data check-imports [--budget-ms 20] [--command-budget-ms 150]
+    python3 cli.py ...   (same, without installing)
+
+Install (editable, the scripts resolve the project paths from their own location):
+    pip install -e scripts
+    pip install -e 'scripts[profiles]'   # with Pillow, for `profiles extract`
+
+The command table below only names modules: a command's script (and what it
+imports: Pillow, sqlite3, urllib, ...) is imported when that command runs, so
+the entry point and `--help` start without any of it. ARGS are passed to the
+script's own argument parsing unchanged, --profile included (profiling.py).
+
+check-imports measures the import time of the entry point and of every
+command module in fresh interpreters (`python -X importtime`, best of 5) and
+exits 1 if one is over budget or if a module imports Pillow at module level,
+or the entry point imports anything from STARTUP_EXCLUDED. tests/test_cli.py
+runs it with the default budgets (`python3 -m pytest` in scripts/).
+"""
+
+import os
+import sys
+import importlib
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_ROUTES_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), "test-routes")
+
+PROG = "camidecavalls-data"
+
+# group -> command -> (module, function, description)
+COMMANDS = {
+    "profiles": {
+        "extract": ("extract_all_routes", "main", "Extract elevation profiles from the website images"),
+        "dem": ("dem_elevation", "main", "Sample stage elevations from a local DEM"),
+    },
+    "gpx": {
+        "update": ("update_test_gpx", "main", "Update the test-routes GPX elevations from the profiles"),
+        "emulator": ("convert_gpx_for_emulator", "convert_all", "Convert the Android test routes for the emulator"),
+        "simulator": ("convert_gpx_for_ios", "main", "Convert the iOS test routes for the simulator"),
+        "match": ("match_sessions", "main", "Map-match recorded session GPX files to the stages"),
+        "store": ("track_store", "main", "Columnar store for recorded session tracks"),
+        "sessions": ("generate_sessions", "main", "Synthetic Notebook sessions database for performance tests"),
+    },
+    "pois": {
+        "coordinates": ("scrape_poi_coordinates", "main", "Scrape POI coordinates from the official map"),
+        "descriptions": ("scrape_poi_descriptions", "main", "Scrape multilingual POI descriptions"),
+        "fix": ("fix_poi_coordinates", "main", "Apply the map coordinates to the POI JSON"),
+        "search": ("poi_search_index", "main", "Multilingual full-text search index for the POIs"),
+    },
+    "routes": {
+        "descriptions": ("update_route_descriptions", "main", "Update the stage descriptions in RouteData.kt"),
+        "validate": ("validate_route_data", "main", "Integrity checks for the stage geometry"),
+        "diff": ("geometry_diff", "main", "Per-stage geometry diff between two data versions"),
+        "kml": ("import_kml", "main", "Streaming KML import of the stage geometry"),
+        "stats": ("generate_route_stats", "main", "Precompute stage statistics (route_stats.json)"),
+        "times": ("hiking_times", "main", "Slope-aware cumulative walking times (hiking_times.json)"),
+        "complete": ("generate_complete_route", "main", "Build the virtual Complete Route (complete_route.json)"),
+        "elevation": ("elevation_series", "main", "LTTB multi-level elevation-chart series"),
+        "grid": ("elevation_grid", "main", "Uniform-distance elevation grids for O(1) lookups"),
+        "polylines": ("polyline_codec", "main", "Encoded-polyline export of the stage coordinates"),
+        "positions": ("trail_positions", "main", "Along-trail km positions and distances of the POIs"),
+        "build": ("build_data", "main", "Incremental build of all the generated data"),
+    },
+    "feeds": {
+        "versions": ("generate_data_versions", "main", "Regenerate DataVersions.kt"),
+        "mbtiles": ("generate_mbtiles", "main", "Build the offline vector-tile pack"),
+        "flatgeobuf": ("export_flatgeobuf", "main", "FlatGeobuf export of the stages and POIs"),
+        "database": ("build_seed_database", "main", "Build the prepopulated SQLite database"),
+        "weather": ("weather_bundle", "main", "Batched forecasts, caching proxy and Open-Meteo stand-in"),
+        "patch": ("data_patch", "main", "Record-level delta patches between data versions"),
+    },
+}
+
+DEFAULT_BUDGET_MS = 20
+DEFAULT_COMMAND_BUDGET_MS = 150
+IMPORT_RUNS = 5
+# Optional third-party dependencies: never imported at module level
+OPTIONAL_DEPENDENCIES = ("PIL",)
+# Only loaded by the commands that use them, never by the entry point
+STARTUP_EXCLUDED = OPTIONAL_DEPENDENCIES + (
+    "trail_data", "profiling", "json", "re", "sqlite3", "urllib.request", "xml.etree.ElementTree",
+    "concurrent.futures", "subprocess", "argparse",
+)
+
+
+def print_usage(group: str = None):
+    groups = [group] if group else list(COMMANDS)
+    print(f"Usage: {PROG} <group> <command> [ARGS ...]")
+    if not group:
+        print(f"       {PROG} check-imports [--budget-ms {DEFAULT_BUDGET_MS}] "
+              f"[--command-budget-ms {DEFAULT_COMMAND_BUDGET_MS}]")
+    for name in groups:
+        print(f"\n{name}:")
+        for command, (_, _, description) in COMMANDS[name].items():
+            print(f"  {command:<14}{description}")
+    print(f"\n`{PROG} <group> <command> --help` shows the options of a command.")
+
+
+def run_command(group: str, command: str, argv: list):
+    """Import the command's module and run it with argv as its command line."""
+    module_name, function, _ = COMMANDS[group][command]
+    if TEST_ROUTES_DIR not in sys.path:
+        sys.path.append(TEST_ROUTES_DIR)
+    sys.argv = [f"{PROG} {group} {command}"] + argv
+    module = importlib.import_module(module_name)
+    from profiling import profiled_main
+    return profiled_main(getattr(module, function), name=module_name)
+
+
+def measure_import(module: str) -> tuple:
+    """Best-of-IMPORT_RUNS cumulative import time (ms) and the modules it imported."""
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SCRIPTS_DIR, TEST_ROUTES_DIR]))
+    best = None
+    imported = set()
+    for _ in range(IMPORT_RUNS):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, env=env, cwd=SCRIPTS_DIR)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+        for line in result.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            if not line.startswith("import time:") or line.endswith("imported package"):
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            imported.add(name.strip())
+            if name.rstrip() == f" {module}":
+                milliseconds = int(cumulative) / 1000
+                best = milliseconds if best is None else min(best, milliseconds)
+    return best, imported
+
+
+def check_imports(budget_ms: float, command_budget_ms: float) -> bool:
+    modules = [("cli", budget_ms, STARTUP_EXCLUDED)]
+    modules += [(module, command_budget_ms, OPTIONAL_DEPENDENCIES)
+                for commands in COMMANDS.values() for module, _, _ in commands.values()]
+
+    print(f"{'module':<28}{'import ms':>10}{'budget':>8}  problems")
+    ok = True
+    for module, budget, excluded in modules:
+        milliseconds, imported = measure_import(module)
+        problems = [f"imports {name}" for name in excluded if name in imported]
+        if milliseconds > budget:
+            problems.insert(0, "over budget")
+        ok = ok and not problems
+        print(f"{module:<28}{milliseconds:>10.1f}{budget:>8.0f}  {', '.join(problems) or 'ok'}")
+    return ok
+
+
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print_usage()
+        return
+
+    if argv[0] == "check-imports":
+        import argparse
+        parser = argparse.ArgumentParser(prog=f"{PROG} check-imports",
+                                         description="Enforce the import-time budget of the entry point and commands")
+        parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+        parser.add_argument("--command-budget-ms", type=float, default=DEFAULT_COMMAND_BUDGET_MS)
+        args = parser.parse_args(argv[1:])
+        if not check_imports(args.budget_ms, args.command_budget_ms):
+            sys.exit(1)
+        return
+
+    group = argv[0]
+    if group not in COMMANDS:
+        print(f"Unknown group: {group}\n")
+        print_usage()
+        sys.exit(2)
+    if len(argv) < 2 or argv[1] in ("-h", "--help"):
+        print_usage(group)
+        return
+    if argv[1] not in COMMANDS[group]:
+        print(f"Unknown command: {group} {argv[1]}\n")
+        print_usage(group)
+        sys.exit(2)
+    return run_command(group, argv[1], argv[2:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Record-level binary delta patches between two versions of the bundled data.
+
+Usage:
+    python3 data_patch.py diff <base> <target> [--output PATCH]
+    python3 data_patch.py apply <base> <patch> [--output SNAPSHOT]   # writes a snapshot, not the app files
+    python3 data_patch.py snapshot <version> [--output SNAPSHOT]
+
+Patches and snapshots go to scripts/generated/ (gitignored) unless --output
+is given.
+
+A version is the pair RouteData.kt + files/pois.json, given as:
+- worktree: the files in this checkout
+- a git revision (HEAD~3, a tag, a commit hash)
+- a directory containing RouteData.kt and pois.json
+- a snapshot JSON written by `snapshot` or `apply`
+
+diff compares the versions record by record: POIs by id, routes by number
+(changed fields only, nested dicts like names/descriptions per language),
+and route coordinates by index range (difflib opcodes; when only elevations
+changed, just the changed elevation runs). The ordered operations are stored
+compressed in a small binary container:
+
+    magic "CDCP" | format u8 | SHA-256 of base | SHA-256 of target |
+    DataVersions of target (3 x 8 bytes) | payload length u32 |
+    CRC-32 of payload u32 | zlib(JSON operations)
+
+Patches work on the snapshot format, not on the files: a version is reduced
+to its records (routes by number without the gpxData text, POIs by id), so
+the POI order and the formatting of RouteData.kt/pois.json are not part of
+it, and apply writes a snapshot JSON. The SHA-256 hashes are over the
+canonical JSON of the whole snapshot (sorted keys). apply refuses a patch
+whose base hash or CRC does not match, and checks that the result hashes to
+the target, so a patch either reproduces the target snapshot exactly or
+fails. The header also carries the target's ROUTES_GEOMETRY, ROUTES_TEXT and
+POIS hashes as in DataVersions.kt (generate_data_versions.compute_hashes,
+which only depends on the records), and apply checks the result against
+them: they are the values the app compares with the data it last seeded.
+"""
+
+import os
+import sys
+import json
+import zlib
+import struct
+import difflib
+import hashlib
+import argparse
+import subprocess
+
+import trail_data
+from generate_data_versions import compute_hashes, HASH_LENGTH
+
+MAGIC = b"CDCP"
+FORMAT_VERSION = 2
+# DataVersions.kt constants carried in the header, in this order
+DATA_VERSION_NAMES = ("ROUTES_GEOMETRY", "ROUTES_TEXT", "POIS")
+HEADER = struct.Struct(f"<4sB32s32s{len(DATA_VERSION_NAMES) * HASH_LENGTH // 2}sII")
+# Unchanged elevations shorter than this between two changed runs are re-sent instead of splitting the run
+ELEVATION_GAP = 8
+DEFAULT_PATCH = os.path.join(trail_data.GENERATED_DIR, "data.patch")
+DEFAULT_SNAPSHOT = os.path.join(trail_data.GENERATED_DIR, "snapshot.json")
+
+
+# --- Versions ----------------------------------------------------------------
+
+def build_snapshot(route_data: str, pois_json: str) -> dict:
+    """The canonical content of a version: routes by number, POIs by id."""
+    stages = trail_data.parse_stages(route_data)
+    return {
+        "routes": {str(stage["number"]): {k: v for k, v in stage.items() if k != "gpxData"} for stage in stages},
+        "pois": {poi["id"]: poi for poi in json.loads(pois_json)},
+    }
+
+
+def canonical(snapshot: dict) -> bytes:
+    return json.dumps(snapshot, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def snapshot_hash(snapshot: dict) -> bytes:
+    return hashlib.sha256(canonical(snapshot)).digest()
+
+
+def data_versions(snapshot: dict) -> dict:
+    """{DataVersions.kt constant: hash} of a snapshot, as generate_data_versions.py computes them."""
+    stages = [snapshot["routes"][number] for number in sorted(snapshot["routes"], key=int)]
+    return compute_hashes(stages, list(snapshot["pois"].values()))
+
+
+def load_version(spec: str) -> dict:
+    """Snapshot of a version spec (see the module docstring)."""
+    if spec == "worktree":
+        paths = (trail_data.ROUTE_DATA_PATH, trail_data.APP_POIS_PATH)
+    elif os.path.isdir(spec):
+        paths = (os.path.join(spec, "RouteData.kt"), os.path.join(spec, "pois.json"))
+    elif os.path.isfile(spec):
+        with open(spec, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    else:
+        contents = []
+        for path in (trail_data.ROUTE_DATA_PATH, trail_data.APP_POIS_PATH):
+            relative = os.path.relpath(path, trail_data.PROJECT_DIR)
+            result = subprocess.run(["git", "show", f"{spec}:{relative}"], cwd=trail_data.PROJECT_DIR,
+                                    capture_output=True)
+            if result.returncode != 0:
+                raise ValueError(f"{spec}: {result.stderr.decode('utf-8', errors='replace').strip()}")
+            contents.append(result.stdout.decode('utf-8'))
+        return build_snapshot(*contents)
+
+    contents = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+    return build_snapshot(*contents)
+
+
+# --- Diff --------------------------------------------------------------------
+
+def diff_fields(base: dict, target: dict) -> dict:
+    """{field or "field/key": new value} for changed fields; None values mark deletions."""
+    changes = {}
+    for key in sorted(set(base) | set(target)):
+        old, new = base.get(key), target.get(key)
+        if old == new:
+            continue
+        if isinstance(old, dict) and isinstance(new, dict):
+            for sub in sorted(set(old) | set(new)):
+                if old.get(sub) != new.get(sub):
+                    changes[f"{key}/{sub}"] = new.get(sub)
+        else:
+            changes[key] = new
+    return changes
+
+
+def elevation_runs(base: list, target: list) -> list:
+    """[[start, [elevations]]] covering every changed elevation (same lon/lat at every index)."""
+    changed = [i for i, (a, b) in enumerate(zip(base, target)) if a[2:] != b[2:]]
+    runs = []
+    for i in changed:
+        if runs and i - runs[-1][1] <= ELEVATION_GAP:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return [[start, [c[2] for c in target[start:end + 1]]] for start, end in runs]
+
+
+def diff_coordinates(number: str, base: list, target: list) -> list:
+    if len(base) == len(target) and all(a[:2] == b[:2] for a, b in zip(base, target)):
+        runs = elevation_runs(base, target)
+        return [{"op": "route_elevations", "number": number, "runs": runs}] if runs else []
+
+    matcher = difflib.SequenceMatcher(None, [tuple(c) for c in base], [tuple(c) for c in target], autojunk=False)
+    edits = [[i1, i2 - i1, target[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+    return [{"op": "route_coordinates", "number": number, "edits": edits}] if edits else []
+
+
+def diff(base: dict, target: dict) -> list:
+    """Ordered operations turning `base` into `target`."""
+    operations = []
+    for poi_id in sorted(set(base["pois"]) | set(target["pois"]), key=int):
+        old, new = base["pois"].get(poi_id), target["pois"].get(poi_id)
+        if new is None:
+            operations.append({"op": "poi_delete", "id": poi_id})
+        elif old is None:
+            operations.append({"op": "poi_put", "id": poi_id, "value": new})
+        elif old != new:
+            operations.append({"op": "poi_set", "id": poi_id, "fields": diff_fields(old, new)})
+
+    for number in sorted(set(base["routes"]) | set(target["routes"]), key=int):
+        old, new = base["routes"].get(number), target["routes"].get(number)
+        if new is None:
+            operations.append({"op": "route_delete", "number": number})
+        elif old is None:
+            operations.append({"op": "route_put", "number": number, "value": new})
+        else:
+            fields = diff_fields({k: v for k, v in old.items() if k != "coordinates"},
+                                 {k: v for k, v in new.items() if k != "coordinates"})
+            if fields:
+                operations.append({"op": "route_set", "number": number, "fields": fields})
+            operations += diff_coordinates(number, old["coordinates"], new["coordinates"])
+    return operations
+
+
+# --- Patch container ---------------------------------------------------------
+
+def encode_patch(base: dict, target: dict, operations: list) -> bytes:
+    payload = zlib.compress(json.dumps(operations, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+    versions = data_versions(target)
+    packed_versions = b"".join(bytes.fromhex(versions[name]) for name in DATA_VERSION_NAMES)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, snapshot_hash(base), snapshot_hash(target), packed_versions,
+                       len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_patch(data: bytes) -> tuple:
+    """(base hash, target hash, target DataVersions, operations); raises ValueError on a damaged patch."""
+    if len(data) < HEADER.size:
+        raise ValueError("patch is truncated")
+    magic, version, base_hash, target_hash, packed_versions, length, crc = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("not a data patch (or an unsupported format version)")
+    payload = data[HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("patch payload is damaged (length or CRC-32 mismatch)")
+    size = HASH_LENGTH // 2
+    versions = {name: packed_versions[i * size:(i + 1) * size].hex() for i, name in enumerate(DATA_VERSION_NAMES)}
+    return base_hash, target_hash, versions, json.loads(zlib.decompress(payload))
+
+
+def set_fields(record: dict, fields: dict):
+    for key, value in fields.items():
+        if "/" in key:
+            key, sub = key.split("/", 1)
+            nested = record.setdefault(key, {})
+            if value is None:
+                nested.pop(sub, None)
+            else:
+                nested[sub] = value
+        elif value is None:
+            record.pop(key, None)
+        else:
+            record[key] = value
+
+
+def apply_patch(base: dict, data: bytes) -> dict:
+    """Apply a patch to a base snapshot; the result is verified against the target hash and DataVersions."""
+    base_hash, target_hash, versions, operations = decode_patch(data)
+    if snapshot_hash(base) != base_hash:
+        raise ValueError("the patch was made for a different base version")
+
+    result = json.loads(canonical(base))
+    for operation in operations:
+        kind = operation["op"]
+        if kind == "poi_delete":
+            del result["pois"][operation["id"]]
+        elif kind == "poi_put":
+            result["pois"][operation["id"]] = operation["value"]
+        elif kind == "poi_set":
+            set_fields(result["pois"][operation["id"]], operation["fields"])
+        elif kind == "route_delete":
+            del result["routes"][operation["number"]]
+        elif kind == "route_put":
+            result["routes"][operation["number"]] = operation["value"]
+        elif kind == "route_set":
+            set_fields(result["routes"][operation["number"]], operation["fields"])
+        elif kind == "route_elevations":
+            coordinates = result["routes"][operation["number"]]["coordinates"]
+            for start, elevations in operation["runs"]:
+                for i, elevation in enumerate(elevations, start):
+                    coordinates[i][2] = elevation
+        elif kind == "route_coordinates":
+            coordinates = result["routes"][operation["number"]]["coordinates"]
+            # Edits use base indexes: apply from the end so earlier ones stay valid
+            for start, length, replacement in reversed(operation["edits"]):
+                coordinates[start:start + length] = replacement
+        else:
+            raise ValueError(f"unknown patch operation {kind!r}")
+
+    if snapshot_hash(result) != target_hash:
+        raise ValueError("the patched data does not match the target version")
+    if data_versions(result) != versions:
+        raise ValueError("the patched data does not match the target DataVersions")
+    return result
+
+
+def summarize(operations: list) -> str:
+    counts = {}
+    for operation in operations:
+        counts[operation["op"]] = counts.get(operation["op"], 0) + 1
+    return ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "no changes"
+
+
+def format_versions(versions: dict) -> str:
+    return ", ".join(f"{name}={value}" for name, value in versions.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record-level binary delta patches of the bundled data")
+    parser.add_argument("command", choices=["diff", "apply", "snapshot"])
+    parser.add_argument("versions", nargs="+", help="diff: <base> <target>, apply: <base> <patch>, snapshot: <version>")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    expected = {"diff": 2, "apply": 2, "snapshot": 1}[args.command]
+    if len(args.versions) != expected:
+        parser.error(f"{args.command} takes {expected} argument(s)")
+
+    try:
+        base = load_version(args.versions[0])
+        if args.command == "snapshot":
+            output = args.output or DEFAULT_SNAPSHOT
+            trail_data.atomic_write(output, json.dumps(base, ensure_ascii=False, sort_keys=True))
+            print(f"Saved {len(base['routes'])} routes and {len(base['pois'])} POIs to {output}")
+            print(f"DataVersions: {format_versions(data_versions(base))}")
+            return
+
+        if args.command == "diff":
+            target = load_version(args.versions[1])
+            operations = diff(base, target)
+            patch = encode_patch(base, target, operations)
+            # The patch must reproduce the target before it is handed out
+            apply_patch(base, patch)
+            output = args.output or DEFAULT_PATCH
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            with open(output, 'wb') as f:
+                f.write(patch)
+            full = canonical(target)
+            print(f"Operations: {summarize(operations)}")
+            print(f"Patch: {len(patch):,} bytes -> {output} (verified)")
+            print(f"Target DataVersions: {format_versions(data_versions(target))}")
+            print(f"Full target: {len(full):,} bytes, {len(zlib.compress(full, 9)):,} compressed")
+            return
+
+        with open(args.versions[1], 'rb') as f:
+            result = apply_patch(base, f.read())
+        output = args.output or DEFAULT_SNAPSHOT
+        trail_data.atomic_write(output, json.dumps(result, ensure_ascii=False, sort_keys=True))
+        print(f"Patch applied and verified: {len(result['routes'])} routes, {len(result['pois'])} POIs -> {output}")
+        print(f"DataVersions: {format_versions(data_versions(result))}")
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Sample route elevations from a local DEM instead of the website profile images.
+
+Usage:
+    python3 dem_elevation.py <dem> <route_number|all> [--update] [--gpx]
+
+<dem> is either:
+- an uncompressed GeoTIFF (single band, int16/int32/uint16/float32/float64,
+  stripped or tiled, in geographic WGS84/ETRS89 or UTM WGS84/ETRS89 coordinates,
+  e.g. the IGN MDT05 sheets merged with `gdal_translate -co COMPRESS=NONE`), or
+- a directory of SRTM-style .hgt tiles (N39E003.hgt, N40E004.hgt, ...).
+
+The raster is memory-mapped, never read into RAM: every lookup unpacks only
+the four samples around the point, straight from the map, so only the pages
+under the route are touched (the open .hgt tiles are kept in a small LRU
+cache). Every route coordinate is sampled with bilinear interpolation; points
+are processed in block order so consecutive lookups stay on the same pages.
+
+Without --update the script only prints how the DEM elevations compare to the
+current RouteData.kt values. --update writes them to RouteData.kt (and
+regenerates DataVersions.kt), --gpx also updates the test-routes GPX files
+through update_test_gpx.update_all_gpx_files.
+"""
+
+import os
+import re
+import sys
+import math
+import mmap
+import struct
+import argparse
+from collections import OrderedDict
+
+import trail_data
+from geodesy import wgs84_to_utm
+
+# TIFF tags
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_ROWS_PER_STRIP = 278
+TAG_TILE_WIDTH = 322
+TAG_TILE_LENGTH = 323
+TAG_TILE_OFFSETS = 324
+TAG_SAMPLE_FORMAT = 339
+TAG_MODEL_PIXEL_SCALE = 33550
+TAG_MODEL_TIEPOINT = 33922
+TAG_GEO_KEY_DIRECTORY = 34735
+TAG_GDAL_NODATA = 42113
+
+# GeoTIFF keys
+GEO_KEY_RASTER_TYPE = 1025
+GEO_KEY_GEOGRAPHIC_TYPE = 2048
+GEO_KEY_PROJECTED_CS_TYPE = 3072
+RASTER_PIXEL_IS_POINT = 2
+
+# TIFF field type -> (struct code, size)
+TIFF_TYPES = {
+    1: ("B", 1), 2: ("c", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8),
+    6: ("b", 1), 8: ("h", 2), 9: ("i", 4), 11: ("f", 4), 12: ("d", 8), 16: ("Q", 8),
+}
+
+# (SampleFormat, BitsPerSample) -> struct code
+SAMPLE_CODES = {
+    (1, 8): "B", (1, 16): "H", (1, 32): "I",
+    (2, 8): "b", (2, 16): "h", (2, 32): "i",
+    (3, 32): "f", (3, 64): "d",
+}
+
+
+def bilinear(v00, v01, v10, v11, fx: float, fy: float):
+    """Bilinear interpolation; falls back to the available corners when some are void."""
+    corners = [(v00, (1 - fx) * (1 - fy)), (v01, fx * (1 - fy)), (v10, (1 - fx) * fy), (v11, fx * fy)]
+    valid = [(v, w) for v, w in corners if v is not None]
+    if not valid:
+        return None
+    total = sum(w for _, w in valid)
+    if total == 0:
+        return sum(v for v, _ in valid) / len(valid)
+    return sum(v * w for v, w in valid) / total
+
+
+class _BlockCache:
+    """Small LRU cache: key -> block loaded by `loader`."""
+
+    def __init__(self, loader, size: int, on_evict=None):
+        self.loader = loader
+        self.size = size
+        self.on_evict = on_evict
+        self.blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        block = self.blocks.get(key)
+        if block is not None:
+            self.blocks.move_to_end(key)
+            self.hits += 1
+            return block
+        self.misses += 1
+        block = self.loader(key)
+        self.blocks[key] = block
+        if len(self.blocks) > self.size:
+            _, evicted = self.blocks.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted)
+        return block
+
+
+class GeoTiffDem:
+    """Memory-mapped reader for an uncompressed single-band GeoTIFF DEM."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        order = self._map[:2]
+        if order == b"II":
+            self._endian = "<"
+        elif order == b"MM":
+            self._endian = ">"
+        else:
+            raise ValueError(f"{path} is not a TIFF file")
+        magic, ifd_offset = struct.unpack_from(self._endian + "HI", self._map, 2)
+        if magic != 42:
+            raise ValueError(f"{path}: only classic TIFF is supported (BigTIFF found)")
+
+        tags = self._read_ifd(ifd_offset)
+        if tags.get(TAG_COMPRESSION, [1])[0] != 1:
+            raise ValueError(f"{path} is compressed - convert it with: gdal_translate -co COMPRESS=NONE in.tif out.tif")
+        if tags.get(TAG_SAMPLES_PER_PIXEL, [1])[0] != 1:
+            raise ValueError(f"{path}: only single-band rasters are supported")
+
+        self.width = tags[TAG_IMAGE_WIDTH][0]
+        self.height = tags[TAG_IMAGE_LENGTH][0]
+        bits = tags[TAG_BITS_PER_SAMPLE][0]
+        sample_format = tags.get(TAG_SAMPLE_FORMAT, [1])[0]
+        if (sample_format, bits) not in SAMPLE_CODES:
+            raise ValueError(f"{path}: unsupported sample type (format {sample_format}, {bits} bits)")
+        self._format = self._endian + SAMPLE_CODES[(sample_format, bits)]
+        self._sample_size = bits // 8
+
+        if TAG_TILE_OFFSETS in tags:
+            self.block_width = tags[TAG_TILE_WIDTH][0]
+            self.block_height = tags[TAG_TILE_LENGTH][0]
+            self._offsets = tags[TAG_TILE_OFFSETS]
+        else:
+            self.block_width = self.width
+            self.block_height = tags.get(TAG_ROWS_PER_STRIP, [self.height])[0]
+            self._offsets = tags[TAG_STRIP_OFFSETS]
+        self._blocks_across = -(-self.width // self.block_width)
+
+        nodata = tags.get(TAG_GDAL_NODATA)
+        self.nodata = float(nodata.strip("\0 ")) if nodata else None
+
+        # Georeferencing: pixel (i, j) <-> model (x, y)
+        scale = tags[TAG_MODEL_PIXEL_SCALE]
+        tiepoint = tags[TAG_MODEL_TIEPOINT]
+        self._scale_x, self._scale_y = scale[0], scale[1]
+        self._tie_i, self._tie_j, _, self._tie_x, self._tie_y, _ = tiepoint[:6]
+
+        geo_keys = self._read_geo_keys(tags.get(TAG_GEO_KEY_DIRECTORY))
+        # Pixel-is-area rasters reference the corner of the pixel, samples sit at the center
+        self._center_offset = 0.0 if geo_keys.get(GEO_KEY_RASTER_TYPE) == RASTER_PIXEL_IS_POINT else 0.5
+        self._utm_zone = None
+        projected = geo_keys.get(GEO_KEY_PROJECTED_CS_TYPE)
+        if projected:
+            # 326zz = WGS84 / UTM zone zzN, 258zz = ETRS89 / UTM zone zzN
+            if 32601 <= projected <= 32660 or 25801 <= projected <= 25860:
+                self._utm_zone = projected % 100
+            else:
+                raise ValueError(f"{path}: unsupported projected CRS EPSG:{projected} "
+                                 "(reproject to EPSG:4326 or a WGS84/ETRS89 UTM zone)")
+
+    def _read_ifd(self, offset: int) -> dict:
+        count = struct.unpack_from(self._endian + "H", self._map, offset)[0]
+        tags = {}
+        for n in range(count):
+            entry = offset + 2 + n * 12
+            tag, field_type, value_count = struct.unpack_from(self._endian + "HHI", self._map, entry)
+            if field_type not in TIFF_TYPES:
+                continue
+            code, size = TIFF_TYPES[field_type]
+            total = size * value_count
+            data_offset = entry + 8
+            if total > 4:
+                data_offset = struct.unpack_from(self._endian + "I", self._map, entry + 8)[0]
+            if field_type == 2:
+                tags[tag] = self._map[data_offset:data_offset + value_count].decode("ascii", "replace")
+            else:
+                tags[tag] = list(struct.unpack_from(f"{self._endian}{value_count * len(code)}{code[0]}",
+                                                    self._map, data_offset))
+        return tags
+
+    @staticmethod
+    def _read_geo_keys(directory) -> dict:
+        if not directory:
+            return {}
+        keys = {}
+        for i in range(4, 4 + directory[3] * 4, 4):
+            key_id, location, _, value = directory[i:i + 4]
+            if location == 0:
+                keys[key_id] = value
+        return keys
+
+    def _value(self, row: int, col: int):
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            return None
+        index = (row // self.block_height) * self._blocks_across + col // self.block_width
+        position = (row % self.block_height) * self.block_width + col % self.block_width
+        offset = self._offsets[index] + position * self._sample_size
+        if offset + self._sample_size > len(self._map):
+            return None
+        value = struct.unpack_from(self._format, self._map, offset)[0]
+        if self.nodata is not None and value == self.nodata:
+            return None
+        return value
+
+    def _pixel(self, lon: float, lat: float) -> tuple:
+        """Continuous (row, col) of a WGS84 coordinate, in sample-center space."""
+        if self._utm_zone:
+            x, y = wgs84_to_utm(lat, lon, self._utm_zone)
+        else:
+            x, y = lon, lat
+        col = (x - self._tie_x) / self._scale_x + self._tie_i - self._center_offset
+        row = (self._tie_y - y) / self._scale_y + self._tie_j - self._center_offset
+        return row, col
+
+    def _block_key(self, point) -> int:
+        row, col = self._pixel(point[0], point[1])
+        return (int(row) // self.block_height) * self._blocks_across + int(col) // self.block_width
+
+    def sample(self, points: list) -> list:
+        """Bilinear elevation (m) at every (lon, lat) point; None outside the raster or on voids."""
+        results = [None] * len(points)
+        order = sorted(range(len(points)), key=lambda i: self._block_key(points[i]))
+        for i in order:
+            row, col = self._pixel(points[i][0], points[i][1])
+            r0, c0 = math.floor(row), math.floor(col)
+            results[i] = bilinear(
+                self._value(r0, c0), self._value(r0, c0 + 1),
+                self._value(r0 + 1, c0), self._value(r0 + 1, c0 + 1),
+                col - c0, row - r0,
+            )
+        return results
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class HgtDem:
+    """Memory-mapped SRTM .hgt tiles (big-endian int16, 1 or 3 arc-second)."""
+
+    VOID = -32768
+
+    def __init__(self, directory: str, cache_tiles: int = 8):
+        self.directory = directory
+        self._cache = _BlockCache(self._open_tile, cache_tiles, on_evict=self._close_tile)
+
+    def _open_tile(self, key):
+        lat_floor, lon_floor = key
+        name = (f"{'N' if lat_floor >= 0 else 'S'}{abs(lat_floor):02d}"
+                f"{'E' if lon_floor >= 0 else 'W'}{abs(lon_floor):03d}.hgt")
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return (None, None, 0)
+        f = open(path, 'rb')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = int(math.isqrt(len(mapped) // 2))
+        return (f, mapped, size)
+
+    @staticmethod
+    def _close_tile(tile):
+        f, mapped, _ = tile
+        if mapped is not None:
+            mapped.close()
+            f.close()
+
+    def _value(self, tile, row: int, col: int):
+        _, mapped, size = tile
+        if mapped is None or not (0 <= row < size and 0 <= col < size):
+            return None
+        value = struct.unpack_from(">h", mapped, (row * size + col) * 2)[0]
+        return None if value == self.VOID else value
+
+    def sample(self, points: list) -> list:
+        """Bilinear elevation (m) at every (lon, lat) point; None where no tile or void."""
+        results = [None] * len(points)
+        order = sorted(range(len(points)), key=lambda i: (math.floor(points[i][1]), math.floor(points[i][0])))
+        for i in order:
+            lon, lat = points[i][0], points[i][1]
+            key = (math.floor(lat), math.floor(lon))
+            tile = self._cache.get(key)
+            size = tile[2]
+            if not size:
+                continue
+            # Row 0 is the northern edge; tiles overlap by one sample on each side
+            row = (key[0] + 1 - lat) * (size - 1)
+            col = (lon - key[1]) * (size - 1)
+            r0, c0 = min(int(row), size - 2), min(int(col), size - 2)
+            results[i] = bilinear(
+                self._value(tile, r0, c0), self._value(tile, r0, c0 + 1),
+                self._value(tile, r0 + 1, c0), self._value(tile, r0 + 1, c0 + 1),
+                col - c0, row - r0,
+            )
+        return results
+
+    def close(self):
+        for tile in self._cache.blocks.values():
+            self._close_tile(tile)
+        self._cache.blocks.clear()
+
+
+def open_dem(path: str):
+    """Open a GeoTIFF file or a directory of .hgt tiles."""
+    if os.path.isdir(path):
+        if not any(re.match(r'[NS]\d{2}[EW]\d{3}\.hgt$', name) for name in os.listdir(path)):
+            raise ValueError(f"No .hgt tiles found in {path}")
+        return HgtDem(path)
+    return GeoTiffDem(path)
+
+
+def sample_stage(dem, stage: dict) -> list:
+    """Return the stage coordinates with elevations from the DEM (old value kept on voids)."""
+    coords = stage["coordinates"]
+    elevations = dem.sample(coords)
+    updated = []
+    missing = 0
+    for coord, elev in zip(coords, elevations):
+        if elev is None:
+            missing += 1
+            elev = coord[2] if len(coord) > 2 else 0.0
+        updated.append([coord[0], coord[1], round(elev, 1)])
+    if missing:
+        print(f"  WARNING: {missing} points outside the DEM or on voids, kept their old elevation")
+    return updated
+
+
+def print_comparison(stage: dict, updated: list):
+    old = [c[2] for c in stage["coordinates"] if len(c) > 2]
+    new = [c[2] for c in updated]
+    if old:
+        mean_diff = sum(abs(a - b) for a, b in zip(old, new)) / len(old)
+        print(f"Route {stage['number']:>2}: {len(new)} points, "
+              f"old {min(old):.1f}-{max(old):.1f}m, DEM {min(new):.1f}-{max(new):.1f}m, "
+              f"mean |diff| {mean_diff:.1f}m")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample route elevations from a local DEM")
+    parser.add_argument("dem", help="uncompressed GeoTIFF or directory of .hgt tiles")
+    parser.add_argument("route", help="route number or 'all'")
+    parser.add_argument("--update", action="store_true", help="write the elevations to RouteData.kt")
+    parser.add_argument("--gpx", action="store_true", help="also update the test-routes GPX files")
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    if args.route != "all":
+        if not args.route.isdigit() or not any(s["number"] == int(args.route) for s in stages):
+            print(f"Invalid route number: {args.route}")
+            sys.exit(1)
+        stages = [s for s in stages if s["number"] == int(args.route)]
+
+    dem = open_dem(args.dem)
+    updates = {}
+    for stage in stages:
+        updates[stage["number"]] = sample_stage(dem, stage)
+        print_comparison(stage, updates[stage["number"]])
+
+    if args.update:
+        trail_data.write_stage_coordinates(updates)
+        print(f"\nUpdated RouteData.kt for {len(updates)} routes")
+
+        from generate_data_versions import write_data_versions
+        write_data_versions()
+
+    if args.gpx:
+        from update_test_gpx import update_all_gpx_files
+        update_all_gpx_files(elevation_source=dem)
+
+    dem.close()
+
+
+if __name__ == "__main__":
+    main()
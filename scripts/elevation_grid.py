@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Stage elevations resampled onto a uniform distance grid, for O(1) lookups.
+
+Usage:
+    python3 elevation_grid.py build [--step 10] [--max-error 1.5] [--output PATH]
+    python3 elevation_grid.py check [--step 10] [--max-error 1.5]
+
+Looking an elevation up by distance in a profile or a stage line means
+searching for the segment around it. On a grid with a fixed step the cell is
+the distance divided by the step, so a lookup is one division and one linear
+interpolation (ElevationGrid.at). Resampling is a single merge pass over the
+source line.
+
+build writes scripts/generated/elevation_grid.bin, every stage and the
+complete loop (series 0, joined as in complete_route.json) resampled from the
+RouteData.kt geometry (elevation over along-line Haversine distance, as in
+route_stats.json). All little-endian:
+- header: magic "CDEG", format version (u8), step in meters (u16), series
+  count (u16)
+- per series: number (u16), sample count (u32), then the samples as i16
+  decimeters; sample k is the elevation at k * step, the last one at or past
+  the end of the line holds its final elevation
+
+check resamples every series and fails (exit 1) when a lookup at any source
+point is further than --max-error from the source elevation: the error of a
+resampled polyline is largest at the source vertices, so this bounds it
+everywhere. On the loop the segments on either side of a stage join (and
+one step around them) are skipped: consecutive stages can disagree on the
+elevation of their shared endpoint, a step no grid cell can hold. build runs
+it first and writes nothing when it fails, so the elevation_grid step of
+build_data.py checks every change to the stage data.
+
+Writing coordinate elevations needs the exact profile value instead:
+ProfileLookup interpolates a profile by binary search (O(log n) per point).
+extract_all_routes.py and update_test_gpx.py place the extracted profiles on
+the stage and test-route coordinates with it, with the same results as the
+linear search it replaces.
+"""
+
+import os
+import sys
+import math
+import bisect
+import struct
+import argparse
+from array import array
+
+import trail_data
+from generate_complete_route import join_stages
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "elevation_grid.bin")
+DEFAULT_STEP_METERS = 10
+# Largest |grid lookup - source elevation| accepted by `check`
+DEFAULT_MAX_ERROR_METERS = 1.5
+MAGIC = b"CDEG"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBHH")
+SERIES_HEADER = struct.Struct("<HI")
+
+
+class ElevationGrid:
+    """Elevations every `step_km` from 0; lookups past either end clamp to the first/last sample."""
+
+    def __init__(self, step_km: float, elevations):
+        self.step_km = step_km
+        self.elevations = array('d', elevations)
+
+    @classmethod
+    def from_profile(cls, profile: list, step_km: float = DEFAULT_STEP_METERS / 1000):
+        """Resample [(km, elevation)] (ascending km) with linear interpolation, in one pass."""
+        count = math.ceil(profile[-1][0] / step_km) + 1 if profile[-1][0] > 0 else 1
+        elevations = array('d')
+        segment = 0
+        last = len(profile) - 1
+        for k in range(count):
+            km = k * step_km
+            while segment < last - 1 and profile[segment + 1][0] < km:
+                segment += 1
+            (km1, elev1), (km2, elev2) = profile[segment], profile[min(segment + 1, last)]
+            if km <= km1 or km2 == km1:
+                elevations.append(elev1)
+            elif km >= km2:
+                elevations.append(elev2)
+            else:
+                elevations.append(elev1 + (km - km1) / (km2 - km1) * (elev2 - elev1))
+        return cls(step_km, elevations)
+
+    @classmethod
+    def from_coordinates(cls, coords: list, step_km: float = DEFAULT_STEP_METERS / 1000):
+        distances = trail_data.cumulative_distances(coords)
+        return cls.from_profile([(km, c[2]) for km, c in zip(distances, coords)], step_km)
+
+    def at(self, km: float) -> float:
+        position = km / self.step_km
+        if position <= 0:
+            return self.elevations[0]
+        cell = int(position)
+        if cell >= len(self.elevations) - 1:
+            return self.elevations[-1]
+        t = position - cell
+        return self.elevations[cell] + t * (self.elevations[cell + 1] - self.elevations[cell])
+
+
+class ProfileLookup:
+    """Exact linear interpolation in a [(km, elevation)] profile (ascending km), by binary search."""
+
+    def __init__(self, profile: list):
+        self.profile = profile
+        self.kilometers = [km for km, _ in profile]
+
+    @classmethod
+    def from_coordinates(cls, coords: list):
+        return cls([(km, c[2]) for km, c in zip(trail_data.cumulative_distances(coords), coords)])
+
+    def at(self, km: float) -> float:
+        if km <= self.kilometers[0]:
+            return self.profile[0][1]
+        if km >= self.kilometers[-1]:
+            return self.profile[-1][1]
+        # The first segment that ends at or past km
+        i = bisect.bisect_left(self.kilometers, km) - 1
+        (km1, elev1), (km2, elev2) = self.profile[i], self.profile[i + 1]
+        if km2 == km1:
+            return elev1
+        return elev1 + (km - km1) / (km2 - km1) * (elev2 - elev1)
+
+
+def max_error(profile: list, grid: ElevationGrid, skipped: list = ()) -> tuple:
+    """(largest |grid.at(km) - elevation|, km where it occurs) over the source points outside the `skipped` km ranges."""
+    worst, worst_km = 0.0, 0.0
+    for km, elevation in profile:
+        if any(start - grid.step_km <= km <= end + grid.step_km for start, end in skipped):
+            continue
+        error = abs(grid.at(km) - elevation)
+        if error > worst:
+            worst, worst_km = error, km
+    return worst, worst_km
+
+
+def stage_series(stages: list) -> list:
+    """[(number, coordinates, join indexes)]: the complete loop (complete_route.json) as 0, then every stage."""
+    joined, ranges, _ = join_stages(stages)
+    series = [(0, joined, [first for first, _ in ranges[1:]])]
+    return series + [(stage["number"], stage["coordinates"], []) for stage in stages]
+
+
+def encode(series: list, step_meters: int) -> bytes:
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, step_meters, len(series)))
+    for number, grid in series:
+        decimeters = array('h', (round(e * 10) for e in grid.elevations))
+        if sys.byteorder != "little":
+            decimeters.byteswap()
+        out += SERIES_HEADER.pack(number, len(decimeters)) + decimeters.tobytes()
+    return bytes(out)
+
+
+def decode(data: bytes) -> tuple:
+    """(step in meters, {number: ElevationGrid}) from an elevation_grid.bin."""
+    magic, version, step_meters, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"not an elevation grid (format {version})")
+    position = HEADER.size
+    grids = {}
+    for _ in range(count):
+        number, samples = SERIES_HEADER.unpack_from(data, position)
+        position += SERIES_HEADER.size
+        decimeters = array('h')
+        decimeters.frombytes(data[position:position + 2 * samples])
+        if sys.byteorder != "little":
+            decimeters.byteswap()
+        position += 2 * samples
+        grids[number] = ElevationGrid(step_meters / 1000, (d / 10 for d in decimeters))
+    return step_meters, grids
+
+
+def check(stages: list, step_meters: int, limit: float) -> bool:
+    ok = True
+    print(f"  {'series':>6} {'points':>7} {'samples':>8} {'max error':>10}")
+    for number, coords, joins in stage_series(stages):
+        distances = trail_data.cumulative_distances(coords)
+        profile = list(zip(distances, (c[2] for c in coords)))
+        # Through the stored decimeters, as the app reads them
+        _, grids = decode(encode([(number, ElevationGrid.from_profile(profile, step_meters / 1000))], step_meters))
+        grid = grids[number]
+        # Consecutive stages can disagree on the elevation of their shared endpoint: a step no grid cell can hold
+        skipped = [(distances[max(i - 1, 0)], distances[min(i + 1, len(coords) - 1)]) for i in joins]
+        error, km = max_error(profile, grid, skipped)
+        flag = "" if error <= limit else f"  > {limit} m at {km:.2f} km"
+        ok = ok and not flag
+        print(f"  {number or 'loop':>6} {len(coords):>7} {len(grid.elevations):>8} {error:>8.2f} m{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uniform-distance elevation grids for O(1) lookups")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP_METERS, help="grid step in meters")
+    parser.add_argument("--max-error", type=float, default=DEFAULT_MAX_ERROR_METERS,
+                        help="check: largest accepted error in meters (default: %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    if not check(stages, args.step, args.max_error):
+        print(f"ERROR: grid lookups deviate more than {args.max_error} m from the stage elevations")
+        sys.exit(1)
+    print(f"All series within {args.max_error} m at a {args.step} m step")
+    if args.command == "check":
+        return
+
+    series = [(number, ElevationGrid.from_coordinates(coords, args.step / 1000))
+              for number, coords, _ in stage_series(stages)]
+    data = encode(series, args.step)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, args.output)
+    samples = sum(len(grid.elevations) for _, grid in series)
+    print(f"{len(series) - 1} stages + complete loop, {samples} samples every {args.step} m")
+    print(f"Saved to {args.output} ({len(data) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Multi-level elevation-chart series for every stage and the complete loop.
+
+Usage:
+    python3 elevation_series.py [--levels 64 256 1024] [--output PATH]
+
+Each series is downsampled with Largest-Triangle-Three-Buckets (LTTB): the
+line is split into equal buckets and from each bucket the point forming the
+largest triangle with the previously kept point and the next bucket's average
+is kept. Unlike a uniform index stride this keeps the peaks and dips that
+shape the chart. The highest and lowest points are always kept as well (LTTB
+alone can miss them on a flat plateau), so the chart peak matches
+route_stats.json and the profile summary of extract_all_routes.py.
+
+Every stage and the loop get one series per level (a line shorter than a
+level gets its full line as the last level), so the chart draws a small series in
+the overview and a denser one when zoomed, at a fixed rendering and
+hit-testing cost. Distances are along-line meters (Haversine, as in
+route_stats.json).
+
+The script prints, per level of the loop, the mean and largest elevation
+error of the series (linear interpolation against every original point) next
+to those of a uniform stride with the same number of points.
+"""
+
+import os
+import json
+import bisect
+import argparse
+
+import trail_data
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "elevation_series.json")
+DEFAULT_LEVELS = [64, 256, 1024]
+
+
+def lttb_indexes(xs: list, ys: list, threshold: int) -> list:
+    """Indexes of the points LTTB keeps out of (xs, ys); first and last are always kept."""
+    count = len(xs)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+
+    every = (count - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_start = end
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            # Twice the triangle area; the factor does not change the choice
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+        a = best
+    kept.append(count - 1)
+    return kept
+
+
+def keep_extremes(kept: list, ys: list) -> list:
+    """Make sure the highest and lowest points are kept, replacing the nearest interior point."""
+    kept = list(kept)
+    extremes = (max(range(len(ys)), key=ys.__getitem__), min(range(len(ys)), key=ys.__getitem__))
+    for extreme in extremes:
+        position = bisect.bisect_left(kept, extreme)
+        if position < len(kept) and kept[position] == extreme:
+            continue
+        # kept[position - 1] < extreme < kept[position]: never replace the first/last point or the other extreme
+        neighbours = [p for p in (position - 1, position) if 0 < p < len(kept) - 1 and kept[p] not in extremes]
+        if neighbours:
+            kept[min(neighbours, key=lambda p: abs(kept[p] - extreme))] = extreme
+        else:
+            kept.insert(position, extreme)
+    return kept
+
+
+def stride_indexes(count: int, threshold: int) -> list:
+    """The uniform index stride extract_all_routes.py used to sample profiles with."""
+    if threshold >= count:
+        return list(range(count))
+    step = count / threshold
+    indexes = [int(i * step) for i in range(threshold)]
+    if indexes[-1] != count - 1:
+        indexes.append(count - 1)
+    return indexes
+
+
+def downsample(xs: list, ys: list, threshold: int) -> list:
+    """Shape-preserving indexes: LTTB plus the true peak and low point."""
+    return keep_extremes(lttb_indexes(xs, ys, threshold), ys)
+
+
+def errors(xs: list, ys: list, kept: list) -> tuple:
+    """Mean and largest |elevation - interpolated series| over the original points."""
+    total = worst = 0.0
+    for a, b in zip(kept, kept[1:]):
+        x1, y1, x2, y2 = xs[a], ys[a], xs[b], ys[b]
+        for i in range(a + 1, b):
+            t = (xs[i] - x1) / (x2 - x1) if x2 > x1 else 0.0
+            error = abs(ys[i] - (y1 + t * (y2 - y1)))
+            total += error
+            worst = max(worst, error)
+    return total / len(xs), worst
+
+
+def build_series(coords: list, levels: list) -> list:
+    meters = [km * 1000 for km in trail_data.cumulative_distances(coords)]
+    elevations = [c[2] for c in coords]
+    series = []
+    for level in sorted(levels):
+        kept = downsample(meters, elevations, level)
+        series.append({
+            "points": len(kept),
+            "distanceMeters": [round(meters[i], 1) for i in kept],
+            "elevationMeters": [elevations[i] for i in kept],
+        })
+        if len(kept) == len(coords):
+            # The line itself: denser levels would repeat it
+            break
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LTTB multi-level elevation-chart series")
+    parser.add_argument("--levels", type=int, nargs="+", default=DEFAULT_LEVELS,
+                        help="points per level (default: %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    output = {"levels": sorted(args.levels), "stages": []}
+    for stage in stages:
+        output["stages"].append({"number": stage["number"], "series": build_series(stage["coordinates"], args.levels)})
+    loop = trail_data.combined_coordinates(stages)
+    output["complete"] = {"series": build_series(loop, args.levels)}
+
+    meters = [km * 1000 for km in trail_data.cumulative_distances(loop)]
+    elevations = [c[2] for c in loop]
+    print(f"Complete loop: {len(loop)} points, peak {max(elevations)} m")
+    print(f"  {'points':>7}  {'LTTB error mean/max':>20}  {'stride error mean/max':>22}  {'stride peak':>11}")
+    for level in sorted(args.levels):
+        if level >= len(loop):
+            continue
+        stride = stride_indexes(len(loop), level)
+        lttb_mean, lttb_max = errors(meters, elevations, downsample(meters, elevations, level))
+        stride_mean, stride_max = errors(meters, elevations, stride)
+        print(f"  {level:>7}  {lttb_mean:>11.1f} / {lttb_max:>4.1f} m  {stride_mean:>13.1f} / {stride_max:>4.1f} m  "
+              f"{max(elevations[i] for i in stride):>9} m")
+
+    trail_data.atomic_write(args.output, json.dumps(output, separators=(',', ':')))
+    print(f"{len(stages)} stages + complete loop, levels {output['levels']}")
+    print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Export the stages, the complete loop and the POIs to FlatGeobuf with a packed Hilbert R-tree.
+
+Usage:
+    python3 export_flatgeobuf.py export [--output-dir DIR] [--node-size 16]
+    python3 export_flatgeobuf.py query <file.fgb> <min_lon> <min_lat> <max_lon> <max_lat>
+    python3 export_flatgeobuf.py benchmark [--queries 200] [--size-km 2]
+
+Writes two FlatGeobuf files (https://flatgeobuf.org, format version 3) to
+scripts/generated/ (gitignored):
+- stages.fgb: LineString Z, the 20 stages plus the complete loop
+  (columns: number, kind = stage|loop, name, distanceKm, difficulty)
+- pois.fgb: Point, every POI (columns: id, type, name_ca ... name_it)
+both in EPSG:4326. Features are sorted along a Hilbert curve and preceded by
+the packed R-tree over their bounding boxes, so GDAL/QGIS, the flatgeobuf
+libraries or a backend can answer bounding-box queries with a few range reads
+(header, the index nodes on the path, the matching features) instead of
+parsing everything. The FlatBuffers tables are encoded by hand, like the
+protobuf in generate_mbtiles.py, so no extra dependency is needed.
+
+query runs such a range-read search with the reader in this script.
+benchmark writes the GeoJSON equivalent of both files to a temporary
+directory and compares random bounding-box queries: bytes read and time per
+query for FlatGeobuf range reads versus loading and filtering the GeoJSON.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import struct
+import argparse
+import tempfile
+
+import trail_data
+
+DEFAULT_OUTPUT_DIR = trail_data.GENERATED_DIR
+DEFAULT_NODE_SIZE = 16
+
+MAGIC = b"fgb\x03fgb\x00"
+NODE_ITEM = struct.Struct("<4dQ")
+HILBERT_MAX = (1 << 16) - 1
+
+# FlatGeobuf enums
+GEOMETRY_POINT = 1
+GEOMETRY_LINESTRING = 2
+COLUMN_INT = 5
+COLUMN_DOUBLE = 10
+COLUMN_STRING = 11
+
+# Header / Column / Crs / Feature / Geometry field indexes (header.fbs, feature.fbs)
+HEADER_NAME, HEADER_ENVELOPE, HEADER_GEOMETRY_TYPE, HEADER_HAS_Z = 0, 1, 2, 3
+HEADER_COLUMNS, HEADER_FEATURES_COUNT, HEADER_INDEX_NODE_SIZE, HEADER_CRS, HEADER_TITLE = 7, 8, 9, 10, 11
+COLUMN_NAME, COLUMN_TYPE = 0, 1
+CRS_ORG, CRS_CODE = 0, 1
+FEATURE_GEOMETRY, FEATURE_PROPERTIES = 0, 1
+GEOMETRY_XY, GEOMETRY_Z, GEOMETRY_TYPE = 1, 2, 6
+
+
+# --- FlatBuffers encoding ----------------------------------------------------
+#
+# Tables are written front to back: vtable, table, then the strings, vectors
+# and sub-tables it references (uoffsets must point forward). Alignment is
+# relative to the start of the size prefix, as with the reference builder.
+
+class Table:
+    """Fields: {index: (struct code, value)} for scalars, or String/Vector/Table/TableVector."""
+
+    def __init__(self, fields: dict):
+        self.fields = {i: value for i, value in fields.items() if value is not None}
+
+
+class String:
+    def __init__(self, text: str):
+        self.data = text.encode('utf-8')
+
+
+class Vector:
+    def __init__(self, code: str, values):
+        self.code = code
+        self.values = values
+
+
+class TableVector:
+    def __init__(self, tables: list):
+        self.tables = tables
+
+
+def _pad(buf: bytearray, align: int, extra: int = 0):
+    """Pad so that an item `extra` bytes after the current end is aligned."""
+    buf.extend(b"\0" * (-(len(buf) + extra) % align))
+
+
+def _write_child(buf: bytearray, child) -> int:
+    """Append a referenced object; returns its position."""
+    if isinstance(child, Table):
+        return _write_table(buf, child)
+    if isinstance(child, String):
+        _pad(buf, 4)
+        position = len(buf)
+        buf.extend(struct.pack("<I", len(child.data)) + child.data + b"\0")
+        return position
+    if isinstance(child, Vector):
+        size = struct.calcsize("<" + child.code)
+        _pad(buf, max(4, size), 4)
+        position = len(buf)
+        buf.extend(struct.pack(f"<I{len(child.values)}{child.code}", len(child.values), *child.values))
+        return position
+    # Vector of tables: uoffsets to tables written after it
+    _pad(buf, 4)
+    position = len(buf)
+    buf.extend(struct.pack("<I", len(child.tables)) + b"\0" * (4 * len(child.tables)))
+    for i, table in enumerate(child.tables):
+        slot = position + 4 + 4 * i
+        struct.pack_into("<I", buf, slot, _write_child(buf, table) - slot)
+    return position
+
+
+def _write_table(buf: bytearray, table: Table) -> int:
+    """Append vtable + table + children; returns the table position."""
+    # Inline layout: soffset first, then the fields, largest first so they stay aligned
+    layout = []
+    for index, value in table.fields.items():
+        code = value[0] if isinstance(value, tuple) else "I"
+        layout.append((struct.calcsize("<" + code), index, code, value))
+    layout.sort(key=lambda item: (-item[0], item[1]))
+    table_align = max([4] + [size for size, _, _, _ in layout])
+
+    offsets = {}
+    inline_size = 4
+    for size, index, _, _ in layout:
+        inline_size += -inline_size % size
+        offsets[index] = inline_size
+        inline_size += size
+
+    slots = max(table.fields, default=-1) + 1
+    vtable = struct.pack(f"<HH{slots}H", 4 + 2 * slots, inline_size,
+                         *(offsets.get(i, 0) for i in range(slots)))
+    _pad(buf, 2)
+    vtable_position = len(buf)
+    buf.extend(vtable)
+    _pad(buf, table_align)
+    position = len(buf)
+    buf.extend(b"\0" * inline_size)
+    struct.pack_into("<i", buf, position, position - vtable_position)
+
+    children = []
+    for _, index, code, value in layout:
+        if isinstance(value, tuple):
+            struct.pack_into("<" + code, buf, position + offsets[index], value[1])
+        else:
+            children.append((position + offsets[index], value))
+    for slot, child in children:
+        struct.pack_into("<I", buf, slot, _write_child(buf, child) - slot)
+    return position
+
+
+def encode_size_prefixed(root: Table) -> bytes:
+    buf = bytearray(8)
+    struct.pack_into("<I", buf, 4, _write_table(buf, root) - 4)
+    _pad(buf, 4)
+    struct.pack_into("<I", buf, 0, len(buf) - 4)
+    return bytes(buf)
+
+
+# --- FlatBuffers decoding (just what the reader needs) -----------------------
+
+def _field(data: bytes, table: int, index: int):
+    """Absolute position of a table field, or None if absent."""
+    vtable = table - struct.unpack_from("<i", data, table)[0]
+    if 4 + 2 * index >= struct.unpack_from("<H", data, vtable)[0]:
+        return None
+    offset = struct.unpack_from("<H", data, vtable + 4 + 2 * index)[0]
+    return table + offset if offset else None
+
+
+def _scalar(data: bytes, table: int, index: int, code: str, default=0):
+    position = _field(data, table, index)
+    return struct.unpack_from("<" + code, data, position)[0] if position is not None else default
+
+
+def _target(data: bytes, table: int, index: int):
+    position = _field(data, table, index)
+    return position + struct.unpack_from("<I", data, position)[0] if position is not None else None
+
+
+def _string(data: bytes, table: int, index: int):
+    position = _target(data, table, index)
+    if position is None:
+        return None
+    length = struct.unpack_from("<I", data, position)[0]
+    return data[position + 4:position + 4 + length].decode('utf-8')
+
+
+def _vector(data: bytes, table: int, index: int, code: str) -> tuple:
+    position = _target(data, table, index)
+    if position is None:
+        return ()
+    length = struct.unpack_from("<I", data, position)[0]
+    return struct.unpack_from(f"<{length}{code}", data, position + 4)
+
+
+def _tables(data: bytes, table: int, index: int) -> list:
+    position = _target(data, table, index)
+    if position is None:
+        return []
+    length = struct.unpack_from("<I", data, position)[0]
+    slots = [position + 4 + 4 * i for i in range(length)]
+    return [slot + struct.unpack_from("<I", data, slot)[0] for slot in slots]
+
+
+# --- Packed Hilbert R-tree ---------------------------------------------------
+
+def hilbert(x: int, y: int) -> int:
+    """Position of (x, y) (16 bits each) along the Hilbert curve (same as the reference implementation)."""
+    a = x ^ y
+    b = 0xFFFF ^ a
+    c = 0xFFFF ^ (x | y)
+    d = x & (y ^ 0xFFFF)
+
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C ^= (a & (c >> 2)) ^ (b & (d >> 2))
+    D ^= (b & (c >> 2)) ^ ((a ^ b) & (d >> 2))
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C ^= (a & (c >> 4)) ^ (b & (d >> 4))
+    D ^= (b & (c >> 4)) ^ ((a ^ b) & (d >> 4))
+
+    a, b, c, d = A, B, C, D
+    C ^= (a & (c >> 8)) ^ (b & (d >> 8))
+    D ^= (b & (c >> 8)) ^ ((a ^ b) & (d >> 8))
+
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+    i0 = x ^ y
+    i1 = b | (0xFFFF ^ (i0 | a))
+
+    def interleave(v):
+        v = (v | (v << 8)) & 0x00FF00FF
+        v = (v | (v << 4)) & 0x0F0F0F0F
+        v = (v | (v << 2)) & 0x33333333
+        return (v | (v << 1)) & 0x55555555
+
+    return (interleave(i1) << 1) | interleave(i0)
+
+
+def level_bounds(count: int, node_size: int) -> list:
+    """[(first, end)] node ranges per level, leaves first; the root is node 0."""
+    level_sizes = [count]
+    n = count
+    while True:
+        n = (n + node_size - 1) // node_size
+        level_sizes.append(n)
+        if n == 1:
+            break
+    end = sum(level_sizes)
+    bounds = []
+    for size in level_sizes:
+        end -= size
+        bounds.append((end, end + size))
+    return bounds
+
+
+def build_index(boxes: list, offsets: list, node_size: int) -> bytes:
+    """Packed R-tree over leaf boxes (min_x, min_y, max_x, max_y) pointing at feature byte offsets."""
+    bounds = level_bounds(len(boxes), node_size)
+    nodes = [None] * bounds[0][1]
+    for i, (box, offset) in enumerate(zip(boxes, offsets)):
+        nodes[bounds[0][0] + i] = (*box, offset)
+    for level in range(len(bounds) - 1):
+        position, end = bounds[level]
+        parent = bounds[level + 1][0]
+        while position < end:
+            children = nodes[position:min(position + node_size, end)]
+            nodes[parent] = (min(n[0] for n in children), min(n[1] for n in children),
+                             max(n[2] for n in children), max(n[3] for n in children), position)
+            position += len(children)
+            parent += 1
+    return b"".join(NODE_ITEM.pack(*node) for node in nodes)
+
+
+# --- Writer ------------------------------------------------------------------
+
+def encode_properties(columns: list, properties: dict) -> bytes:
+    out = bytearray()
+    for i, (name, column_type) in enumerate(columns):
+        value = properties.get(name)
+        if value is None:
+            continue
+        out += struct.pack("<H", i)
+        if column_type == COLUMN_INT:
+            out += struct.pack("<i", value)
+        elif column_type == COLUMN_DOUBLE:
+            out += struct.pack("<d", value)
+        else:
+            data = str(value).encode('utf-8')
+            out += struct.pack("<I", len(data)) + data
+    return bytes(out)
+
+
+def encode_feature(geometry_type: int, coords: list, has_z: bool, columns: list, properties: dict) -> bytes:
+    geometry = {
+        GEOMETRY_XY: Vector("d", [v for c in coords for v in c[:2]]),
+        GEOMETRY_TYPE: ("B", geometry_type),
+    }
+    if has_z:
+        geometry[GEOMETRY_Z] = Vector("d", [c[2] for c in coords])
+    fields = {FEATURE_GEOMETRY: Table(geometry)}
+    props = encode_properties(columns, properties)
+    if props:
+        fields[FEATURE_PROPERTIES] = Vector("B", props)
+    return encode_size_prefixed(Table(fields))
+
+
+def bounding_box(coords: list) -> tuple:
+    xs = [c[0] for c in coords]
+    ys = [c[1] for c in coords]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def write_flatgeobuf(path: str, name: str, geometry_type: int, has_z: bool, columns: list,
+                     features: list, node_size: int = DEFAULT_NODE_SIZE) -> int:
+    """Write [(coords, properties)] as a FlatGeobuf file; returns its size in bytes."""
+    boxes = [bounding_box(coords) for coords, _ in features]
+    extent = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+              max(b[2] for b in boxes), max(b[3] for b in boxes))
+    width, height = extent[2] - extent[0], extent[3] - extent[1]
+
+    def hilbert_value(box):
+        x = math.floor(HILBERT_MAX * ((box[0] + box[2]) / 2 - extent[0]) / width) if width else 0
+        y = math.floor(HILBERT_MAX * ((box[1] + box[3]) / 2 - extent[1]) / height) if height else 0
+        return hilbert(x, y)
+
+    # Descending, as the reference writer does
+    order = sorted(range(len(features)), key=lambda i: hilbert_value(boxes[i]), reverse=True)
+
+    encoded = [encode_feature(geometry_type, features[i][0], has_z, columns, features[i][1]) for i in order]
+    offsets = []
+    position = 0
+    for feature in encoded:
+        offsets.append(position)
+        position += len(feature)
+
+    header = encode_size_prefixed(Table({
+        HEADER_NAME: String(name),
+        HEADER_ENVELOPE: Vector("d", list(extent)),
+        HEADER_GEOMETRY_TYPE: ("B", geometry_type),
+        HEADER_HAS_Z: ("B", int(has_z)),
+        HEADER_COLUMNS: TableVector([Table({COLUMN_NAME: String(column), COLUMN_TYPE: ("B", column_type)})
+                                     for column, column_type in columns]),
+        HEADER_FEATURES_COUNT: ("Q", len(features)),
+        HEADER_INDEX_NODE_SIZE: ("H", node_size),
+        HEADER_CRS: Table({CRS_ORG: String("EPSG"), CRS_CODE: ("i", 4326)}),
+        HEADER_TITLE: String(f"Camí de Cavalls {name}"),
+    }))
+    index = build_index([boxes[i] for i in order], offsets, node_size)
+
+    data = MAGIC + header + index + b"".join(encoded)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+STAGE_COLUMNS = [("number", COLUMN_INT), ("kind", COLUMN_STRING), ("name", COLUMN_STRING),
+                 ("distanceKm", COLUMN_DOUBLE), ("difficulty", COLUMN_STRING)]
+POI_COLUMNS = [("id", COLUMN_INT), ("type", COLUMN_STRING)] + \
+              [(f"name_{lang}", COLUMN_STRING) for lang in trail_data.LANGUAGES]
+
+
+def build_layers() -> dict:
+    """{layer name: (geometry type, has_z, columns, [(coords, properties)])}."""
+    stages = trail_data.load_stages()
+    pois = trail_data.load_pois()
+
+    stage_features = [(stage["coordinates"], {
+        "number": stage["number"], "kind": "stage", "name": stage["name"],
+        "distanceKm": stage["distanceKm"], "difficulty": stage["difficulty"],
+    }) for stage in stages]
+    stage_features.append((trail_data.combined_coordinates(stages), {
+        "number": 0, "kind": "loop", "name": "Camí de Cavalls",
+        "distanceKm": round(sum(stage["distanceKm"] for stage in stages), 1),
+    }))
+
+    poi_features = []
+    for poi in pois:
+        properties = {"id": int(poi["id"]), "type": poi["type"]}
+        for lang in trail_data.LANGUAGES:
+            properties[f"name_{lang}"] = poi["names"].get(lang) or None
+        poi_features.append(([[poi["longitude"], poi["latitude"]]], properties))
+
+    return {
+        "stages": (GEOMETRY_LINESTRING, True, STAGE_COLUMNS, stage_features),
+        "pois": (GEOMETRY_POINT, False, POI_COLUMNS, poi_features),
+    }
+
+
+def export(output_dir: str, node_size: int) -> dict:
+    """Write <layer>.fgb for every layer; returns {layer: path}."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name, (geometry_type, has_z, columns, features) in build_layers().items():
+        path = os.path.join(output_dir, f"{name}.fgb")
+        size = write_flatgeobuf(path, name, geometry_type, has_z, columns, features, node_size)
+        print(f"  {name}: {len(features)} features, {size / 1024:.1f} KB -> {path}")
+        paths[name] = path
+    return paths
+
+
+def write_geojson(path: str, layer: tuple):
+    """The GeoJSON equivalent of a layer (for the benchmark)."""
+    geometry_type, _, _, features = layer
+    collection = {"type": "FeatureCollection", "features": [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": coords[0]} if geometry_type == GEOMETRY_POINT
+        else {"type": "LineString", "coordinates": coords},
+        "properties": properties,
+    } for coords, properties in features]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(collection, f, ensure_ascii=False)
+
+
+# --- Reader ------------------------------------------------------------------
+
+class FlatGeobufReader:
+    """Bounding-box queries on a FlatGeobuf file with range reads; counts the bytes read."""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.bytes_read = 0
+        if self._read(len(MAGIC))[:3] != MAGIC[:3]:
+            raise ValueError(f"{path} is not a FlatGeobuf file")
+        size = struct.unpack("<I", self._read(4))[0]
+        header = struct.pack("<I", size) + self._read(size)
+        root = 4 + struct.unpack_from("<I", header, 4)[0]
+        self.count = _scalar(header, root, HEADER_FEATURES_COUNT, "Q")
+        self.node_size = _scalar(header, root, HEADER_INDEX_NODE_SIZE, "H", DEFAULT_NODE_SIZE)
+        self.has_z = bool(_scalar(header, root, HEADER_HAS_Z, "B"))
+        self.columns = [(_string(header, column, COLUMN_NAME), _scalar(header, column, COLUMN_TYPE, "B"))
+                        for column in _tables(header, root, HEADER_COLUMNS)]
+        self.index_start = len(MAGIC) + 4 + size
+        self.bounds = level_bounds(self.count, self.node_size) if self.node_size else []
+        index_size = self.bounds[0][1] * NODE_ITEM.size if self.bounds else 0
+        self.features_start = self.index_start + index_size
+
+    def _read(self, size: int) -> bytes:
+        self.bytes_read += size
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+
+    def search(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+        """Byte offsets (in the feature section) of the features whose box intersects the query."""
+        if not self.bounds:
+            raise ValueError("the file has no spatial index")
+        leaves_start = self.bounds[0][0]
+        found = []
+        pending = [(0, len(self.bounds) - 1)]
+        while pending:
+            node, level = pending.pop()
+            end = min(node + self.node_size, self.bounds[level][1])
+            self.file.seek(self.index_start + node * NODE_ITEM.size)
+            block = self._read((end - node) * NODE_ITEM.size)
+            for i in range(end - node):
+                nx0, ny0, nx1, ny1, offset = NODE_ITEM.unpack_from(block, i * NODE_ITEM.size)
+                if nx1 < min_x or nx0 > max_x or ny1 < min_y or ny0 > max_y:
+                    continue
+                if node >= leaves_start:
+                    found.append(offset)
+                else:
+                    pending.append((offset, level - 1))
+        return sorted(found)
+
+    def feature(self, offset: int) -> tuple:
+        """(coordinates, properties) of the feature at a byte offset of the feature section."""
+        self.file.seek(self.features_start + offset)
+        size = struct.unpack("<I", self._read(4))[0]
+        data = struct.pack("<I", size) + self._read(size)
+        root = 4 + struct.unpack_from("<I", data, 4)[0]
+        geometry = _target(data, root, FEATURE_GEOMETRY)
+        xy = _vector(data, geometry, GEOMETRY_XY, "d")
+        z = _vector(data, geometry, GEOMETRY_Z, "d")
+        coords = [[xy[i], xy[i + 1]] + ([z[i // 2]] if z else []) for i in range(0, len(xy), 2)]
+
+        properties = {}
+        raw = bytes(_vector(data, root, FEATURE_PROPERTIES, "B"))
+        position = 0
+        while position < len(raw):
+            column = struct.unpack_from("<H", raw, position)[0]
+            name, column_type = self.columns[column]
+            position += 2
+            if column_type == COLUMN_INT:
+                properties[name] = struct.unpack_from("<i", raw, position)[0]
+                position += 4
+            elif column_type == COLUMN_DOUBLE:
+                properties[name] = struct.unpack_from("<d", raw, position)[0]
+                position += 8
+            else:
+                length = struct.unpack_from("<I", raw, position)[0]
+                properties[name] = raw[position + 4:position + 4 + length].decode('utf-8')
+                position += 4 + length
+        return coords, properties
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+        return [self.feature(offset) for offset in self.search(min_x, min_y, max_x, max_y)]
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+def geojson_query(path: str, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+    """Load a GeoJSON file and keep the features whose bounding box intersects the query."""
+    with open(path, 'r', encoding='utf-8') as f:
+        collection = json.load(f)
+    matches = []
+    for feature in collection["features"]:
+        coords = feature["geometry"]["coordinates"]
+        box = bounding_box([coords] if feature["geometry"]["type"] == "Point" else coords)
+        if not (box[2] < min_x or box[0] > max_x or box[3] < min_y or box[1] > max_y):
+            matches.append(feature)
+    return matches
+
+
+def benchmark(query_count: int, size_km: float, node_size: int):
+    layers = build_layers()
+    half_lat = size_km / 2 / 111.32
+    with tempfile.TemporaryDirectory() as directory:
+        for name, layer in layers.items():
+            fgb_path = os.path.join(directory, f"{name}.fgb")
+            geojson_path = os.path.join(directory, f"{name}.geojson")
+            write_flatgeobuf(fgb_path, name, *layer, node_size)
+            write_geojson(geojson_path, layer)
+
+            # Query boxes centred on random points of the layer
+            rng = random.Random(1)
+            points = [c for coords, _ in layer[3] for c in coords]
+            boxes = []
+            for _ in range(query_count):
+                lon, lat = rng.choice(points)[:2]
+                half_lon = half_lat / math.cos(math.radians(lat))
+                boxes.append((lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat))
+
+            reader = FlatGeobufReader(fgb_path)
+            header_bytes = reader.bytes_read
+            start = time.perf_counter()
+            fgb_results = [reader.query(*box) for box in boxes]
+            fgb_seconds = time.perf_counter() - start
+            fgb_bytes = reader.bytes_read - header_bytes
+            reader.close()
+
+            start = time.perf_counter()
+            geojson_results = [geojson_query(geojson_path, *box) for box in boxes]
+            geojson_seconds = time.perf_counter() - start
+            geojson_size = os.path.getsize(geojson_path)
+
+            mismatches = sum(1 for a, b in zip(fgb_results, geojson_results)
+                             if sorted(json.dumps(p, sort_keys=True) for _, p in a) !=
+                             sorted(json.dumps(f["properties"], sort_keys=True) for f in b))
+            matched = sum(len(r) for r in fgb_results) / query_count
+
+            print(f"\n{name}: {len(layer[3])} features, {size_km} km boxes, {matched:.1f} matches per query")
+            print(f"  {'':<10}{'file KB':>9}{'KB/query':>10}{'ms/query':>10}")
+            print(f"  {'FlatGeobuf':<10}{os.path.getsize(fgb_path) / 1024:>9.1f}"
+                  f"{fgb_bytes / query_count / 1024:>10.1f}{fgb_seconds / query_count * 1000:>10.2f}"
+                  f"   (+{header_bytes} B header once)")
+            print(f"  {'GeoJSON':<10}{geojson_size / 1024:>9.1f}"
+                  f"{geojson_size / 1024:>10.1f}{geojson_seconds / query_count * 1000:>10.2f}")
+            print(f"  Result sets differ in {mismatches} of {query_count} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FlatGeobuf export of the stages and POIs")
+    parser.add_argument("command", choices=["export", "query", "benchmark"])
+    parser.add_argument("args", nargs="*", help="query: <file.fgb> <min_lon> <min_lat> <max_lon> <max_lat>")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--node-size", type=int, default=DEFAULT_NODE_SIZE, help="R-tree node size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--size-km", type=float, default=2.0, help="benchmark query box size")
+    args = parser.parse_args()
+
+    if args.node_size < 2:
+        print("The node size must be at least 2")
+        sys.exit(1)
+
+    if args.command == "export":
+        print(f"Writing FlatGeobuf files (R-tree node size {args.node_size})...")
+        export(args.output_dir, args.node_size)
+    elif args.command == "query":
+        if len(args.args) != 5:
+            parser.error("query needs <file.fgb> <min_lon> <min_lat> <max_lon> <max_lat>")
+        reader = FlatGeobufReader(args.args[0])
+        features = reader.query(*map(float, args.args[1:]))
+        for coords, properties in features:
+            print(f"  {len(coords):>5} pts  {json.dumps(properties, ensure_ascii=False)}")
+        print(f"{len(features)} of {reader.count} features, {reader.bytes_read} bytes read")
+        reader.close()
+    else:
+        benchmark(args.queries, args.size_km, args.node_size)
+
+
+if __name__ == "__main__":
+    main()
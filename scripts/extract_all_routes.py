@@ -3,62 +3,51 @@
 Automated elevation profile extraction from official camidecavalls.com images.
 
 Usage:
-    python3 extract_all_routes.py <route_number> [--update]
-    python3 extract_all_routes.py all [--update]
-
-The script:
-1. Downloads the profile image from https://www.camidecavalls.com/Imas/General/perfil{N}d.png
+    python3 extract_all_routes.py <route_number> [--update] [--trail ID]
+    python3 extract_all_routes.py all [--update] [--trail ID] [--jobs N]
+    (any of the above with --profile: see profiling.py)
+
+The stages, their calibration (distance, min/max elevation), the image URL and
+the output paths come from the trail registry (trails.json, default trail
+"camidecavalls"), so other trails only need a registry entry. For every stage
+the script:
+1. Downloads the profile image (sources.profileImageUrl), unless cached
 2. Extracts the elevation profile by finding visible pixels
 3. Maps X coordinates to distance (km)
 4. Maps Y coordinates to elevation (m)
-5. Optionally updates RouteData.kt with --update flag
+5. Saves the sampled profile (outputs.profile)
+
+Stages are processed in parallel (--jobs, default: CPU count; one process with
+--profile, so the spans cover every stage); their output is printed stage by
+stage. With --update the new elevations of every stage are
+then written to the trail's RouteData.kt in one go (and DataVersions.kt is
+regenerated for the app's own RouteData.kt).
 """
 
+import io
 import os
 import sys
 import json
-import math
-import re
-import urllib.request
-from PIL import Image
-
-# Route metadata: (distance_km, min_elevation, max_elevation)
-# These values come from the official website or RouteData.kt
-ROUTE_DATA = {
-    1: {"name": "Maó - Es Grau", "distance": 10.1, "min_elev": 5, "max_elev": 89},
-    2: {"name": "Es Grau - Favàritx", "distance": 8.63, "min_elev": 5, "max_elev": 47},
-    3: {"name": "Favàritx - Arenal d'en Castell", "distance": 13.60, "min_elev": 0, "max_elev": 78},
-    4: {"name": "Arenal d'en Castell - Cala Tirant", "distance": 10.77, "min_elev": 3, "max_elev": 38},
-    5: {"name": "Son Parc - Fornells", "distance": 9.59, "min_elev": 1, "max_elev": 47},
-    6: {"name": "Fornells - Cala Tirant", "distance": 8.61, "min_elev": 2, "max_elev": 118},
-    7: {"name": "Cala Tirant - Binimel·là", "distance": 11.2, "min_elev": 0, "max_elev": 95},
-    8: {"name": "Binimel·là - Els Alocs", "distance": 7.3, "min_elev": 0, "max_elev": 68},
-    9: {"name": "Els Alocs - Algaiarens", "distance": 7.0, "min_elev": 0, "max_elev": 80},
-    10: {"name": "Algaiarens - Cala Morell", "distance": 8.5, "min_elev": 0, "max_elev": 70},
-    11: {"name": "Cala Morell - Ciutadella", "distance": 10.5, "min_elev": 0, "max_elev": 35},
-    12: {"name": "Ciutadella - Cap d'Artrutx", "distance": 13.0, "min_elev": 0, "max_elev": 25},
-    13: {"name": "Cap d'Artrutx - Cala en Turqueta", "distance": 13.5, "min_elev": 0, "max_elev": 45},
-    14: {"name": "Cala en Turqueta - Cala Galdana", "distance": 8.0, "min_elev": 0, "max_elev": 60},
-    15: {"name": "Cala Galdana - Sant Tomàs", "distance": 11.5, "min_elev": 0, "max_elev": 70},
-    16: {"name": "Sant Tomàs - Son Bou", "distance": 6.5, "min_elev": 0, "max_elev": 55},
-    17: {"name": "Son Bou - Cala en Porter", "distance": 8.0, "min_elev": 0, "max_elev": 75},
-    18: {"name": "Cala en Porter - Binissafúller", "distance": 8.5, "min_elev": 0, "max_elev": 60},
-    19: {"name": "Binissafúller - Punta Prima", "distance": 7.0, "min_elev": 0, "max_elev": 40},
-    20: {"name": "Punta Prima - Maó", "distance": 12.5, "min_elev": 0, "max_elev": 50},
-}
-
-SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_DIR = os.path.dirname(SCRIPTS_DIR)
-
-
-def download_profile_image(route_num: int) -> str:
-    """Download the profile image for a route."""
-    url = f"https://www.camidecavalls.com/Imas/General/perfil{route_num}d.png"
-    local_path = os.path.join(SCRIPTS_DIR, f"perfil{route_num}d.png")
+import argparse
+from contextlib import redirect_stdout
+
+import trail_data
+from elevation_grid import ProfileLookup
+from elevation_series import downsample
+from generate_data_versions import write_data_versions
+from profiling import span, profiled_main, enabled as profiling_enabled
+
+
+def download_profile_image(trail: dict, stage: dict) -> str:
+    """Download the profile image for a stage."""
+    url = trail["sources"]["profileImageUrl"].format(number=stage["number"])
+    local_path = trail["sources"]["profileImage"].format(number=stage["number"])
 
     if not os.path.exists(local_path):
         print(f"Downloading {url}...")
-        urllib.request.urlretrieve(url, local_path)
+        import urllib.request
+        with span("download"):
+            urllib.request.urlretrieve(url, local_path)
     else:
         print(f"Using cached {local_path}")
 
@@ -93,14 +82,19 @@ def is_profile_pixel(r, g, b, a):
     return True
 
 
-def extract_profile(image_path: str, route_num: int) -> list:
+def extract_profile(image_path: str, stage: dict) -> list:
     """Extract elevation profile from image."""
-    img = Image.open(image_path)
-    route_info = ROUTE_DATA[route_num]
+    # Pillow is only needed here: imported lazily so the module loads without it
+    from PIL import Image
+    with span("decode"):
+        img = Image.open(image_path)
+        img.load()
+    calibration = stage["calibration"]
 
     print(f"Image: {img.width} x {img.height}")
-    print(f"Route {route_num}: {route_info['name']}")
-    print(f"Distance: {route_info['distance']}km, Elevation: {route_info['min_elev']}m - {route_info['max_elev']}m")
+    print(f"Route {stage['number']}: {stage['name']}")
+    print(f"Distance: {calibration['distanceKm']}km, "
+          f"Elevation: {calibration['minElevation']}m - {calibration['maxElevation']}m")
 
     # Extract raw Y values for each X - look for profile pixels (not white grid lines)
     raw_profile = []
@@ -149,10 +143,10 @@ def extract_profile(image_path: str, route_num: int) -> list:
     x_range = end_x - start_x
     y_range = y_max - y_min
 
-    min_elev = route_info['min_elev']
-    max_elev = route_info['max_elev']
+    min_elev = calibration['minElevation']
+    max_elev = calibration['maxElevation']
     elev_range = max_elev - min_elev
-    distance_km = route_info['distance']
+    distance_km = calibration['distanceKm']
 
     for i, (x, y) in enumerate(trimmed):
         # Map X to km
@@ -171,47 +165,37 @@ def extract_profile(image_path: str, route_num: int) -> list:
 
 
 def sample_profile(profile: list, target_points: int = 200) -> list:
-    """Sample profile to reduce number of points."""
+    """Sample profile to reduce number of points, keeping its shape and true peak (LTTB)."""
     if len(profile) <= target_points:
         return profile
 
-    step = len(profile) / target_points
-    sampled = []
-    for i in range(target_points):
-        idx = int(i * step)
-        sampled.append(profile[idx])
-
-    # Always include the last point
-    if profile[-1] not in sampled:
-        sampled.append(profile[-1])
+    kept = downsample([p[0] for p in profile], [p[1] for p in profile], target_points)
+    return [profile[i] for i in kept]
 
-    return sampled
 
-
-def save_profile(profile: list, route_num: int):
+def save_profile(profile: list, trail: dict, stage: dict):
     """Save profile to JSON file."""
-    route_info = ROUTE_DATA[route_num]
+    calibration = stage["calibration"]
 
     output = {
-        "route": route_num,
-        "name": route_info['name'],
-        "distance_km": route_info['distance'],
-        "min_elev": route_info['min_elev'],
-        "max_elev": route_info['max_elev'],
+        "route": stage["number"],
+        "name": stage["name"],
+        "distance_km": calibration['distanceKm'],
+        "min_elev": calibration['minElevation'],
+        "max_elev": calibration['maxElevation'],
         "points": profile
     }
 
-    output_path = os.path.join(SCRIPTS_DIR, f"route{route_num}_profile.json")
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    output_path = trail["outputs"]["profile"].format(number=stage["number"])
+    trail_data.atomic_write(output_path, json.dumps(output, indent=2))
 
     print(f"Saved to {output_path}")
     return output_path
 
 
-def print_profile_summary(profile: list, route_num: int):
+def print_profile_summary(profile: list, stage: dict):
     """Print a summary of the extracted profile."""
-    route_info = ROUTE_DATA[route_num]
+    distance_km = stage["calibration"]["distanceKm"]
 
     elevs = [p[1] for p in profile]
     print(f"\n--- Profile Summary ---")
@@ -224,82 +208,19 @@ def print_profile_summary(profile: list, route_num: int):
 
     # Key points
     print("\nKey elevations:")
-    km_targets = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, route_info['distance']]
+    km_targets = sorted(set(range(int(distance_km) + 1)) | {distance_km})
     for target in km_targets:
-        if target <= route_info['distance']:
+        if target <= distance_km:
             closest = min(profile, key=lambda p: abs(p[0] - target))
             print(f"  {closest[0]:.1f}km: {closest[1]:.1f}m")
 
 
-def haversine_distance(lon1, lat1, lon2, lat2):
-    """Calculate distance between two coordinates in km."""
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-
-def interpolate_elevation(km, profile):
-    """Interpolate elevation at a given km position."""
-    if km <= profile[0][0]:
-        return profile[0][1]
-    if km >= profile[-1][0]:
-        return profile[-1][1]
-
-    for i in range(len(profile) - 1):
-        if profile[i][0] <= km <= profile[i+1][0]:
-            km1, elev1 = profile[i]
-            km2, elev2 = profile[i+1]
-            if km2 == km1:
-                return elev1
-            t = (km - km1) / (km2 - km1)
-            return elev1 + t * (elev2 - elev1)
-
-    return profile[-1][1]
-
-
-def update_route_data(profile: list, route_num: int):
-    """Update RouteData.kt with the new elevation profile."""
-    routedata_path = os.path.join(
-        PROJECT_DIR,
-        "composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/data/RouteData.kt"
-    )
-
-    with open(routedata_path, 'r') as f:
-        content = f.read()
-
-    # Find the route's gpxData
-    next_route = route_num + 1
-    if route_num == 20:
-        # Last route - different pattern
-        pattern = rf'(id = {route_num},.*?gpxData = """)(.*?)(""".trimIndent\(\)\s*\)\s*\))'
-    else:
-        pattern = rf'(id = {route_num},.*?gpxData = """)(.*?)(""".trimIndent\(\)\s*\),\s*Route\(\s*id = {next_route})'
-
-    match = re.search(pattern, content, re.DOTALL)
-
-    if not match:
-        print(f"ERROR: Could not find Route {route_num} gpxData in RouteData.kt")
-        return False
-
-    gpx_json = match.group(2)
-    gpx_data = json.loads(gpx_json)
-    coords = gpx_data['coordinates']
-
-    print(f"\nFound {len(coords)} coordinates in Route {route_num} gpxData")
+def update_route_data(profile: list, stage_number: int, coords: list) -> list:
+    """The stage's coordinates with elevations interpolated from the profile."""
+    print(f"\nFound {len(coords)} coordinates in Route {stage_number} gpxData")
 
     # Calculate cumulative distance for each coordinate
-    cumulative_dist = [0.0]
-    for i in range(1, len(coords)):
-        lon1, lat1 = coords[i-1][0], coords[i-1][1]
-        lon2, lat2 = coords[i][0], coords[i][1]
-        dist = haversine_distance(lon1, lat1, lon2, lat2)
-        cumulative_dist.append(cumulative_dist[-1] + dist)
+    cumulative_dist = trail_data.cumulative_distances(coords)
 
     total_dist = cumulative_dist[-1]
     print(f"Total GPX distance: {total_dist:.2f}km")
@@ -313,11 +234,13 @@ def update_route_data(profile: list, route_num: int):
 
     # Update elevations
     updated_coords = []
-    for i, coord in enumerate(coords):
-        lon, lat = coord[0], coord[1]
-        km = cumulative_dist[i]
-        new_elev = round(interpolate_elevation(km, profile), 1)
-        updated_coords.append([lon, lat, new_elev])
+    with span("interpolate"):
+        lookup = ProfileLookup(profile)
+        for i, coord in enumerate(coords):
+            lon, lat = coord[0], coord[1]
+            km = cumulative_dist[i]
+            new_elev = round(lookup.at(km), 1)
+            updated_coords.append([lon, lat, new_elev])
 
     # Show comparison
     print("\nElevation update preview:")
@@ -327,77 +250,131 @@ def update_route_data(profile: list, route_num: int):
     print(f"  Peak ({cumulative_dist[max_idx]:.2f}km): new={updated_coords[max_idx][2]}m")
 
     print(f"  End: old={coords[-1][2] if len(coords[-1]) > 2 else 'N/A'}, new={updated_coords[-1][2]}")
+    return updated_coords
 
-    # Create updated gpxData
-    updated_gpx = {"type": "LineString", "coordinates": updated_coords}
-    new_gpx_json = json.dumps(updated_gpx, separators=(',', ':'))
-
-    # Update content
-    new_content = content[:match.start(2)] + new_gpx_json + content[match.end(2):]
-
-    with open(routedata_path, 'w') as f:
-        f.write(new_content)
 
-    print(f"\nUpdated RouteData.kt for Route {route_num}")
-    return True
-
-
-def process_route(route_num: int, update: bool = False):
-    """Process a single route."""
+@span("process_route")
+def process_route(trail: dict, stage: dict, coords: list = None):
+    """Process a single route; returns (sampled profile, updated coordinates or None)."""
     print(f"\n{'='*60}")
-    print(f"Processing Route {route_num}")
+    print(f"Processing Route {stage['number']}")
     print('='*60)
 
     # Download image
-    image_path = download_profile_image(route_num)
+    image_path = download_profile_image(trail, stage)
 
     # Extract profile
-    profile = extract_profile(image_path, route_num)
+    with span("extract"):
+        profile = extract_profile(image_path, stage)
 
     # Sample to reduce points
-    sampled = sample_profile(profile, 200)
+    with span("sample"):
+        sampled = sample_profile(profile, trail["profilePoints"])
     print(f"Sampled to {len(sampled)} points")
 
     # Print summary
-    print_profile_summary(sampled, route_num)
+    print_profile_summary(sampled, stage)
 
     # Save to JSON
-    save_profile(sampled, route_num)
+    with span("write"):
+        save_profile(sampled, trail, stage)
 
-    # Update RouteData.kt if requested
-    if update:
-        update_route_data(sampled, route_num)
+    # New RouteData.kt coordinates if requested (written by main() for all stages at once)
+    updated = None
+    if coords is not None:
+        with span("update"):
+            updated = update_route_data(sampled, stage["number"], coords)
 
-    return sampled
+    return sampled, updated
+
+
+def _process_worker(trail: dict, stage: dict, coords: list) -> tuple:
+    """process_route() in a worker process: (output, updated coordinates, error)."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            _, updated = process_route(trail, stage, coords)
+            return output.getvalue(), updated, None
+        except Exception as e:
+            return output.getvalue(), None, str(e)
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 extract_all_routes.py <route_number|all> [--update]")
-        print("Example: python3 extract_all_routes.py 1")
-        print("         python3 extract_all_routes.py all --update")
+    parser = argparse.ArgumentParser(description="Extract elevation profiles from the official profile images")
+    parser.add_argument("route", help="stage number or 'all'")
+    parser.add_argument("--update", action="store_true", help="write the new elevations to RouteData.kt")
+    parser.add_argument("--trail", default=trail_data.DEFAULT_TRAIL, help="trail id in trails.json (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="stages processed in parallel")
+    args = parser.parse_args()
+
+    try:
+        trail = trail_data.load_trail(args.trail)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
         sys.exit(1)
 
-    update = "--update" in sys.argv
-    route_arg = sys.argv[1]
+    if args.route == "all":
+        stages = trail["stages"]
+    else:
+        try:
+            stages = [trail["stagesByNumber"][int(args.route)]]
+        except (ValueError, KeyError):
+            print(f"Invalid route number: {args.route} (trail {trail['id']} has stages "
+                  f"{', '.join(str(stage['number']) for stage in trail['stages'])})")
+            sys.exit(1)
+
+    coords = {}
+    if args.update:
+        coords = {stage["number"]: stage["coordinates"] for stage in trail_data.load_stages(trail["routeData"])}
+        missing = [stage["number"] for stage in stages if stage["number"] not in coords]
+        if missing:
+            print(f"ERROR: Route(s) {', '.join(map(str, missing))} not found in {trail['routeData']}")
+            sys.exit(1)
 
-    if route_arg == "all":
-        for route_num in range(1, 21):
+    updates = {}
+    failed = []
+    jobs = max(1, min(args.jobs, len(stages)))
+    if profiling_enabled():
+        # The worker processes' spans and cProfile data would be lost
+        jobs = 1
+    if jobs == 1:
+        for stage in stages:
             try:
-                process_route(route_num, update)
+                _, updated = process_route(trail, stage, coords.get(stage["number"]))
+                if updated is not None:
+                    updates[stage["number"]] = updated
             except Exception as e:
-                print(f"ERROR processing route {route_num}: {e}")
+                print(f"ERROR processing route {stage['number']}: {e}")
+                failed.append(stage["number"])
     else:
-        try:
-            route_num = int(route_arg)
-            if route_num < 1 or route_num > 20:
-                print("Route number must be between 1 and 20")
-                sys.exit(1)
-            process_route(route_num, update)
-        except ValueError:
-            print(f"Invalid route number: {route_arg}")
-            sys.exit(1)
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_process_worker, trail, stage, coords.get(stage["number"])) for stage in stages]
+            # Printed in stage order, each stage's output in one piece
+            for stage, future in zip(stages, futures):
+                output, updated, error = future.result()
+                print(output, end="")
+                if error:
+                    print(f"ERROR processing route {stage['number']}: {error}")
+                    failed.append(stage["number"])
+                elif updated is not None:
+                    updates[stage["number"]] = updated
+
+    if updates:
+        with span("write"):
+            trail_data.write_stage_coordinates(updates, trail["routeData"])
+        print(f"\nUpdated {trail['routeData']} for Route(s) {', '.join(map(str, sorted(updates)))}")
+
+    if args.update and trail["routeData"] == trail_data.ROUTE_DATA_PATH:
+        # New elevations change the route geometry hash, so the app re-seeds the routes
+        print("\nUpdating DataVersions.kt...")
+        write_data_versions()
+
+    if failed:
+        # Non-zero exit so build_data.py restores the outputs and stops the dependent steps
+        print(f"\nFailed routes: {', '.join(map(str, failed))}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
+    profiled_main(main)
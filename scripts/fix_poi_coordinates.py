@@ -4,60 +4,17 @@ Fix POI coordinates by converting UTM coordinates from official map to WGS84.
 Updates the POI JSON with correct coordinates.
 """
 
+import os
+import sys
 import json
-import math
 
-def utm_to_wgs84(easting, northing, zone=31):
-    """
-    Convert UTM Zone 31N coordinates to WGS84 (latitude, longitude).
-
-    This uses the standard UTM to WGS84 conversion formulas.
-    Zone 31N covers Menorca (Balearic Islands).
-    """
-    # WGS84 parameters
-    a = 6378137.0  # semi-major axis
-    e = 0.081819191  # eccentricity
-    e_sq = e * e
-
-    # UTM parameters for Zone 31N
-    k0 = 0.9996  # scale factor
-    lon_origin = math.radians((zone - 1) * 6 - 180 + 3)  # Central meridian for zone 31 = 3°E
-
-    # Remove false easting/northing
-    x = easting - 500000.0
-    y = northing
-
-    # Calculate footprint latitude
-    M = y / k0
-    mu = M / (a * (1 - e_sq/4 - 3*e_sq*e_sq/64 - 5*e_sq*e_sq*e_sq/256))
-
-    e1 = (1 - math.sqrt(1 - e_sq)) / (1 + math.sqrt(1 - e_sq))
-
-    phi1 = mu + (3*e1/2 - 27*e1*e1*e1/32) * math.sin(2*mu) + \
-           (21*e1*e1/16 - 55*e1*e1*e1*e1/32) * math.sin(4*mu) + \
-           (151*e1*e1*e1/96) * math.sin(6*mu)
-
-    # Calculate latitude and longitude
-    C1 = e_sq * math.cos(phi1) * math.cos(phi1) / (1 - e_sq)
-    T1 = math.tan(phi1) * math.tan(phi1)
-    N1 = a / math.sqrt(1 - e_sq * math.sin(phi1) * math.sin(phi1))
-    R1 = a * (1 - e_sq) / math.pow(1 - e_sq * math.sin(phi1) * math.sin(phi1), 1.5)
-    D = x / (N1 * k0)
-
-    latitude = phi1 - (N1 * math.tan(phi1) / R1) * \
-               (D*D/2 - (5 + 3*T1 + 10*C1 - 4*C1*C1 - 9*e_sq) * D*D*D*D/24 + \
-                (61 + 90*T1 + 298*C1 + 45*T1*T1 - 252*e_sq - 3*C1*C1) * D*D*D*D*D*D/720)
-
-    longitude = lon_origin + \
-                (D - (1 + 2*T1 + C1) * D*D*D/6 + \
-                 (5 - 2*C1 + 28*T1 - 3*C1*C1 + 8*e_sq + 24*T1*T1) * D*D*D*D*D/120) / math.cos(phi1)
-
-    # Convert to degrees
-    latitude = math.degrees(latitude)
-    longitude = math.degrees(longitude)
-
-    return latitude, longitude
+import trail_data
+from geodesy import utm_to_wgs84
+from profiling import span, profiled_main
 
+POIS_DIR = os.path.join(trail_data.SCRIPTS_DIR, "camidecavalls_pois")
+COORDINATES_PATH = os.path.join(POIS_DIR, "coordinates_from_map.json")
+REPORT_PATH = os.path.join(POIS_DIR, "coordinate_changes_report.json")
 
 def fix_coordinates():
     """
@@ -68,13 +25,13 @@ def fix_coordinates():
 
     # Load UTM coordinates from map
     print("\n📖 Loading UTM coordinates from map...")
-    with open('scripts/camidecavalls_pois/coordinates_from_map.json', 'r') as f:
+    with span("read"), open(COORDINATES_PATH, 'r') as f:
         utm_coords = json.load(f)
     print(f"   Found {len(utm_coords)} POIs in map data")
 
     # Load current POI data
     print("\n📖 Loading current POI data...")
-    with open('scripts/camidecavalls_pois/pois_all_translations_complete.json', 'r') as f:
+    with span("read"), open(trail_data.POIS_PATH, 'r') as f:
         pois = json.load(f)
     print(f"   Found {len(pois)} POIs in JSON")
 
@@ -98,7 +55,8 @@ def fix_coordinates():
         utm_x = utm_coords[poi_id]['longitude']  # Easting (X)
 
         # Convert to WGS84
-        new_lat, new_lon = utm_to_wgs84(utm_x, utm_y)
+        with span("convert"):
+            new_lat, new_lon = utm_to_wgs84(utm_x, utm_y)
 
         # Get old coordinates
         old_lat = poi['latitude']
@@ -124,14 +82,15 @@ def fix_coordinates():
 
     # Save updated JSON
     print(f"\n💾 Saving updated POI data...")
-    output_file = 'scripts/camidecavalls_pois/pois_all_translations_complete.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(pois, f, ensure_ascii=False, indent=2)
+    pois_json = json.dumps(pois, ensure_ascii=False, indent=2)
+    with span("write"):
+        trail_data.atomic_write(trail_data.POIS_PATH, pois_json)
 
-    # Save changes report
-    report_file = 'scripts/camidecavalls_pois/coordinate_changes_report.json'
-    with open(report_file, 'w', encoding='utf-8') as f:
-        json.dump(changes, f, ensure_ascii=False, indent=2)
+    # Save changes report; a rerun with nothing left to fix keeps the last one
+    report_file = REPORT_PATH
+    if changes:
+        with span("write"):
+            trail_data.atomic_write(report_file, json.dumps(changes, ensure_ascii=False, indent=2))
 
     # Print summary
     print("\n" + "=" * 50)
@@ -140,7 +99,7 @@ def fix_coordinates():
     print(f"   POIs from map: {len(utm_coords)}")
     print(f"   ✅ Updated: {updated_count}")
     print(f"   ⏭️  Not found in map: {not_found_count}")
-    print(f"   📝 Changes report: {report_file}")
+    print(f"   📝 Changes report: {report_file if changes else 'unchanged (no changes)'}")
 
     if changes:
         print(f"\n🔍 TOP 10 BIGGEST CHANGES:")
@@ -153,17 +112,22 @@ def fix_coordinates():
     print("=" * 50)
 
     # Also copy to app resources
-    app_file = 'composeApp/src/commonMain/composeResources/files/pois.json'
+    app_file = trail_data.APP_POIS_PATH
     print(f"\n📱 Copying to app resources: {app_file}")
-    with open(app_file, 'w', encoding='utf-8') as f:
-        json.dump(pois, f, ensure_ascii=False, indent=2)
+    with span("write"):
+        trail_data.atomic_write(app_file, pois_json)
     print("   ✅ App resources updated")
 
 
-if __name__ == '__main__':
+def main():
     try:
         fix_coordinates()
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    profiled_main(main)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Build the virtual "Complete Route" (route 0) from the 20 stages.
+
+Usage:
+    python3 generate_complete_route.py [--profile-points 256] [--output PATH]
+
+The app shows the complete loop as route 0 and used to assemble it at runtime
+from every stage's gpxData. This script produces it once, at build time:
+- the stages are joined in order; each must start where the previous one
+  ends (within validate_route_data.CONTINUITY_METERS, 20 -> 1 included) and
+  run in the loop direction, otherwise the script exits 1 without writing
+- the endpoint shared by consecutive stages is kept once, so the cumulative
+  distance is continuous across stage boundaries
+- Route fields aggregated like the app does (sums, extremes, asphalt weighted
+  by distance; distanceKm is the joined geometry's length instead of the
+  hardcoded 185.0) plus the statistics of the joined geometry
+  (route_stats.json)
+- per-stage index and km ranges into the joined line
+- the combined GeoJSON LineString, ready to use as the route's gpxData
+- a downsampled combined elevation profile (LTTB, elevation_series.py)
+
+Writes composeResources/files/complete_route.json, which RouteDetailScreenModel
+loads for route 0; rerun it (build_data.py does) whenever RouteData.kt changes.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import trail_data
+from elevation_series import downsample
+from generate_route_stats import compute_stats
+from validate_route_data import CONTINUITY_METERS, distance
+
+DEFAULT_OUTPUT = os.path.join(trail_data.APP_FILES_DIR, "complete_route.json")
+DEFAULT_PROFILE_POINTS = 256
+
+
+def join_stages(stages: list) -> tuple:
+    """(joined coordinates, per-stage (first, last) indexes, problems) for the stages in order."""
+    joined = []
+    ranges = []
+    problems = []
+    for i, stage in enumerate(stages):
+        coords = stage["coordinates"]
+        if len(coords) < 2:
+            problems.append(f"stage {stage['number']} has {len(coords)} points")
+            continue
+        if joined:
+            previous_end = joined[-1]
+            gap = distance(previous_end, coords[0])
+            if gap > CONTINUITY_METERS:
+                if distance(previous_end, coords[-1]) <= CONTINUITY_METERS:
+                    problems.append(f"stage {stage['number']} runs backwards: its end meets stage "
+                                    f"{stages[i - 1]['number']}")
+                else:
+                    problems.append(f"stage {stage['number']} starts {gap:.0f} m away from the end of stage "
+                                    f"{stages[i - 1]['number']}")
+        first = len(joined)
+        if joined and coords[0][:2] == joined[-1][:2]:
+            # The stage starts on the previous stage's last point
+            coords = coords[1:]
+            first -= 1
+        joined.extend(coords)
+        ranges.append((first, len(joined) - 1))
+
+    if joined:
+        gap = distance(joined[-1], joined[0])
+        if gap > CONTINUITY_METERS:
+            problems.append(f"the loop does not close: stage {stages[-1]['number']} ends {gap:.0f} m away "
+                            f"from the start of stage {stages[0]['number']}")
+    return joined, ranges, problems
+
+
+def build_complete_route(stages: list, profile_points: int) -> dict:
+    joined, ranges, problems = join_stages(stages)
+    if problems:
+        raise ValueError("\n".join(problems))
+
+    stats = compute_stats(joined)
+    cumulative_meters = stats.pop("cumulativeDistanceMeters")
+    stats.pop("kmSplits")
+    stages_km = sum(stage["distanceKm"] for stage in stages)
+    elevations = [c[2] for c in joined]
+    profile = downsample(cumulative_meters, elevations, profile_points)
+
+    return {
+        "id": 0,
+        "number": 0,
+        "startPoint": stages[0]["startPoint"],
+        "endPoint": stages[-1]["endPoint"],
+        "distanceKm": round(stats["distanceKm"], 1),
+        "elevationGainMeters": sum(stage["elevationGainMeters"] for stage in stages),
+        "elevationLossMeters": sum(stage["elevationLossMeters"] for stage in stages),
+        "maxAltitudeMeters": max(stage["maxAltitudeMeters"] for stage in stages),
+        "minAltitudeMeters": min(stage["minAltitudeMeters"] for stage in stages),
+        "asphaltPercentage": int(sum(s["asphaltPercentage"] * s["distanceKm"] for s in stages) / stages_km),
+        "estimatedDurationMinutes": sum(stage["estimatedDurationMinutes"] for stage in stages),
+        "geometry": stats,
+        "stages": [
+            {"number": stage["number"], "firstIndex": first, "lastIndex": last,
+             "startMeters": cumulative_meters[first], "endMeters": cumulative_meters[last]}
+            for stage, (first, last) in zip(stages, ranges)
+        ],
+        "cumulativeDistanceMeters": cumulative_meters,
+        "profile": {
+            "points": len(profile),
+            "distanceMeters": [cumulative_meters[i] for i in profile],
+            "elevationMeters": [elevations[i] for i in profile],
+        },
+        "gpxData": json.dumps({"type": "LineString", "coordinates": joined}, separators=(',', ':')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the virtual Complete Route from the stages")
+    parser.add_argument("--profile-points", type=int, default=DEFAULT_PROFILE_POINTS,
+                        help="points of the combined elevation profile (default: %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    try:
+        route = build_complete_route(stages, args.profile_points)
+    except ValueError as e:
+        print(f"ERROR: cannot join the stages:\n{e}")
+        sys.exit(1)
+
+    geometry = route["geometry"]
+    print(f"Joined {len(stages)} stages: {geometry['points']} points "
+          f"({sum(len(s['coordinates']) for s in stages) - geometry['points']} shared endpoints dropped)")
+    print(f"  Stage fields: {route['distanceKm']:.1f} km, +{route['elevationGainMeters']}m / "
+          f"-{route['elevationLossMeters']}m, {route['estimatedDurationMinutes'] // 60}h"
+          f"{route['estimatedDurationMinutes'] % 60:02d}, {route['asphaltPercentage']}% asphalt")
+    print(f"  Geometry:     {geometry['distanceKm']:.2f} km, +{geometry['elevationGainMeters']}m / "
+          f"-{geometry['elevationLossMeters']}m, {geometry['minAltitudeMeters']}-{geometry['maxAltitudeMeters']}m")
+    print(f"  Profile: {route['profile']['points']} points")
+
+    trail_data.atomic_write(args.output, json.dumps(route, ensure_ascii=False, separators=(',', ':')))
+    print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compute content hashes of the bundled data sets and emit them as Kotlin constants.
+
+Usage:
+    python3 generate_data_versions.py          # (re)write DataVersions.kt
+    python3 generate_data_versions.py --check  # exit 1 if DataVersions.kt is stale
+
+Data sets:
+- ROUTES_GEOMETRY: the gpxData coordinates of every stage
+- ROUTES_TEXT: every other RouteEntity field (names, descriptions, stats)
+- POIS: files/pois.json, the file the app seeds PointOfInterestEntity from
+
+The hashes are computed on a canonical JSON form, so reformatting RouteData.kt
+or pois.json does not change them. The app stores the hashes it last seeded
+with and only re-seeds a table when its hash differs, instead of relying on a
+hand-bumped DATABASE_VERSION.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+import trail_data
+
+DATA_VERSIONS_PATH = os.path.join(
+    trail_data.PROJECT_DIR,
+    "composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/data/DataVersions.kt"
+)
+
+# Number of hex digits kept from the SHA-256 digest
+HASH_LENGTH = 16
+
+
+def content_hash(value) -> str:
+    """SHA-256 of the canonical JSON form of `value`, truncated to HASH_LENGTH hex digits."""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def compute_hashes(stages: list, pois: list) -> dict:
+    """Return {constant name: hash} for every data set."""
+    geometry = [[stage["number"], stage["coordinates"]] for stage in stages]
+    texts = [
+        {key: value for key, value in stage.items() if key not in ("coordinates", "gpxData")}
+        for stage in stages
+    ]
+    return {
+        "ROUTES_GEOMETRY": content_hash(geometry),
+        "ROUTES_TEXT": content_hash(texts),
+        "POIS": content_hash(sorted(pois, key=lambda poi: int(poi["id"]))),
+    }
+
+
+def render_kotlin(hashes: dict) -> str:
+    """Render the DataVersions.kt source."""
+    constants = "\n".join(f'    const val {name} = "{value}"' for name, value in hashes.items())
+    return f'''package com.followmemobile.camidecavalls.data
+
+/**
+ * Content hashes of the bundled data sets.
+ *
+ * GENERATED by scripts/generate_data_versions.py - do not edit by hand.
+ * The app stores the hashes it last seeded with and only re-seeds the tables
+ * whose data changed.
+ */
+object DataVersions {{
+{constants}
+}}
+'''
+
+
+def write_data_versions(path: str = DATA_VERSIONS_PATH, check: bool = False) -> bool:
+    """
+    Regenerate DataVersions.kt. Returns True if the file changed.
+
+    With `check`, the file is left untouched and the return value tells
+    whether it would have changed.
+    """
+    hashes = compute_hashes(trail_data.load_stages(), trail_data.load_pois(trail_data.APP_POIS_PATH))
+    source = render_kotlin(hashes)
+
+    old_source = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            old_source = f.read()
+
+    for name, value in hashes.items():
+        print(f"  {name}: {value}")
+
+    if source == old_source:
+        print("DataVersions.kt is up to date")
+        return False
+    if check:
+        print("DataVersions.kt is stale - run: python3 generate_data_versions.py")
+        return True
+
+    trail_data.atomic_write(path, source)
+    print(f"Updated {path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emit content hashes of the bundled data as Kotlin constants")
+    parser.add_argument("--check", action="store_true", help="only verify that DataVersions.kt is current")
+    args = parser.parse_args()
+
+    changed = write_data_versions(check=args.check)
+    if args.check and changed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Generate an offline vector-tile pack (MBTiles) with the trail and the POIs.
+
+Usage:
+    python3 generate_mbtiles.py [--min-zoom 8] [--max-zoom 16] [--output PATH]
+
+The script:
+1. Loads every stage's gpxData from RouteData.kt and the POIs from the scraped JSON
+2. Projects the geometry to Web Mercator once
+3. For every zoom level, simplifies the lines (Douglas-Peucker) with a tolerance
+   that matches the tile resolution, then clips them to each tile (plus buffer)
+4. Encodes the tiles as Mapbox Vector Tiles (layers: trail, stages, pois)
+5. Writes the gzipped tiles and the metadata to an MBTiles (SQLite) file
+
+MapLibre can load the pack as a local vector source and only decode the tiles
+that are on screen, so rendering cost no longer grows with the amount of geometry.
+"""
+
+import os
+import sys
+import gzip
+import json
+import math
+import struct
+import sqlite3
+import argparse
+
+import trail_data
+from geodesy import douglas_peucker
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "camidecavalls.mbtiles")
+
+EXTENT = 4096           # Tile coordinate space (MVT default)
+BUFFER = 64             # Extra tile units around each tile so line joins render cleanly
+SIMPLIFY_TOLERANCE = 4  # Douglas-Peucker tolerance, in tile units (1/16 of a 256px screen pixel)
+
+# MVT geometry types and commands
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+CMD_MOVE_TO = 1
+CMD_LINE_TO = 2
+
+
+# --- Protobuf encoding -------------------------------------------------------
+
+def encode_varint(value: int) -> bytes:
+    """Encode a non-negative integer as a protobuf varint."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(value: int) -> int:
+    """Map a signed integer to an unsigned one (protobuf sint32 encoding)."""
+    return (value << 1) ^ (value >> 31)
+
+
+def field_varint(field: int, value: int) -> bytes:
+    return encode_varint(field << 3) + encode_varint(value)
+
+
+def field_bytes(field: int, data: bytes) -> bytes:
+    return encode_varint((field << 3) | 2) + encode_varint(len(data)) + data
+
+
+def field_packed(field: int, values: list) -> bytes:
+    return field_bytes(field, b"".join(encode_varint(v) for v in values))
+
+
+def encode_value(value) -> bytes:
+    """Encode a feature property as an MVT Value message."""
+    if isinstance(value, bool):
+        return field_varint(7, int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return field_varint(5, value)
+        return field_varint(6, (value << 1) ^ (value >> 63))
+    if isinstance(value, float):
+        return encode_varint((3 << 3) | 1) + struct.pack("<d", value)
+    return field_bytes(1, str(value).encode("utf-8"))
+
+
+# --- Geometry ----------------------------------------------------------------
+
+def project(lon: float, lat: float) -> tuple:
+    """Project WGS84 to Web Mercator world coordinates in the [0, 1] range."""
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def simplify(points: list, tolerance: float) -> list:
+    """Douglas-Peucker simplification (geodesy.douglas_peucker, keeps both endpoints)."""
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+    kept, _ = douglas_peucker([p[0] for p in points], [p[1] for p in points], tolerance)
+    return [points[i] for i in kept]
+
+
+def clip_segment(x0, y0, x1, y1, xmin, ymin, xmax, ymax):
+    """
+    Liang-Barsky segment clipping.
+
+    Returns (start, end, clipped_start, clipped_end) or None when the segment
+    is entirely outside the box.
+    """
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+    start = (x0 + t0 * dx, y0 + t0 * dy) if t0 > 0 else (x0, y0)
+    end = (x0 + t1 * dx, y0 + t1 * dy) if t1 < 1 else (x1, y1)
+    return start, end, t0 > 0, t1 < 1
+
+
+def clip_line(points: list, segments: list, xmin, ymin, xmax, ymax) -> list:
+    """
+    Clip the given segments of a polyline to a box.
+
+    `segments` are the (sorted) indices i of the segments points[i] -> points[i+1]
+    that may touch the box. Returns the list of parts that stay inside.
+    """
+    parts = []
+    current = []
+    previous = None
+    for i in segments:
+        clipped = clip_segment(*points[i], *points[i + 1], xmin, ymin, xmax, ymax)
+        if clipped is None:
+            continue
+        start, end, entered, exited = clipped
+        if entered or not current or previous != i - 1:
+            # (Re-)entering the box starts a new part
+            if len(current) > 1:
+                parts.append(current)
+            current = [start]
+        current.append(end)
+        previous = i
+        if exited:
+            parts.append(current)
+            current = []
+    if len(current) > 1:
+        parts.append(current)
+    return parts
+
+
+def segments_by_tile(points: list, zoom: int, buffer: float) -> dict:
+    """Map every tile (x, y) to the segments whose buffered bounding box touches it."""
+    scale = 1 << zoom
+    tiles = {}
+    for i in range(len(points) - 1):
+        (x0, y0), (x1, y1) = points[i], points[i + 1]
+        tx_min = int((min(x0, x1) - buffer) * scale)
+        tx_max = int((max(x0, x1) + buffer) * scale)
+        ty_min = int((min(y0, y1) - buffer) * scale)
+        ty_max = int((max(y0, y1) + buffer) * scale)
+        for tx in range(max(tx_min, 0), min(tx_max, scale - 1) + 1):
+            for ty in range(max(ty_min, 0), min(ty_max, scale - 1) + 1):
+                tiles.setdefault((tx, ty), []).append(i)
+    return tiles
+
+
+# --- Tile encoding -------------------------------------------------------------
+
+def to_tile_coords(points: list, zoom: int, tx: int, ty: int) -> list:
+    """Convert world coordinates to integer tile coordinates, dropping repeated points."""
+    scale = (1 << zoom) * EXTENT
+    out = []
+    for x, y in points:
+        p = (round(x * scale - tx * EXTENT), round(y * scale - ty * EXTENT))
+        if not out or out[-1] != p:
+            out.append(p)
+    return out
+
+
+def encode_geometry(geom_type: int, parts: list) -> list:
+    """Encode points or line parts as an MVT command stream."""
+    commands = []
+    cx, cy = 0, 0
+    if geom_type == GEOM_POINT:
+        commands.append((len(parts) << 3) | CMD_MOVE_TO)
+        for x, y in parts:
+            commands += [zigzag(x - cx), zigzag(y - cy)]
+            cx, cy = x, y
+        return commands
+
+    for part in parts:
+        if len(part) < 2:
+            continue
+        x, y = part[0]
+        commands += [(1 << 3) | CMD_MOVE_TO, zigzag(x - cx), zigzag(y - cy)]
+        cx, cy = x, y
+        commands.append(((len(part) - 1) << 3) | CMD_LINE_TO)
+        for x, y in part[1:]:
+            commands += [zigzag(x - cx), zigzag(y - cy)]
+            cx, cy = x, y
+    return commands
+
+
+def encode_layer(name: str, features: list) -> bytes:
+    """Encode a layer; each feature is (id, geom_type, commands, properties)."""
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    body = bytearray()
+
+    for feature_id, geom_type, commands, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags += [key_index[key], value_index[value_key]]
+
+        feature = bytearray()
+        if feature_id is not None:
+            feature += field_varint(1, feature_id)
+        feature += field_packed(2, tags)
+        feature += field_varint(3, geom_type)
+        feature += field_packed(4, commands)
+        body += field_bytes(2, bytes(feature))
+
+    layer = bytearray()
+    layer += field_varint(15, 2)
+    layer += field_bytes(1, name.encode("utf-8"))
+    layer += body
+    for key in keys:
+        layer += field_bytes(3, key.encode("utf-8"))
+    for value in values:
+        layer += field_bytes(4, encode_value(value))
+    layer += field_varint(5, EXTENT)
+    return bytes(layer)
+
+
+# --- Source features -----------------------------------------------------------
+
+def build_features() -> dict:
+    """Load the trail data and project it to world coordinates, grouped by layer."""
+    stages = trail_data.load_stages()
+    pois = trail_data.load_pois()
+
+    layers = {"trail": [], "stages": [], "pois": []}
+
+    loop = trail_data.combined_coordinates(stages)
+    layers["trail"].append({
+        "id": 0,
+        "type": GEOM_LINESTRING,
+        "points": [project(c[0], c[1]) for c in loop],
+        "properties": {"name": "Camí de Cavalls"},
+    })
+
+    for stage in stages:
+        layers["stages"].append({
+            "id": stage["number"],
+            "type": GEOM_LINESTRING,
+            "points": [project(c[0], c[1]) for c in stage["coordinates"]],
+            "properties": {
+                "number": stage["number"],
+                "name": stage["name"],
+                "distanceKm": stage["distanceKm"],
+                "difficulty": stage["difficulty"],
+            },
+        })
+
+    for poi in pois:
+        properties = {"id": int(poi["id"]), "type": poi["type"]}
+        for lang in trail_data.LANGUAGES:
+            properties[f"name_{lang}"] = poi["names"].get(lang) or None
+        layers["pois"].append({
+            "id": int(poi["id"]),
+            "type": GEOM_POINT,
+            "points": [project(poi["longitude"], poi["latitude"])],
+            "properties": properties,
+        })
+
+    print(f"Loaded {len(stages)} stages ({len(loop)} loop points) and {len(pois)} POIs")
+    return layers
+
+
+def build_zoom(layers: dict, zoom: int) -> dict:
+    """Build every non-empty tile for one zoom level. Returns {(x, y): encoded tile}."""
+    world_extent = (1 << zoom) * EXTENT
+    tolerance = SIMPLIFY_TOLERANCE / world_extent
+    buffer = BUFFER / world_extent
+    scale = 1 << zoom
+
+    # tile -> layer name -> features
+    tiles = {}
+
+    for layer_name, features in layers.items():
+        for feature in features:
+            if feature["type"] == GEOM_POINT:
+                x, y = feature["points"][0]
+                tile = (int(x * scale), int(y * scale))
+                tiles.setdefault(tile, {}).setdefault(layer_name, []).append(
+                    (feature["id"], GEOM_POINT, encode_geometry(
+                        GEOM_POINT, to_tile_coords(feature["points"], zoom, *tile)), feature["properties"]))
+                continue
+
+            simplified = simplify(feature["points"], tolerance)
+            for (tx, ty), segments in segments_by_tile(simplified, zoom, buffer).items():
+                parts = clip_line(
+                    simplified, segments,
+                    tx / scale - buffer, ty / scale - buffer,
+                    (tx + 1) / scale + buffer, (ty + 1) / scale + buffer,
+                )
+                parts = [to_tile_coords(part, zoom, tx, ty) for part in parts]
+                parts = [part for part in parts if len(part) > 1]
+                if not parts:
+                    continue
+                tiles.setdefault((tx, ty), {}).setdefault(layer_name, []).append(
+                    (feature["id"], GEOM_LINESTRING, encode_geometry(GEOM_LINESTRING, parts), feature["properties"]))
+
+    encoded = {}
+    for tile, tile_layers in tiles.items():
+        data = b"".join(field_bytes(3, encode_layer(name, feats)) for name, feats in tile_layers.items())
+        encoded[tile] = gzip.compress(data, 9)
+    return encoded
+
+
+# --- MBTiles -------------------------------------------------------------------
+
+def layer_metadata(layers: dict, min_zoom: int, max_zoom: int) -> list:
+    """Describe the vector layers for the MBTiles `json` metadata entry."""
+    vector_layers = []
+    for name, features in layers.items():
+        fields = {}
+        for feature in features:
+            for key, value in feature["properties"].items():
+                fields[key] = "Number" if isinstance(value, (int, float)) else "String"
+        vector_layers.append({"id": name, "fields": fields, "minzoom": min_zoom, "maxzoom": max_zoom})
+    return vector_layers
+
+
+def write_mbtiles(path: str, layers: dict, min_zoom: int, max_zoom: int):
+    """Generate all zoom levels and write them to a fresh MBTiles file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    db.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+
+    all_x = [p[0] for feats in layers.values() for f in feats for p in f["points"]]
+    all_y = [p[1] for feats in layers.values() for f in feats for p in f["points"]]
+    west = min(all_x) * 360.0 - 180.0
+    east = max(all_x) * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * min(all_y)))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * max(all_y)))))
+
+    total_tiles = 0
+    total_bytes = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        tiles = build_zoom(layers, zoom)
+        rows = [
+            (zoom, x, (1 << zoom) - 1 - y, sqlite3.Binary(data))  # MBTiles uses TMS rows
+            for (x, y), data in tiles.items()
+        ]
+        db.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", rows)
+        zoom_bytes = sum(len(r[3]) for r in rows)
+        total_tiles += len(rows)
+        total_bytes += zoom_bytes
+        print(f"  z{zoom}: {len(rows)} tiles, {zoom_bytes / 1024:.1f} KB")
+
+    metadata = {
+        "name": "Camí de Cavalls",
+        "format": "pbf",
+        "type": "overlay",
+        "version": "1",
+        "description": "Camí de Cavalls stages, complete loop and points of interest",
+        "minzoom": str(min_zoom),
+        "maxzoom": str(max_zoom),
+        "bounds": f"{west:.6f},{south:.6f},{east:.6f},{north:.6f}",
+        "center": f"{(west + east) / 2:.6f},{(south + north) / 2:.6f},{min_zoom}",
+        "json": json.dumps({"vector_layers": layer_metadata(layers, min_zoom, max_zoom)}),
+    }
+    db.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    db.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+
+    os.replace(tmp_path, path)
+    print(f"\nWrote {total_tiles} tiles ({total_bytes / 1024:.1f} KB of tile data) to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate an offline MBTiles vector-tile pack")
+    parser.add_argument("--min-zoom", type=int, default=8)
+    parser.add_argument("--max-zoom", type=int, default=16)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if not 0 <= args.min_zoom <= args.max_zoom <= 22:
+        print("Zoom levels must satisfy 0 <= min-zoom <= max-zoom <= 22")
+        sys.exit(1)
+
+    layers = build_features()
+    print(f"Generating zoom levels {args.min_zoom}-{args.max_zoom}...")
+    write_mbtiles(args.output, layers, args.min_zoom, args.max_zoom)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Precompute per-stage geometry statistics from the RouteData.kt coordinates.
+
+Usage:
+    python3 generate_route_stats.py [--hysteresis 3.0] [--output PATH]
+
+For every stage and for the complete loop the script computes:
+- cumulative distance (m) at every coordinate (Haversine)
+- elevation gain/loss smoothed with a hysteresis threshold
+- min/max elevation and bounding box
+- per-km splits (distance, gain, loss, min/max elevation, average grade)
+
+The result is written to scripts/generated/route_stats.json (gitignored). The
+app does not read it yet: the Route screen only gets these statistics for the
+complete loop, through generate_complete_route.py and complete_route.json.
+Run it after `extract_all_routes.py all --update` so the elevations are current.
+"""
+
+import os
+import json
+import argparse
+
+import trail_data
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "route_stats.json")
+
+# Elevation changes smaller than this are treated as noise (meters)
+DEFAULT_HYSTERESIS = 3.0
+
+
+def elevation_gain_loss(elevations: list, hysteresis: float = DEFAULT_HYSTERESIS) -> tuple:
+    """
+    Total ascent and descent, ignoring oscillations smaller than `hysteresis`.
+
+    A change is only counted once the elevation has moved at least `hysteresis`
+    meters away from the last confirmed reference point.
+    """
+    if not elevations:
+        return 0.0, 0.0
+
+    gain = 0.0
+    loss = 0.0
+    reference = elevations[0]
+    for elev in elevations[1:]:
+        delta = elev - reference
+        if delta >= hysteresis:
+            gain += delta
+            reference = elev
+        elif -delta >= hysteresis:
+            loss -= delta
+            reference = elev
+    return gain, loss
+
+
+def bounding_box(coords: list) -> list:
+    """Return [min_lon, min_lat, max_lon, max_lat]."""
+    lons = [c[0] for c in coords]
+    lats = [c[1] for c in coords]
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+def km_splits(coords: list, cumulative_km: list, hysteresis: float) -> list:
+    """
+    Statistics for each kilometer of the line.
+
+    Every segment belongs to the kilometer in which it starts, so consecutive
+    splits share their boundary coordinate and the last split holds the remainder.
+    """
+    # km bucket -> [first segment index, last segment index]
+    buckets = {}
+    for i in range(len(coords) - 1):
+        bucket = buckets.setdefault(int(cumulative_km[i]), [i, i])
+        bucket[1] = i
+
+    splits = []
+    for km in sorted(buckets):
+        start, last_segment = buckets[km]
+        end = last_segment + 1
+        elevations = [c[2] for c in coords[start:end + 1]]
+        gain, loss = elevation_gain_loss(elevations, hysteresis)
+        distance_m = (cumulative_km[end] - cumulative_km[start]) * 1000
+        net = elevations[-1] - elevations[0]
+        splits.append({
+            "km": km + 1,
+            "startIndex": start,
+            "endIndex": end,
+            "distanceMeters": round(distance_m, 1),
+            "elevationGainMeters": round(gain, 1),
+            "elevationLossMeters": round(loss, 1),
+            "minAltitudeMeters": min(elevations),
+            "maxAltitudeMeters": max(elevations),
+            "averageGradePercent": round(net / distance_m * 100, 1) if distance_m > 0 else 0.0,
+        })
+    return splits
+
+
+def compute_stats(coords: list, hysteresis: float = DEFAULT_HYSTERESIS) -> dict:
+    """Compute every statistic for one line of [lon, lat, ele] coordinates."""
+    cumulative_km = trail_data.cumulative_distances(coords)
+    elevations = [c[2] for c in coords]
+    gain, loss = elevation_gain_loss(elevations, hysteresis)
+
+    return {
+        "points": len(coords),
+        "distanceKm": round(cumulative_km[-1], 3),
+        "elevationGainMeters": round(gain),
+        "elevationLossMeters": round(loss),
+        "minAltitudeMeters": round(min(elevations)),
+        "maxAltitudeMeters": round(max(elevations)),
+        "boundingBox": bounding_box(coords),
+        "cumulativeDistanceMeters": [round(km * 1000, 1) for km in cumulative_km],
+        "kmSplits": km_splits(coords, cumulative_km, hysteresis),
+    }
+
+
+def print_comparison(stage: dict, stats: dict):
+    """Compare the computed numbers with the hand-entered RouteData.kt fields."""
+    print(f"  {stage['number']:>2} {stage['name'][:32]:<32} "
+          f"{stage['distanceKm']:>6.2f} -> {stats['distanceKm']:>6.2f} km   "
+          f"+{stage['elevationGainMeters']:>4} -> +{stats['elevationGainMeters']:<4} "
+          f"-{stage['elevationLossMeters']:>4} -> -{stats['elevationLossMeters']:<4} "
+          f"max {stage['maxAltitudeMeters']:>3} -> {stats['maxAltitudeMeters']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute per-stage geometry statistics")
+    parser.add_argument("--hysteresis", type=float, default=DEFAULT_HYSTERESIS,
+                        help="elevation noise threshold in meters (default: %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    print(f"Computing statistics for {len(stages)} stages (hysteresis {args.hysteresis}m)")
+    print("  RouteData.kt value -> computed value")
+
+    output = {"hysteresisMeters": args.hysteresis, "stages": []}
+    for stage in stages:
+        stats = compute_stats(stage["coordinates"], args.hysteresis)
+        print_comparison(stage, stats)
+        output["stages"].append({"number": stage["number"], **stats})
+
+    loop = trail_data.combined_coordinates(stages)
+    output["complete"] = compute_stats(loop, args.hysteresis)
+    complete = output["complete"]
+    print(f"\nComplete loop: {complete['points']} points, {complete['distanceKm']:.2f} km, "
+          f"+{complete['elevationGainMeters']}m / -{complete['elevationLossMeters']}m")
+
+    trail_data.atomic_write(args.output, json.dumps(output, separators=(',', ':')))
+
+    print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
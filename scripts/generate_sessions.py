@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Synthetic Notebook database: thousands of realistic tracking sessions for performance tests.
+
+Usage:
+    python3 generate_sessions.py generate [--sessions 2000] [--seed 42] [--output PATH]
+    python3 generate_sessions.py benchmark [--output PATH] [--samples 50]
+
+generate writes a SQLite file (scripts/generated/sessions.db unless --output
+is given) with the app schema (the CREATE statements of the SQLDelight .sq
+files and the schema version, as build_seed_database.py) holding the 20 routes
+plus N sessions walked along the RouteData.kt geometry:
+- a session covers one stage (sometimes part of one, or two in a row), in
+  either direction, starting on a daytime hour of the last three years
+- the walker has its own pace; the speed follows Tobler's hiking function on
+  the local slope (hiking_times.py) with some jitter
+- a fix every --interval seconds (the app's LocationService default, 5 s)
+  with AR(1)-correlated GPS noise on position (~4 m) and altitude (~6 m, slowly drifting)
+- pauses (2-20 min, fixes keep coming with near-zero speed) and dropouts
+  (30 s - 5 min without any fix)
+- the session row gets the statistics the app computes when a session stops
+  (CalculateSessionStatsUseCase: Haversine distance, 3 m elevation dead band,
+  max fix speed; StopTrackingSessionUseCase: duration, average speed)
+
+Sessions are generated one at a time and written in batches of --batch
+track points, so memory stays bounded whatever the size; the indexes are
+created after the bulk load. The same --seed gives the same database.
+
+benchmark times what the Notebook does on the file: the session list
+(selectAllSessions), opening a session (selectSessionById +
+selectTrackPointsBySession) and building its GPX export like
+SessionDetailScreenModel.generateGpxContent.
+"""
+
+import os
+import sys
+import math
+import time
+import uuid
+import bisect
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import trail_data
+from geodesy import EARTH_RADIUS_KM, haversine_distance
+from build_seed_database import read_schema_statements, schema_version, insert_rows, route_rows
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "sessions.db")
+DEFAULT_SESSIONS = 2000
+DEFAULT_BATCH = 50000
+DEFAULT_INTERVAL = 5.0
+HISTORY_DAYS = 3 * 365
+
+GPS_SIGMA_METERS = 4.0
+ALTITUDE_SIGMA_METERS = 6.0
+# Consecutive GPS errors are strongly correlated, altitude even more so
+NOISE_CORRELATION = 0.9
+ALTITUDE_CORRELATION = 0.99
+PAUSE_PER_HOUR = 1.0
+DROPOUT_PER_HOUR = 0.6
+ELEVATION_DEAD_BAND_METERS = 3.0
+METERS_PER_DEGREE = EARTH_RADIUS_KM * 1000 * math.pi / 180
+
+SESSION_COLUMNS = ("id", "routeId", "startTime", "endTime", "distanceMeters", "durationSeconds", "averageSpeedKmh",
+                   "maxSpeedKmh", "elevationGainMeters", "elevationLossMeters", "isCompleted", "name", "notes")
+POINT_COLUMNS = ("sessionId", "latitude", "longitude", "altitude", "timestamp", "speedKmh")
+
+
+class Trail:
+    """The stages as one line with cumulative meters, for interpolating positions by distance."""
+
+    def __init__(self, stages: list):
+        self.coords = []
+        self.meters = []
+        self.stage_ranges = []
+        for stage in stages:
+            start = self.meters[-1] if self.meters else 0.0
+            kilometers = trail_data.cumulative_distances(stage["coordinates"])
+            self.coords.extend(stage["coordinates"])
+            self.meters.extend(start + km * 1000 for km in kilometers)
+            self.stage_ranges.append((stage, start, self.meters[-1]))
+
+    def at(self, distance: float) -> tuple:
+        """(lon, lat, elevation, slope) at `distance` meters along the line."""
+        i = min(max(bisect.bisect_right(self.meters, distance) - 1, 0), len(self.meters) - 2)
+        span = self.meters[i + 1] - self.meters[i]
+        t = (distance - self.meters[i]) / span if span > 0 else 0.0
+        a, b = self.coords[i], self.coords[i + 1]
+        slope = (b[2] - a[2]) / span if span > 0 else 0.0
+        return a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1]), a[2] + t * (b[2] - a[2]), slope
+
+
+def session_stats(points: list) -> tuple:
+    """(distance m, max speed, gain, loss) as CalculateSessionStatsUseCase computes them."""
+    distance = max_speed = gain = loss = 0.0
+    reference = points[0][3] if points else None
+    for previous, current in zip(points, points[1:]):
+        distance += haversine_distance(previous[2], previous[1], current[2], current[1]) * 1000
+        max_speed = max(max_speed, current[5] or 0.0)
+        change = current[3] - reference
+        if abs(change) >= ELEVATION_DEAD_BAND_METERS:
+            if change > 0:
+                gain += change
+            else:
+                loss -= change
+            reference = current[3]
+    return distance, max_speed, int(gain), int(loss)
+
+
+def walk_session(trail: Trail, rng: random.Random, interval: float, now: datetime) -> tuple:
+    """One synthetic session: (session row without stats, [point rows])."""
+    session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    index = rng.randrange(len(trail.stage_ranges))
+    stage, start, end = trail.stage_ranges[index]
+    route_id = stage["id"]
+    name = stage["name"]
+    kind = rng.random()
+    if kind < 0.2:
+        # Part of a stage
+        length = (end - start) * rng.uniform(0.3, 0.8)
+        start = rng.uniform(start, end - length)
+        end = start + length
+    elif kind < 0.3 and index + 1 < len(trail.stage_ranges):
+        next_stage, _, end = trail.stage_ranges[index + 1]
+        route_id = None
+        name = f"{stage['startPoint']} - {next_stage['endPoint']}"
+    backward = rng.random() < 0.25
+    if backward:
+        name = " - ".join(reversed(name.split(" - ")))
+
+    day = now - timedelta(days=rng.randrange(HISTORY_DAYS))
+    started = day.replace(hour=rng.randint(7, 11), minute=rng.randrange(60), second=0, microsecond=0)
+    clock = started.timestamp()
+    pace = rng.gauss(1.0, 0.12)
+
+    points = []
+    walked = 0.0
+    total = end - start
+    noise_x = noise_y = noise_z = 0.0
+    pause_left = dropout_left = 0.0
+    ticks_per_hour = 3600 / interval
+    innovation = math.sqrt(1 - NOISE_CORRELATION ** 2)
+    altitude_innovation = math.sqrt(1 - ALTITUDE_CORRELATION ** 2)
+    while walked < total:
+        distance = end - walked if backward else start + walked
+        lon, lat, elevation, slope = trail.at(distance)
+        if backward:
+            slope = -slope
+
+        if pause_left > 0:
+            pause_left -= interval
+            speed = 0.0
+        else:
+            speed = max(0.5, pace * 6 * math.exp(-3.5 * abs(slope + 0.05)) * rng.uniform(0.9, 1.1))
+            walked += speed / 3.6 * interval
+            if rng.random() < PAUSE_PER_HOUR / ticks_per_hour:
+                pause_left = rng.uniform(120, 1200)
+        if dropout_left <= 0 and rng.random() < DROPOUT_PER_HOUR / ticks_per_hour:
+            dropout_left = rng.uniform(30, 300)
+
+        noise_x = NOISE_CORRELATION * noise_x + innovation * rng.gauss(0, GPS_SIGMA_METERS)
+        noise_y = NOISE_CORRELATION * noise_y + innovation * rng.gauss(0, GPS_SIGMA_METERS)
+        noise_z = ALTITUDE_CORRELATION * noise_z + altitude_innovation * rng.gauss(0, ALTITUDE_SIGMA_METERS)
+        if dropout_left > 0:
+            dropout_left -= interval
+        else:
+            points.append((
+                session_id,
+                round(lat + noise_y / METERS_PER_DEGREE, 7),
+                round(lon + noise_x / (METERS_PER_DEGREE * math.cos(math.radians(lat))), 7),
+                round(elevation + noise_z, 1),
+                int(clock * 1000),
+                round(max(0.0, speed + rng.gauss(0, 0.3)), 2),
+            ))
+        clock += interval * rng.uniform(0.95, 1.05)
+
+    session = {
+        "id": session_id, "routeId": route_id, "startTime": int(started.timestamp() * 1000),
+        "endTime": int(clock * 1000), "isCompleted": 1, "name": name, "notes": "",
+    }
+    return session, points
+
+
+def generate(path: str, sessions: int, seed: int, batch: int, interval: float):
+    tables, indexes = read_schema_statements()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    for statement in tables:
+        db.execute(statement)
+    stages = trail_data.load_stages()
+    with db:
+        # Single-stage sessions reference their route
+        insert_rows(db, "RouteEntity", route_rows(stages))
+
+    trail = Trail(stages)
+    rng = random.Random(seed)
+    # Fixed reference time, so the same seed gives the same file
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    insert_session = (f"INSERT INTO TrackingSessionEntity ({', '.join(SESSION_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(SESSION_COLUMNS))})")
+    insert_points = (f"INSERT INTO TrackPointEntity ({', '.join(POINT_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(POINT_COLUMNS))})")
+
+    start = time.perf_counter()
+    session_batch, point_batch = [], []
+    total_points = 0
+
+    def flush():
+        with db:
+            db.executemany(insert_session, session_batch)
+            db.executemany(insert_points, point_batch)
+        session_batch.clear()
+        point_batch.clear()
+
+    for n in range(sessions):
+        session, points = walk_session(trail, rng, interval, now)
+        distance, max_speed, gain, loss = session_stats(points)
+        duration = (session["endTime"] - session["startTime"]) // 1000
+        session.update(distanceMeters=distance, durationSeconds=duration, maxSpeedKmh=max_speed,
+                       averageSpeedKmh=(distance / 1000) / (duration / 3600) if duration > 0 else 0.0,
+                       elevationGainMeters=gain, elevationLossMeters=loss)
+        session_batch.append([session[c] for c in SESSION_COLUMNS])
+        point_batch.extend(points)
+        total_points += len(points)
+        if len(point_batch) >= batch:
+            flush()
+            print(f"  {n + 1:>6} sessions, {total_points:>10,} points, {time.perf_counter() - start:6.1f} s", end="\r")
+    flush()
+    print()
+
+    # Building the indexes after the bulk insert is cheaper than updating them row by row
+    for statement in indexes:
+        db.execute(statement)
+    db.execute("ANALYZE")
+    db.execute(f"PRAGMA user_version = {schema_version()}")
+    db.commit()
+    db.close()
+    os.replace(tmp_path, path)
+    print(f"{sessions:,} sessions, {total_points:,} track points in {time.perf_counter() - start:.1f} s")
+    print(f"Saved to {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+
+def gpx_export(name: str, points: list) -> str:
+    """The GPX SessionDetailScreenModel.generateGpxContent builds."""
+    escaped = (name or "Tracked Route").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    escaped = escaped.replace('"', "&quot;").replace("'", "&apos;")
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<gpx version="1.1" creator="Camí de Cavalls App">',
+             '  <trk>', f'    <name>{escaped}</name>', '    <trkseg>']
+    for latitude, longitude, altitude in points:
+        elevation = f"<ele>{altitude}</ele>" if altitude is not None else ""
+        lines.append(f'      <trkpt lat="{latitude}" lon="{longitude}">{elevation}</trkpt>')
+    lines += ['    </trkseg>', '  </trk>', '</gpx>']
+    return "\n".join(lines) + "\n"
+
+
+def benchmark(path: str, samples: int):
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    sessions, points = db.execute(
+        "SELECT (SELECT COUNT(*) FROM TrackingSessionEntity), (SELECT COUNT(*) FROM TrackPointEntity)").fetchone()
+    print(f"{path}: {sessions:,} sessions, {points:,} track points")
+
+    start = time.perf_counter()
+    listed = db.execute("SELECT * FROM TrackingSessionEntity ORDER BY startTime DESC").fetchall()
+    list_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(0)
+    ids = [row[0] for row in rng.sample(listed, min(samples, len(listed)))]
+    detail = export = 0.0
+    exported_points = exported_bytes = 0
+    for session_id in ids:
+        start = time.perf_counter()
+        session = db.execute("SELECT * FROM TrackingSessionEntity WHERE id = ?", (session_id,)).fetchone()
+        track = db.execute("SELECT latitude, longitude, altitude FROM TrackPointEntity "
+                           "WHERE sessionId = ? ORDER BY timestamp ASC", (session_id,)).fetchall()
+        detail += time.perf_counter() - start
+        start = time.perf_counter()
+        gpx = gpx_export(session[SESSION_COLUMNS.index("name")], track)
+        export += time.perf_counter() - start
+        exported_points += len(track)
+        exported_bytes += len(gpx.encode("utf-8"))
+    db.close()
+
+    count = len(ids)
+    print(f"  list (selectAllSessions):       {list_ms:8.1f} ms for {len(listed):,} rows")
+    print(f"  open session (by id + points):  {detail / count * 1000:8.1f} ms mean, "
+          f"{exported_points // count:,} points")
+    print(f"  GPX export:                     {export / count * 1000:8.1f} ms mean, "
+          f"{exported_bytes / count / 1024:.0f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Notebook sessions database for performance tests")
+    parser.add_argument("command", choices=["generate", "benchmark"])
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="track points per insert batch")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between fixes")
+    parser.add_argument("--samples", type=int, default=50, help="sessions opened/exported by benchmark")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.output, args.sessions, args.seed, args.batch, args.interval)
+        return
+    if not os.path.exists(args.output):
+        print(f"ERROR: {args.output} not found (run `generate` first)")
+        sys.exit(1)
+    benchmark(args.output, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Geodesy helpers shared by the data scripts.
+
+Great-circle distances on the spherical Earth used for the stage lengths, the
+UTM <-> WGS84 conversions needed for the official map (UTM zone 31N) and
+projected DEMs, the local metric projection with the grid index of the
+stage segments that the matching scripts snap points to, and the
+Douglas-Peucker simplification of plane polylines. Standard library only, so
+importing it is cheap.
+"""
+
+import math
+import heapq
+
+EARTH_RADIUS_KM = 6371
+
+MAX_CANDIDATES = 6
+CELL_SIZE = 50.0            # segment grid cell (m)
+
+# Local equirectangular projection centered on Menorca (errors < 0.1% over the island)
+ORIGIN_LAT = 39.95
+METERS_PER_DEGREE = EARTH_RADIUS_KM * 1000 * math.pi / 180
+COS_ORIGIN = math.cos(math.radians(ORIGIN_LAT))
+
+
+def haversine_distance(lon1, lat1, lon2, lat2):
+    """Calculate distance between two coordinates in km."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+
+def utm_to_wgs84(easting, northing, zone=31):
+    """
+    Convert UTM Zone 31N coordinates to WGS84 (latitude, longitude).
+
+    This uses the standard UTM to WGS84 conversion formulas.
+    Zone 31N covers Menorca (Balearic Islands).
+    """
+    # WGS84 parameters
+    a = 6378137.0  # semi-major axis
+    e = 0.081819191  # eccentricity
+    e_sq = e * e
+
+    # UTM parameters for Zone 31N
+    k0 = 0.9996  # scale factor
+    lon_origin = math.radians((zone - 1) * 6 - 180 + 3)  # Central meridian for zone 31 = 3°E
+
+    # Remove false easting/northing
+    x = easting - 500000.0
+    y = northing
+
+    # Calculate footprint latitude
+    M = y / k0
+    mu = M / (a * (1 - e_sq/4 - 3*e_sq*e_sq/64 - 5*e_sq*e_sq*e_sq/256))
+
+    e1 = (1 - math.sqrt(1 - e_sq)) / (1 + math.sqrt(1 - e_sq))
+
+    phi1 = mu + (3*e1/2 - 27*e1*e1*e1/32) * math.sin(2*mu) + \
+           (21*e1*e1/16 - 55*e1*e1*e1*e1/32) * math.sin(4*mu) + \
+           (151*e1*e1*e1/96) * math.sin(6*mu)
+
+    # Calculate latitude and longitude
+    C1 = e_sq * math.cos(phi1) * math.cos(phi1) / (1 - e_sq)
+    T1 = math.tan(phi1) * math.tan(phi1)
+    N1 = a / math.sqrt(1 - e_sq * math.sin(phi1) * math.sin(phi1))
+    R1 = a * (1 - e_sq) / math.pow(1 - e_sq * math.sin(phi1) * math.sin(phi1), 1.5)
+    D = x / (N1 * k0)
+
+    latitude = phi1 - (N1 * math.tan(phi1) / R1) * \
+               (D*D/2 - (5 + 3*T1 + 10*C1 - 4*C1*C1 - 9*e_sq) * D*D*D*D/24 + \
+                (61 + 90*T1 + 298*C1 + 45*T1*T1 - 252*e_sq - 3*C1*C1) * D*D*D*D*D*D/720)
+
+    longitude = lon_origin + \
+                (D - (1 + 2*T1 + C1) * D*D*D/6 + \
+                 (5 - 2*C1 + 28*T1 - 3*C1*C1 + 8*e_sq + 24*T1*T1) * D*D*D*D*D/120) / math.cos(phi1)
+
+    # Convert to degrees
+    latitude = math.degrees(latitude)
+    longitude = math.degrees(longitude)
+
+    return latitude, longitude
+
+
+def wgs84_to_utm(lat: float, lon: float, zone: int) -> tuple:
+    """Convert WGS84 latitude/longitude to UTM (northern hemisphere) easting/northing."""
+    a = 6378137.0
+    f = 1 / 298.257223563
+    k0 = 0.9996
+    e_sq = f * (2 - f)
+    ep_sq = e_sq / (1 - e_sq)
+
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    lam0 = math.radians((zone - 1) * 6 - 180 + 3)
+
+    n = a / math.sqrt(1 - e_sq * math.sin(phi) ** 2)
+    t = math.tan(phi) ** 2
+    c = ep_sq * math.cos(phi) ** 2
+    big_a = math.cos(phi) * (lam - lam0)
+    m = a * ((1 - e_sq / 4 - 3 * e_sq ** 2 / 64 - 5 * e_sq ** 3 / 256) * phi
+             - (3 * e_sq / 8 + 3 * e_sq ** 2 / 32 + 45 * e_sq ** 3 / 1024) * math.sin(2 * phi)
+             + (15 * e_sq ** 2 / 256 + 45 * e_sq ** 3 / 1024) * math.sin(4 * phi)
+             - (35 * e_sq ** 3 / 3072) * math.sin(6 * phi))
+
+    easting = k0 * n * (big_a + (1 - t + c) * big_a ** 3 / 6
+                        + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep_sq) * big_a ** 5 / 120) + 500000.0
+    northing = k0 * (m + n * math.tan(phi) * (big_a ** 2 / 2
+                                              + (5 - t + 9 * c + 4 * c ** 2) * big_a ** 4 / 24
+                                              + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep_sq) * big_a ** 6 / 720))
+    return easting, northing
+
+
+def project(lon: float, lat: float) -> tuple:
+    """WGS84 -> local meters (x east, y north)."""
+    return lon * METERS_PER_DEGREE * COS_ORIGIN, lat * METERS_PER_DEGREE
+
+
+class SegmentIndex:
+    """Uniform grid over the stage segments, with along-stage distances in meters."""
+
+    def __init__(self, stages: list, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        # (stage number, x1, y1, dx, dy, 1 / length², along at start, length)
+        self.segments = []
+        self.stage_lengths = {}
+        self.cells = {}
+
+        for stage in stages:
+            points = [project(c[0], c[1]) for c in stage["coordinates"]]
+            along = 0.0
+            for (x1, y1), (x2, y2) in zip(points, points[1:]):
+                length = math.hypot(x2 - x1, y2 - y1)
+                segment_id = len(self.segments)
+                inverse_squared = 1.0 / (length * length) if length > 0 else 0.0
+                self.segments.append((stage["number"], x1, y1, x2 - x1, y2 - y1, inverse_squared, along, length))
+                for cell in self._cells_between(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+                    self.cells.setdefault(cell, []).append(segment_id)
+                along += length
+            self.stage_lengths[stage["number"]] = along
+
+        # The loop closes: the stage after the last one is the first one
+        numbers = sorted(self.stage_lengths)
+        self.next_stage = dict(zip(numbers, numbers[1:] + numbers[:1]))
+
+    def _cells_between(self, min_x, min_y, max_x, max_y):
+        size = self.cell_size
+        for cx in range(int(min_x // size), int(max_x // size) + 1):
+            for cy in range(int(min_y // size), int(max_y // size) + 1):
+                yield cx, cy
+
+    def candidates(self, x: float, y: float, radius: float) -> list:
+        """
+        Closest trail positions within `radius`: list of (distance, stage, along).
+
+        Positions on the same stage closer than `radius` along the trail are
+        the same place seen through neighbouring segments; only the nearest is kept.
+        """
+        found = {}
+        radius_squared = radius * radius
+        for cell in self._cells_between(x - radius, y - radius, x + radius, y + radius):
+            for segment_id in self.cells.get(cell, ()):
+                if segment_id in found:
+                    continue
+                stage, x1, y1, dx, dy, inverse_squared, along, length = self.segments[segment_id]
+                t = ((x - x1) * dx + (y - y1) * dy) * inverse_squared
+                t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+                ex = x - x1 - t * dx
+                ey = y - y1 - t * dy
+                distance_squared = ex * ex + ey * ey
+                found[segment_id] = None
+                if distance_squared <= radius_squared:
+                    found[segment_id] = (math.sqrt(distance_squared), stage, along + t * length)
+
+        results = []
+        for candidate in sorted(c for c in found.values() if c is not None):
+            if any(stage == candidate[1] and abs(along - candidate[2]) < radius for _, stage, along in results):
+                continue
+            results.append(candidate)
+            if len(results) == MAX_CANDIDATES:
+                break
+        return results
+
+    def route_distance(self, a: tuple, b: tuple):
+        """Along-trail distance between two candidates, or None if not on the same/adjacent stages."""
+        _, stage_a, along_a = a
+        _, stage_b, along_b = b
+        if stage_a == stage_b:
+            return abs(along_b - along_a)
+        if self.next_stage[stage_a] == stage_b:
+            return (self.stage_lengths[stage_a] - along_a) + along_b
+        if self.next_stage[stage_b] == stage_a:
+            return along_a + (self.stage_lengths[stage_b] - along_b)
+        return None
+
+
+def _farthest(xs, ys, start: int, end: int) -> tuple:
+    """(distance, index) of the point between start and end farthest from the segment start-end."""
+    x1, y1 = xs[start], ys[start]
+    dx, dy = xs[end] - x1, ys[end] - y1
+    length_squared = dx * dx + dy * dy
+    best, best_index = -1.0, start
+    for i in range(start + 1, end):
+        t = ((xs[i] - x1) * dx + (ys[i] - y1) * dy) / length_squared if length_squared > 0 else 0.0
+        t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+        distance = math.hypot(xs[i] - x1 - t * dx, ys[i] - y1 - t * dy)
+        if distance > best:
+            best, best_index = distance, i
+    return best, best_index
+
+
+def douglas_peucker(xs, ys, tolerance: float, max_points: int = 0) -> tuple:
+    """
+    (sorted indices of the kept points, largest distance of a dropped point) for a plane polyline.
+
+    The segment with the farthest point is split first (priority queue), so
+    stopping at max_points keeps the most significant points; without a
+    budget every dropped point is within `tolerance` of the result. Both
+    endpoints are always kept.
+    """
+    if len(xs) <= 2:
+        return list(range(len(xs))), 0.0
+    last = len(xs) - 1
+    kept = [0, last]
+    distance, index = _farthest(xs, ys, 0, last)
+    heap = [(-distance, 0, last, index)]
+    while heap:
+        distance, start, end, index = heap[0]
+        if -distance <= tolerance or (max_points and len(kept) >= max_points):
+            break
+        heapq.heappop(heap)
+        kept.append(index)
+        for a, b in ((start, index), (index, end)):
+            if b - a > 1:
+                distance, farthest = _farthest(xs, ys, a, b)
+                heapq.heappush(heap, (-distance, a, b, farthest))
+    deviation = max(-heap[0][0], 0.0) if heap else 0.0
+    return sorted(kept), deviation
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Structural geometry diff of the stages between two data versions.
+
+Usage:
+    python3 geometry_diff.py [base] [target] [--html PATH] [--stages N ...]
+
+base and target are version specs as in data_patch.py (worktree, a git
+revision, a directory with RouteData.kt + pois.json or a snapshot JSON);
+they default to HEAD and worktree, so after
+`extract_all_routes.py all --update` the plain command reviews the update.
+
+For every stage:
+- points: coordinate count of both versions
+- length: along-line length change (Haversine, as in route_stats.json)
+- Hausdorff: the farthest any point of one line is from the other line
+  (point-to-segment, through a segment grid of each line)
+- Fréchet: discrete Fréchet distance, the leash needed to walk both lines
+  in order; unlike Hausdorff it catches a reversed or reordered stretch.
+  Both lines are first densified to FRECHET_STEP, so a simplified line's
+  long segments are not penalized for lacking vertices.
+  The DP only visits vertex pairs closer than the Fréchet distance of a
+  proportional walk along both lines (an upper bound), so near-identical
+  lines cost a narrow band instead of every pair
+- elevation: largest elevation change at the same along-line position
+  (interpolated in the base profile, elevation_grid.ProfileLookup, with the
+  target distances scaled to the base length)
+
+Stages whose coordinates are identical are reported as unchanged without
+computing anything. Plane distances use the local projection of
+geodesy.py (errors below 0.1% over the island).
+
+--html writes a self-contained page (inline SVG, no network) with, for every
+changed stage, the base and target lines overlaid on the map and on the
+elevation profile.
+"""
+
+import sys
+import math
+import time
+import html
+import argparse
+
+import trail_data
+from data_patch import load_version
+from elevation_grid import ProfileLookup
+from geodesy import project
+from validate_route_data import Tracks
+
+CELL_SIZE = 100.0   # segment grid cell (m)
+FRECHET_STEP = 10.0     # m: longest segment before the discrete Fréchet distance
+SVG_SIZE = 520
+PROFILE_HEIGHT = 160
+
+
+class Line:
+    """A stage line projected to plane meters, with a grid of its segments for nearest-distance queries."""
+
+    def __init__(self, coords: list):
+        self.x = []
+        self.y = []
+        for c in coords:
+            x, y = project(c[0], c[1])
+            self.x.append(x)
+            self.y.append(y)
+        self.elevations = [c[2] for c in coords]
+        self.cells = {}
+        for i in range(len(self.x) - 1):
+            for cell in self._cells(min(self.x[i], self.x[i + 1]), min(self.y[i], self.y[i + 1]),
+                                    max(self.x[i], self.x[i + 1]), max(self.y[i], self.y[i + 1])):
+                self.cells.setdefault(cell, []).append(i)
+
+    @staticmethod
+    def _cells(min_x, min_y, max_x, max_y):
+        for cx in range(int(min_x // CELL_SIZE), int(max_x // CELL_SIZE) + 1):
+            for cy in range(int(min_y // CELL_SIZE), int(max_y // CELL_SIZE) + 1):
+                yield cx, cy
+
+    def nearest(self, x: float, y: float, limit: float = math.inf) -> float:
+        """
+        Distance in meters from (x, y) to the closest segment, searching an expanding square of cells.
+
+        The search stops once the square is wider than `limit`: math.inf when nothing is that close.
+        """
+        if len(self.x) == 1:
+            return math.hypot(x - self.x[0], y - self.y[0])
+        radius = CELL_SIZE
+        while True:
+            best = math.inf
+            seen = set()
+            for cell in self._cells(x - radius, y - radius, x + radius, y + radius):
+                for i in self.cells.get(cell, ()):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    x1, y1 = self.x[i], self.y[i]
+                    dx, dy = self.x[i + 1] - x1, self.y[i + 1] - y1
+                    length_squared = dx * dx + dy * dy
+                    t = ((x - x1) * dx + (y - y1) * dy) / length_squared if length_squared > 0 else 0.0
+                    t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+                    best = min(best, math.hypot(x - x1 - t * dx, y - y1 - t * dy))
+            # A segment outside the searched square is farther than `radius`
+            if best <= radius:
+                return best
+            if radius >= limit:
+                return math.inf
+            radius *= 2
+
+
+def hausdorff(a: Line, b: Line) -> float:
+    directed_ab = max(b.nearest(x, y) for x, y in zip(a.x, a.y))
+    directed_ba = max(a.nearest(x, y) for x, y in zip(b.x, b.y))
+    return max(directed_ab, directed_ba)
+
+
+def proportional_bound(a: Line, b: Line, a_along: list, b_along: list) -> float:
+    """Leash of walking both lines at the same fraction of their length: an upper bound of the Fréchet distance."""
+    a_total = a_along[-1] or 1.0
+    b_total = b_along[-1] or 1.0
+    i = j = 0
+    bound = math.hypot(a.x[0] - b.x[0], a.y[0] - b.y[0])
+    while i < len(a.x) - 1 or j < len(b.x) - 1:
+        next_a = a_along[i + 1] / a_total if i < len(a.x) - 1 else math.inf
+        next_b = b_along[j + 1] / b_total if j < len(b.x) - 1 else math.inf
+        if next_a <= next_b:
+            i += 1
+        if next_b <= next_a:
+            j += 1
+        bound = max(bound, math.hypot(a.x[i] - b.x[j], a.y[i] - b.y[j]))
+    return bound
+
+
+def frechet(a: Line, b: Line, bound: float) -> float:
+    """Discrete Fréchet distance; pairs farther apart than `bound` (>= the result) are never on the optimal path."""
+    grid = {}
+    for j in range(len(b.x)):
+        grid.setdefault((int(b.x[j] // bound), int(b.y[j] // bound)) if bound > 0 else (b.x[j], b.y[j]), []).append(j)
+
+    previous = {}
+    for i in range(len(a.x)):
+        x, y = a.x[i], a.y[i]
+        if bound > 0:
+            cx, cy = int(x // bound), int(y // bound)
+            near = sorted(j for gx in (cx - 1, cx, cx + 1) for gy in (cy - 1, cy, cy + 1) for j in grid.get((gx, gy), ()))
+        else:
+            near = sorted(grid.get((x, y), ()))
+        current = {}
+        for j in near:
+            d = math.hypot(x - b.x[j], y - b.y[j])
+            if d > bound:
+                continue
+            if i == 0 and j == 0:
+                current[j] = d
+                continue
+            reach = min(previous.get(j, math.inf), previous.get(j - 1, math.inf), current.get(j - 1, math.inf))
+            if reach < math.inf:
+                current[j] = max(reach, d)
+        previous = current
+    return previous.get(len(b.x) - 1, bound)
+
+
+def densify(coords: list, meters: list, step: float = FRECHET_STEP) -> list:
+    """The line with extra points so no segment is longer than `step` (interpolated in degrees)."""
+    dense = [coords[0]]
+    for a, b, start, end in zip(coords, coords[1:], meters, meters[1:]):
+        parts = int((end - start) // step) + 1
+        for k in range(1, parts):
+            t = k / parts
+            dense.append([a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1]), a[2] + t * (b[2] - a[2])])
+        dense.append(b)
+    return dense
+
+
+def along(coords: list) -> list:
+    """Cumulative meters per point."""
+    tracks = Tracks(["line"], [coords])
+    meters = [0.0]
+    for step in tracks.steps:
+        meters.append(meters[-1] + step)
+    return meters
+
+
+def elevation_delta(base: list, target: list, base_along: list, target_along: list) -> tuple:
+    """(largest |target - base elevation| at the same along-line position, target meters where it occurs)."""
+    if len(base) == len(target) and all(p[:2] == q[:2] for p, q in zip(base, target)):
+        pairs = ((q[2] - p[2], m) for p, q, m in zip(base, target, target_along))
+    else:
+        lookup = ProfileLookup([(m / 1000, c[2]) for m, c in zip(base_along, base)])
+        scale = base_along[-1] / target_along[-1] if target_along[-1] > 0 else 1.0
+        pairs = ((c[2] - lookup.at(m * scale / 1000), m) for c, m in zip(target, target_along))
+    worst, where = 0.0, 0.0
+    for delta, meters in pairs:
+        if abs(delta) > abs(worst):
+            worst, where = delta, meters
+    return worst, where
+
+
+def compare_stage(base: list, target: list) -> dict:
+    base_along, target_along = along(base), along(target)
+    result = {
+        "points": (len(base), len(target)),
+        "length": (base_along[-1], target_along[-1]),
+        "changed": base != target,
+    }
+    if not result["changed"]:
+        return result
+    result["hausdorff"] = hausdorff(Line(base), Line(target))
+    # Between vertices only, a long segment facing many short ones would count its vertex gaps
+    dense_base, dense_target = densify(base, base_along), densify(target, target_along)
+    a, b = Line(dense_base), Line(dense_target)
+    result["frechet"] = frechet(a, b, proportional_bound(a, b, along(dense_base), along(dense_target)))
+    result["elevation"] = elevation_delta(base, target, base_along, target_along)
+    return result
+
+
+def print_report(results: dict, base_spec: str, target_spec: str, seconds: float):
+    print(f"{base_spec} -> {target_spec}")
+    print(f"  {'stage':>5} {'points':>13} {'length m':>16} {'Hausdorff m':>12} {'Fréchet m':>10} {'elevation m':>20}")
+    changed = 0
+    for number, r in results.items():
+        if r is None:
+            continue
+        (points_a, points_b), (length_a, length_b) = r["points"], r["length"]
+        points = f"{points_a}->{points_b}" if points_a != points_b else f"{points_a}"
+        length = f"{length_b:.0f} ({length_b - length_a:+.1f})" if r["changed"] else f"{length_a:.0f}"
+        if not r["changed"]:
+            print(f"  {number:>5} {points:>13} {length:>16} {'unchanged':>12}")
+            continue
+        changed += 1
+        elevation, where = r["elevation"]
+        print(f"  {number:>5} {points:>13} {length:>16} {r['hausdorff']:>12.1f} {r['frechet']:>10.1f} "
+              f"{elevation:>+9.1f} @ {where / 1000:>5.2f} km")
+    for number, r in results.items():
+        if r is None:
+            print(f"  {number:>5} only in one version")
+    print(f"{changed} of {len(results)} stages changed ({seconds:.2f} s)")
+
+
+def svg_polyline(points: list, color: str, width: float, dash: str = "") -> str:
+    path = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+    dashed = f' stroke-dasharray="{dash}"' if dash else ""
+    return (f'<polyline points="{path}" fill="none" stroke="{color}" stroke-width="{width}"{dashed} '
+            f'stroke-linejoin="round"/>')
+
+
+def stage_html(number: str, base: list, target: list, result: dict) -> str:
+    a, b = Line(base), Line(target)
+    min_x, max_x = min(a.x + b.x), max(a.x + b.x)
+    min_y, max_y = min(a.y + b.y), max(a.y + b.y)
+    scale = (SVG_SIZE - 20) / max(max_x - min_x, max_y - min_y, 1.0)
+    # North up: flip y
+    to_map = lambda line: [(10 + (x - min_x) * scale, SVG_SIZE - 10 - (y - min_y) * scale) for x, y in zip(line.x, line.y)]
+
+    base_along, target_along = along(base), along(target)
+    elevations = [c[2] for c in base + target]
+    low, high = min(elevations), max(elevations)
+    length = max(base_along[-1], target_along[-1], 1.0)
+    to_profile = lambda meters, coords: [(10 + m / length * (SVG_SIZE - 20),
+                                          PROFILE_HEIGHT - 10 - (c[2] - low) / max(high - low, 1.0) * (PROFILE_HEIGHT - 20))
+                                         for m, c in zip(meters, coords)]
+
+    elevation, where = result["elevation"]
+    return (
+        f'<section><h2>Stage {html.escape(number)}</h2>'
+        f'<p>points {result["points"][0]} &rarr; {result["points"][1]}, length {result["length"][1]:.0f} m '
+        f'({result["length"][1] - result["length"][0]:+.1f}), Hausdorff {result["hausdorff"]:.1f} m, '
+        f'Fr&eacute;chet {result["frechet"]:.1f} m, elevation {elevation:+.1f} m at {where / 1000:.2f} km</p>'
+        f'<svg width="{SVG_SIZE}" height="{SVG_SIZE}">'
+        f'{svg_polyline(to_map(a), "#999", 5)}{svg_polyline(to_map(b), "#d22", 1.5)}</svg>'
+        f'<svg width="{SVG_SIZE}" height="{PROFILE_HEIGHT}">'
+        f'{svg_polyline(to_profile(base_along, base), "#999", 3)}'
+        f'{svg_polyline(to_profile(target_along, target), "#d22", 1.2)}</svg></section>'
+    )
+
+
+def write_html(path: str, base: dict, target: dict, results: dict, base_spec: str, target_spec: str):
+    sections = [stage_html(number, base[number]["coordinates"], target[number]["coordinates"], r)
+                for number, r in results.items() if r and r["changed"]]
+    title = f"Geometry diff {html.escape(base_spec)} &rarr; {html.escape(target_spec)}"
+    page = (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+        '<style>body{font-family:sans-serif;margin:20px}section{margin-bottom:28px}svg{border:1px solid #ddd;'
+        'margin-right:8px;vertical-align:top}h2{margin:0 0 4px}p{margin:0 0 8px;color:#444}</style></head><body>'
+        f'<h1>{title}</h1><p><span style="color:#999">&#9632; base</span> '
+        f'<span style="color:#d22">&#9632; target</span></p>'
+        + ("".join(sections) or "<p>No stage geometry changed.</p>")
+        + "</body></html>\n"
+    )
+    trail_data.atomic_write(path, page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structural geometry diff of the stages between two data versions")
+    parser.add_argument("base", nargs="?", default="HEAD")
+    parser.add_argument("target", nargs="?", default="worktree")
+    parser.add_argument("--html", help="write an HTML overlay of the changed stages")
+    parser.add_argument("--stages", type=int, nargs="+", help="only these stage numbers")
+    args = parser.parse_args()
+
+    try:
+        base = load_version(args.base)["routes"]
+        target = load_version(args.target)["routes"]
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    numbers = sorted(set(base) | set(target), key=int)
+    if args.stages:
+        numbers = [n for n in numbers if int(n) in args.stages]
+    results = {}
+    for number in numbers:
+        if number in base and number in target:
+            results[number] = compare_stage(base[number]["coordinates"], target[number]["coordinates"])
+        else:
+            results[number] = None
+    print_report(results, args.base, args.target, time.perf_counter() - start)
+
+    if args.html:
+        write_html(args.html, base, target, results, args.base, args.target)
+        print(f"Saved to {args.html}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Per-coordinate cumulative walking times for every stage and the complete loop.
+
+Usage:
+    python3 hiking_times.py [--model tobler|naismith] [--output PATH]
+
+Every coordinate segment gets a walking time from its length and elevation
+change (flat columns and one pass per model, as in validate_route_data.py):
+- tobler: Tobler's hiking function, 6 * exp(-3.5 * |slope + 0.05|) km/h,
+  fastest on a gentle descent and slower on steep ones
+- naismith: Naismith's rule (5 km/h plus 1 minute per 10 m of ascent) with
+  Langmuir's descent correction (minus 10 minutes per 300 m on 5-12 degree
+  descents, plus 10 minutes per 300 m on steeper ones)
+
+The model gives the shape (where a stage is slow or fast); each stage is then
+scaled so its total matches the official estimatedDurationMinutes in
+RouteData.kt. The output has one cumulative-minutes array per stage and for
+the complete loop, index-aligned with the cumulativeDistanceMeters arrays of
+route_stats.json: the ETA to any point is an interpolation of minutes over
+distance, and "time to the next POI" the difference of two lookups (with the
+km positions of trail_positions.json).
+"""
+
+import os
+import json
+import math
+import argparse
+from array import array
+
+import trail_data
+from validate_route_data import segment_lengths
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "hiking_times.json")
+MODELS = ("tobler", "naismith")
+
+NAISMITH_MINUTES_PER_KM = 12.0
+NAISMITH_MINUTES_PER_METER_ASCENT = 0.1
+LANGMUIR_MINUTES_PER_METER_DESCENT = 10 / 300
+LANGMUIR_GENTLE = (math.tan(math.radians(5)), math.tan(math.radians(12)))
+
+
+def tobler_minutes(lengths: array, rises: array) -> array:
+    """Minutes per segment with Tobler's hiking function."""
+    exp = math.exp
+    return array('d', (
+        (length / 1000) / (6 * exp(-3.5 * abs(rise / length + 0.05))) * 60 if length > 0 else 0.0
+        for length, rise in zip(lengths, rises)
+    ))
+
+
+def naismith_minutes(lengths: array, rises: array) -> array:
+    """Minutes per segment with Naismith's rule and Langmuir's descent correction."""
+    gentle, steep = LANGMUIR_GENTLE
+    minutes = array('d')
+    for length, rise in zip(lengths, rises):
+        time = length / 1000 * NAISMITH_MINUTES_PER_KM
+        if rise > 0:
+            time += rise * NAISMITH_MINUTES_PER_METER_ASCENT
+        elif rise < 0 and length > 0:
+            slope = -rise / length
+            if gentle <= slope <= steep:
+                time -= -rise * LANGMUIR_MINUTES_PER_METER_DESCENT
+            elif slope > steep:
+                time += -rise * LANGMUIR_MINUTES_PER_METER_DESCENT
+        minutes.append(max(time, 0.0))
+    return minutes
+
+
+def segment_minutes(coords: list, model: str) -> array:
+    lon = array('d', (c[0] for c in coords))
+    lat = array('d', (c[1] for c in coords))
+    elevations = [c[2] for c in coords]
+    lengths = segment_lengths(lon, lat)
+    rises = array('d', (b - a for a, b in zip(elevations, elevations[1:])))
+    return tobler_minutes(lengths, rises) if model == "tobler" else naismith_minutes(lengths, rises)
+
+
+def cumulative(values) -> list:
+    total = 0.0
+    result = [0.0]
+    for value in values:
+        total += value
+        result.append(total)
+    return result
+
+
+def build_times(stages: list, model: str) -> dict:
+    output = {"model": model, "stages": []}
+    loop = []
+    previous_end = None
+    for stage in stages:
+        coords = stage["coordinates"]
+        model_minutes = cumulative(segment_minutes(coords, model))
+        official = stage["estimatedDurationMinutes"]
+        factor = official / model_minutes[-1] if official and model_minutes[-1] > 0 else 1.0
+        minutes = [m * factor for m in model_minutes]
+        output["stages"].append({
+            "number": stage["number"],
+            "officialMinutes": official,
+            "modelMinutes": round(model_minutes[-1], 1),
+            "calibrationFactor": round(factor, 4),
+            "cumulativeMinutes": [round(m, 1) for m in minutes],
+        })
+
+        # Same joining as trail_data.combined_coordinates: a shared endpoint is one point
+        offset = loop[-1] if loop else 0.0
+        if previous_end and previous_end[:2] == coords[0][:2]:
+            minutes = minutes[1:]
+        loop.extend(offset + m for m in minutes)
+        previous_end = coords[-1]
+
+    output["complete"] = {
+        "officialMinutes": sum(stage["estimatedDurationMinutes"] for stage in stages),
+        "cumulativeMinutes": [round(m, 1) for m in loop],
+    }
+    return output
+
+
+def format_minutes(minutes: float) -> str:
+    minutes = round(minutes)
+    return f"{minutes // 60}h{minutes % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slope-aware cumulative walking times per coordinate")
+    parser.add_argument("--model", choices=MODELS, default="tobler")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    stages = trail_data.load_stages()
+    output = build_times(stages, args.model)
+
+    other = "naismith" if args.model == "tobler" else "tobler"
+    print(f"  {'stage':>5} {'official':>9} {args.model:>9} {other:>9} {'factor':>7}")
+    for stage, times in zip(stages, output["stages"]):
+        other_minutes = sum(segment_minutes(stage["coordinates"], other))
+        print(f"  {stage['number']:>5} {format_minutes(times['officialMinutes']):>9} "
+              f"{format_minutes(times['modelMinutes']):>9} {format_minutes(other_minutes):>9} "
+              f"{times['calibrationFactor']:>7.2f}")
+    complete = output["complete"]
+    print(f"Complete loop: {len(complete['cumulativeMinutes'])} points, "
+          f"{format_minutes(complete['cumulativeMinutes'][-1])} (official {format_minutes(complete['officialMinutes'])})")
+
+    trail_data.atomic_write(args.output, json.dumps(output, separators=(',', ':')))
+    print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Streaming import of the stage geometry from a KML source into RouteData.kt.
+
+Usage:
+    python3 import_kml.py import <file.kml> [--layer NAME ...] [--tolerance 2.0] [--max-points N]
+                                            [--trail ID] [--update]
+    python3 import_kml.py benchmark [--megabytes 5 10 20] [--keep PATH]
+
+import reads the KML with iterparse and removes every element from its
+parent once it ends. The coordinates of a LineString are read token by token
+and the line is simplified when it ends, so memory is bounded by the largest
+LineString, not the file size: only the simplified pieces are kept.
+- layers: the names of the enclosing Document/Folder elements; --layer
+  keeps only the placemarks below a folder with one of those names (case
+  insensitive), e.g. the stages layer of a KML that also holds POIs and
+  variants; the coordinates of the other placemarks are not parsed
+- every LineString (also inside a MultiGeometry) is a piece; Points,
+  Polygons and other geometries are skipped
+- a piece belongs to the stage named in its placemark ("Etapa 3", "Stage 3",
+  "Tram 3", ...), otherwise to the stage of the trail registry whose current
+  RouteData.kt line most of it lies along (within MATCH_RADIUS, sampled
+  evenly along the simplified piece)
+- the pieces of a stage are chained greedily end to nearest end, starting at
+  the current stage start (or the previous stage's end), each reversed as
+  needed, so the stage runs in the loop direction
+- simplification: Douglas-Peucker in plane meters (geodesy.douglas_peucker
+  on the local projection), splitting at the farthest point until every
+  dropped point is within --tolerance of the line, at the end of each
+  LineString; the chained stage is simplified again and --max-points caps
+  it, dropping the least significant points first
+- elevations: the KML altitudes when the source has them, otherwise the
+  current stage elevations at the same along-line fraction
+  (elevation_grid.ProfileLookup);
+  `extract_all_routes.py all --update` refreshes them from the profiles
+
+Without --update the script only reports, per stage, the pieces, the source
+and kept points, the largest gap between chained pieces and the Hausdorff
+distance to the current geometry (geometry_diff.py). --update writes the
+stages to the trail's RouteData.kt (trail_data.write_stage_coordinates) and
+regenerates DataVersions.kt, as extract_all_routes.py does.
+
+benchmark writes a synthetic multi-layer KML for each --megabytes size from
+the current stages (a point every BENCHMARK_SPACING meters with noise, split
+into pieces, some reversed, plus POI and variant layers) and times the import
+of its stages layer, with the peak traced memory. The density is fixed, so a
+bigger file only adds placemarks (off-trail lines the import skips) and the
+peak stays flat.
+"""
+
+import os
+import re
+import sys
+import html
+import math
+import random
+import tempfile
+import argparse
+import tracemalloc
+import xml.etree.ElementTree as ET
+from time import perf_counter
+
+import trail_data
+from geodesy import COS_ORIGIN, METERS_PER_DEGREE, douglas_peucker, project
+from elevation_grid import ProfileLookup
+from generate_data_versions import write_data_versions
+from geometry_diff import Line, hausdorff
+from profiling import format_bytes
+
+DEFAULT_TOLERANCE_METERS = 2.0
+MATCH_RADIUS = 100.0        # m: a piece lies along a stage when most of its points are this close
+MATCH_SAMPLES = 25
+STAGE_NAME = re.compile(r"\b(?:etapa|stage|tram|tramo|ruta|route|etape|tappa)\s*0*(\d{1,2})\b", re.IGNORECASE)
+COORDINATE_DECIMALS = 10
+COORDINATE_TOKEN = re.compile(r"\S+")
+BENCHMARK_SPACING = 2.0     # m between the points of the synthetic lines
+OFFSHORE_METERS = 2000.0    # length of the synthetic off-trail lines
+
+
+# --- Parsing -----------------------------------------------------------------
+
+def iter_coordinates(text: str):
+    """KML "lon,lat[,alt] ..." text -> (lon, lat, alt or None), one token at a time."""
+    for token in COORDINATE_TOKEN.finditer(text or ""):
+        parts = token.group().split(",")
+        if len(parts) < 2:
+            continue
+        altitude = float(parts[2]) if len(parts) > 2 and parts[2] else None
+        yield float(parts[0]), float(parts[1]), altitude
+
+
+def simplify(points: list, tolerance: float, max_points: int = 0) -> tuple:
+    """(kept points, largest deviation of a dropped point in meters): geodesy.douglas_peucker in plane meters."""
+    xs, ys = [], []
+    for point in points:
+        x, y = project(point[0], point[1])
+        xs.append(x)
+        ys.append(y)
+    kept, deviation = douglas_peucker(xs, ys, tolerance, max_points)
+    return [points[i] for i in kept], deviation
+
+
+def iter_placemarks(path: str, tolerance: float, layers: list = None):
+    """
+    Yield (layer names, placemark name, [(simplified piece, source points, deviation)]) in document order.
+
+    Only Placemarks with LineStrings below a folder named in `layers` (all
+    when empty) are read. Each LineString is simplified at its end event, and
+    every element is detached from its parent when it ends, so the tree never
+    holds more than the open elements and one raw LineString.
+    """
+    wanted = {layer.casefold() for layer in layers or ()}
+    stack = []
+    names = []
+    name = None
+    pieces = None
+    text = None
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        tag = element.tag.rpartition("}")[2]
+        if event == "start":
+            stack.append(element)
+            if tag in ("Document", "Folder"):
+                names.append("")
+            elif tag == "Placemark" and (not wanted or wanted & {layer.casefold() for layer in names}):
+                name, pieces = "", []
+            continue
+
+        stack.pop()
+        parent = stack[-1].tag.rpartition("}")[2] if stack else None
+        if tag == "name":
+            if pieces is not None and parent == "Placemark":
+                name = (element.text or "").strip()
+            elif parent in ("Document", "Folder") and names:
+                names[-1] = (element.text or "").strip()
+        elif tag == "coordinates" and pieces is not None and parent == "LineString":
+            text = element.text
+        elif tag == "LineString" and text is not None:
+            points = list(iter_coordinates(text))
+            text = None
+            if len(points) >= 2:
+                simplified, deviation = simplify(points, tolerance)
+                pieces.append((simplified, len(points), deviation))
+        elif tag == "Placemark":
+            if pieces:
+                yield [layer for layer in names if layer], name, pieces
+            name, pieces = None, None
+        elif tag in ("Document", "Folder"):
+            names.pop()
+        if stack:
+            stack[-1].remove(element)
+        else:
+            element.clear()
+
+
+# --- Stages ------------------------------------------------------------------
+
+def gap(a: tuple, b: tuple) -> float:
+    ax, ay = project(a[0], a[1])
+    bx, by = project(b[0], b[1])
+    return math.hypot(ax - bx, ay - by)
+
+
+def along_samples(xy: list, count: int) -> list:
+    """`count` points evenly spaced along a plane line (the simplified pieces have few, uneven vertices)."""
+    along = [0.0]
+    for (x1, y1), (x2, y2) in zip(xy, xy[1:]):
+        along.append(along[-1] + math.hypot(x2 - x1, y2 - y1))
+    samples = []
+    i = 0
+    for k in range(count):
+        target = along[-1] * k / (count - 1)
+        while i < len(xy) - 2 and along[i + 1] < target:
+            i += 1
+        span = along[i + 1] - along[i]
+        t = (target - along[i]) / span if span > 0 else 0.0
+        samples.append((xy[i][0] + t * (xy[i + 1][0] - xy[i][0]), xy[i][1] + t * (xy[i + 1][1] - xy[i][1])))
+    return samples
+
+
+def match_stage(name: str, piece: list, numbers: set, references: dict):
+    """Stage number of a piece: from its placemark name, else the reference line most of it lies along."""
+    found = STAGE_NAME.search(name or "")
+    if found and int(found.group(1)) in numbers:
+        return int(found.group(1))
+    samples = along_samples([project(p[0], p[1]) for p in piece], MATCH_SAMPLES)
+    best, best_count = None, 0
+    for number, line in references.items():
+        count = sum(1 for x, y in samples if line.nearest(x, y, MATCH_RADIUS) <= MATCH_RADIUS)
+        if count > best_count:
+            best, best_count = number, count
+    return best if best_count * 2 > len(samples) else None
+
+
+def chain(pieces: list, start) -> tuple:
+    """(one line from the pieces, largest gap between chained pieces in meters), starting nearest to `start`."""
+    remaining = list(pieces)
+    line = []
+    largest = 0.0
+    position = start
+    while remaining:
+        if position is None:
+            piece = remaining.pop(0)
+        else:
+            best = min(range(len(remaining)),
+                       key=lambda i: min(gap(position, remaining[i][0]), gap(position, remaining[i][-1])))
+            piece = remaining.pop(best)
+            if gap(position, piece[-1]) < gap(position, piece[0]):
+                piece = piece[::-1]
+        if line:
+            largest = max(largest, gap(line[-1], piece[0]))
+            if piece[0][:2] == line[-1][:2]:
+                piece = piece[1:]
+        line.extend(piece)
+        position = line[-1]
+    return line, largest
+
+
+def with_elevations(line: list, reference: list) -> tuple:
+    """([lon, lat, ele] rows, elevation source) using the KML altitudes or the reference stage's profile."""
+    if any(p[2] for p in line):
+        return [[round(p[0], COORDINATE_DECIMALS), round(p[1], COORDINATE_DECIMALS), round(p[2] or 0.0, 1)]
+                for p in line], "kml"
+    if not reference:
+        return [[round(p[0], COORDINATE_DECIMALS), round(p[1], COORDINATE_DECIMALS), 0.0] for p in line], "none"
+    along = trail_data.cumulative_distances(line)
+    reference_km = trail_data.cumulative_distances(reference)[-1]
+    lookup = ProfileLookup.from_coordinates(reference)
+    scale = reference_km / along[-1] if along[-1] > 0 else 1.0
+    return [[round(p[0], COORDINATE_DECIMALS), round(p[1], COORDINATE_DECIMALS), round(lookup.at(km * scale), 1)]
+            for p, km in zip(line, along)], "current"
+
+
+def import_stages(path: str, trail: dict, current: dict, layers: list, tolerance: float, max_points: int) -> dict:
+    """{stage number: result dict} for the stages found in the KML."""
+    numbers = {stage["number"] for stage in trail["stages"]}
+    references = {number: Line(coords) for number, coords in current.items() if number in numbers}
+    found = {}
+    skipped = 0
+    for placemark_layers, name, pieces in iter_placemarks(path, tolerance, layers):
+        for piece, source_points, deviation in pieces:
+            number = match_stage(name, piece, numbers, references)
+            if number is None:
+                skipped += 1
+                continue
+            stage = found.setdefault(number, {"pieces": [], "sourcePoints": 0, "layers": set(), "deviation": 0.0})
+            stage["pieces"].append(piece)
+            stage["deviation"] = max(stage["deviation"], deviation)
+            stage["sourcePoints"] += source_points
+            stage["layers"].add(" / ".join(placemark_layers))
+
+    results = {}
+    previous_end = None
+    for number in sorted(found):
+        stage = found[number]
+        reference = current.get(number)
+        start = reference[0] if reference else previous_end
+        line, largest_gap = chain(stage["pieces"], start)
+        line, deviation = simplify(line, tolerance, max_points)
+        coordinates, elevation_source = with_elevations(line, reference)
+        stage.update(coordinates=coordinates, gap=largest_gap, deviation=max(stage["deviation"], deviation),
+                     elevations=elevation_source,
+                     hausdorff=hausdorff(Line(coordinates), references[number]) if number in references else None)
+        results[number] = stage
+        previous_end = line[-1]
+    results["skipped"] = skipped
+    return results
+
+
+def print_report(results: dict, numbers: list):
+    print(f"  {'stage':>5} {'pieces':>6} {'source':>9} {'kept':>6} {'deviation':>10} {'gap':>8} "
+          f"{'vs current':>11}  elevations")
+    for number in numbers:
+        stage = results.get(number)
+        if stage is None:
+            print(f"  {number:>5}  not found")
+            continue
+        distance = f"{stage['hausdorff']:.1f} m" if stage["hausdorff"] is not None else "-"
+        print(f"  {number:>5} {len(stage['pieces']):>6} {stage['sourcePoints']:>9} {len(stage['coordinates']):>6} "
+              f"{stage['deviation']:>8.1f} m {stage['gap']:>6.0f} m {distance:>11}  {stage['elevations']}")
+        if len(stage["layers"]) > 1:
+            print(f"        WARNING: pieces from several layers ({'; '.join(sorted(stage['layers']))}), "
+                  f"pass --layer to pick one")
+    if results["skipped"]:
+        print(f"  {results['skipped']} line(s) not along any stage skipped")
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+def write_synthetic_kml(path: str, stages: list, pois: list, megabytes: float, seed: int = 7) -> tuple:
+    """
+    (placemarks, points) of the Etapes layer of a multi-layer KML of about `megabytes`, written as it is generated.
+
+    Every line has a point every BENCHMARK_SPACING meters, so a bigger file has
+    more placemarks, not longer LineStrings: the stages come first, then
+    "Caiac" tracks heading out to sea from random trail points until the size
+    is reached (off the trail, so the import parses, simplifies and skips them).
+    """
+    rng = random.Random(seed)
+    noise = 0.3 / METERS_PER_DEGREE
+
+    def densified(coords: list):
+        for a, b in zip(coords, coords[1:]):
+            steps = max(1, int(gap(a, b) / BENCHMARK_SPACING))
+            for k in range(steps):
+                t = k / steps
+                yield (a[0] + t * (b[0] - a[0]) + rng.gauss(0, noise), a[1] + t * (b[1] - a[1]) + rng.gauss(0, noise))
+        yield coords[-1][0], coords[-1][1]
+
+    def line_string(f, points) -> int:
+        f.write("<LineString><tessellate>1</tessellate><coordinates>")
+        for n, (lon, lat) in enumerate(points):
+            f.write(f"{lon:.8f},{lat:.8f},0 ")
+            if n % 8 == 7:
+                f.write("\n")
+        f.write("</coordinates></LineString>")
+        return len(points)
+
+    # The trail follows the coast: lines heading away from the island's centre leave it
+    trail_points = [c for stage in stages for c in stage["coordinates"]]
+    centre = (sum(c[0] for c in trail_points) / len(trail_points), sum(c[1] for c in trail_points) / len(trail_points))
+    references = {stage["number"]: Line(stage["coordinates"]) for stage in stages}
+
+    def offshore_line() -> list:
+        while True:
+            start = rng.choice(rng.choice(stages)["coordinates"])
+            (sx, sy), (cx, cy) = project(start[0], start[1]), project(*centre)
+            length = math.hypot(sx - cx, sy - cy)
+            end = (start[0] + (sx - cx) / length * OFFSHORE_METERS / (METERS_PER_DEGREE * COS_ORIGIN),
+                   start[1] + (sy - cy) / length * OFFSHORE_METERS / METERS_PER_DEGREE)
+            # Across a bay the line can still follow the opposite shore: keep only lines the import skips
+            if match_stage("", [start, end], set(references), references) is None:
+                return list(densified([start, end]))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+                "<Document><name>Camí de Cavalls</name>\n<Folder><name>Punts d'interès</name>\n")
+        for poi in pois:
+            f.write(f"<Placemark><name>{html.escape(poi['names'].get('ca') or '')}</name><Point><coordinates>"
+                    f"{poi['longitude']},{poi['latitude']},0</coordinates></Point></Placemark>\n")
+        f.write("</Folder>\n<Folder><name>Variants</name>\n")
+        for stage in stages[::4]:
+            # Alternative paths 300 m inland: named after the stage, only the layer tells them apart
+            shifted = [(c[0], c[1] - 300 / METERS_PER_DEGREE) for c in stage["coordinates"]]
+            f.write(f"<Placemark><name>Variant etapa {stage['number']}</name>")
+            line_string(f, list(densified(shifted))[::4])
+            f.write("</Placemark>\n")
+        f.write("</Folder>\n<Folder><name>Etapes</name>\n")
+        placemarks = points = 0
+        for stage in stages:
+            coords = stage["coordinates"]
+            cuts = sorted(rng.sample(range(1, len(coords) - 1), rng.randint(1, 3)))
+            f.write(f"<Placemark><name>Etapa {stage['number']}: {html.escape(stage['name'])}</name><MultiGeometry>")
+            for a, b in zip([0] + cuts, cuts + [len(coords) - 1]):
+                piece = list(densified(coords[a:b + 1]))
+                points += line_string(f, piece[::-1] if rng.random() < 0.3 else piece)
+            f.write("</MultiGeometry></Placemark>\n")
+            placemarks += 1
+        while f.tell() < megabytes * 1024 * 1024:
+            f.write(f"<Placemark><name>Caiac {placemarks - len(stages) + 1}</name>")
+            points += line_string(f, offshore_line())
+            f.write("</Placemark>\n")
+            placemarks += 1
+        f.write("</Folder>\n</Document>\n</kml>\n")
+    return placemarks, points
+
+
+def benchmark(sizes: list, keep: str):
+    trail = trail_data.load_trail()
+    stages = trail_data.load_stages(trail["routeData"])
+    pois = trail_data.load_pois(trail_data.APP_POIS_PATH)
+    current = {stage["number"]: stage["coordinates"] for stage in stages}
+    rows = []
+    for n, megabytes in enumerate(sizes):
+        path = keep if keep and n == len(sizes) - 1 else None
+        if not path:
+            fd, path = tempfile.mkstemp(suffix=".kml")
+            os.close(fd)
+        try:
+            placemarks, points = write_synthetic_kml(path, stages, pois, megabytes)
+            size = os.path.getsize(path)
+
+            start = perf_counter()
+            results = import_stages(path, trail, current, ["Etapes"], DEFAULT_TOLERANCE_METERS, 0)
+            seconds = perf_counter() - start
+            if n == 0:
+                print_report(results, sorted(current))
+                print()
+
+            tracemalloc.start()
+            import_stages(path, trail, current, ["Etapes"], DEFAULT_TOLERANCE_METERS, 0)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append((size, placemarks, points, seconds, peak))
+        finally:
+            if path != keep:
+                os.remove(path)
+
+    print(f"Synthetic KML (layers: Punts d'interès, Variants, Etapes), a point every {BENCHMARK_SPACING:g} m; "
+          f"import of the Etapes layer:")
+    print(f"  {'file':>9} {'placemarks':>10} {'points':>10} {'time':>7} {'M points/s':>10} {'peak':>9}")
+    for size, placemarks, points, seconds, peak in rows:
+        print(f"  {format_bytes(size):>9} {placemarks:>10,} {points:>10,} {seconds:>6.1f}s "
+              f"{points / seconds / 1e6:>10.2f} {format_bytes(peak):>9}")
+    print("The peak is bounded by the largest LineString, not by the file size")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming KML import of the stage geometry")
+    parser.add_argument("command", choices=["import", "benchmark"])
+    parser.add_argument("kml", nargs="?", help="import: the KML file")
+    parser.add_argument("--layer", nargs="+", help="only placemarks below folders with these names")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_METERS,
+                        help="simplification tolerance in meters (default: %(default)s)")
+    parser.add_argument("--max-points", type=int, default=0, help="at most this many points per stage")
+    parser.add_argument("--trail", default=trail_data.DEFAULT_TRAIL, help="trail id in trails.json")
+    parser.add_argument("--update", action="store_true", help="write the imported stages to RouteData.kt")
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[5, 10, 20],
+                        help="benchmark: sizes of the synthetic KMLs (default: %(default)s)")
+    parser.add_argument("--keep", help="benchmark: write the largest synthetic KML here and keep it")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.megabytes, args.keep)
+        return
+    if not args.kml:
+        parser.error("import takes a KML file")
+
+    try:
+        trail = trail_data.load_trail(args.trail)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    current = {stage["number"]: stage["coordinates"] for stage in trail_data.load_stages(trail["routeData"])}
+    try:
+        results = import_stages(args.kml, trail, current, args.layer, args.tolerance, args.max_points)
+    except (OSError, ET.ParseError) as e:
+        print(f"ERROR: {args.kml}: {e}")
+        sys.exit(1)
+    numbers = [stage["number"] for stage in trail["stages"]]
+    print_report(results, numbers)
+
+    updates = {number: results[number]["coordinates"] for number in numbers if number in results}
+    if not updates:
+        print("ERROR: no stage found in the KML")
+        sys.exit(1)
+    if not args.update:
+        print(f"{len(updates)} stage(s) found; pass --update to write them to {trail['routeData']}")
+        return
+
+    trail_data.write_stage_coordinates(updates, trail["routeData"])
+    print(f"\nUpdated {trail['routeData']} for Route(s) {', '.join(map(str, sorted(updates)))}")
+    if trail["routeData"] == trail_data.ROUTE_DATA_PATH:
+        # New geometry changes the route hash, so the app re-seeds the routes
+        print("\nUpdating DataVersions.kt...")
+        write_data_versions()
+
+
+if __name__ == "__main__":
+    main()
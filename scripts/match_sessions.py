@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Map-match recorded session GPX exports against the 20 stages.
+
+Usage:
+    python3 match_sessions.py <gpx_dir> [--output PATH] [--workers N]
+                              [--sigma 10] [--radius 50]
+
+For every .gpx file under <gpx_dir> (session exports from the app, or any
+track/route with trkpt/rtept/wpt points), every point is snapped to the stage
+polylines of RouteData.kt with a hidden Markov model:
+- candidates: the closest positions on the stage segments within --radius
+  meters, found through a uniform grid index of the segments
+- emission: Gaussian on the GPS distance (sigma = --sigma meters)
+- transition: exponential on the difference between the straight-line
+  distance and the along-trail distance between two candidates
+  (consecutive stages are connected at their shared endpoints, 20 -> 1 too)
+and the most likely sequence is found with Viterbi. Points without any
+candidate are off-route and split the track into independent chains.
+
+The files are processed in a process pool; each worker builds the index once.
+One JSON object per session is written to --output (JSON Lines) with:
+- per-stage coverage (meters and percent of the stage, merged intervals),
+  direction and timing (first/last time on the stage, when the GPX has times)
+- off-route intervals (point ranges, times, max distance from the trail;
+  null when the trail is more than 2 km away)
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import trail_data
+from geodesy import SegmentIndex, project
+
+DEFAULT_SIGMA = 10.0        # GPS noise (m)
+DEFAULT_RADIUS = 50.0       # candidate search radius (m), farther points are off-route
+DEFAULT_BETA = 20.0         # transition tolerance (m)
+POINT_TAGS = ("trkpt", "rtept", "wpt")
+
+
+def parse_time(text):
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def read_gpx_points(path: str) -> list:
+    """Return [(lon, lat, ele or None, datetime or None)] for every trkpt/rtept/wpt, streaming the file."""
+    points = []
+    for _, element in ET.iterparse(path, events=("end",)):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag in POINT_TAGS:
+            elevation = None
+            timestamp = None
+            for child in element:
+                child_tag = child.tag.rsplit("}", 1)[-1]
+                if child_tag == "ele" and child.text:
+                    elevation = float(child.text)
+                elif child_tag == "time":
+                    timestamp = parse_time(child.text)
+            points.append((float(element.get("lon")), float(element.get("lat")), elevation, timestamp))
+            element.clear()
+    return points
+
+
+def viterbi(index: SegmentIndex, chain: list, positions: list, sigma: float, beta: float) -> list:
+    """
+    Most likely candidate per point of a chain of point indices.
+
+    Returns [(point index, candidate)]; when no transition is possible between
+    two consecutive points the chain is restarted from the second one.
+    """
+    matched = []
+    scores = None
+    back = []
+
+    def flush():
+        if not scores:
+            return
+        best = max(range(len(scores)), key=lambda k: scores[k])
+        path = []
+        for step in range(len(back) - 1, -1, -1):
+            point, candidates, pointers = back[step]
+            path.append((point, candidates[best]))
+            best = pointers[best]
+        matched.extend(reversed(path))
+
+    previous_xy = None
+    for point in chain:
+        candidates = positions[point][1]
+        emissions = [-0.5 * (c[0] / sigma) ** 2 for c in candidates]
+        xy = positions[point][0]
+
+        if scores is None:
+            scores = emissions
+            back = [(point, candidates, [0] * len(candidates))]
+            previous_xy = xy
+            continue
+
+        straight = math.hypot(xy[0] - previous_xy[0], xy[1] - previous_xy[1])
+        previous_candidates = back[-1][1]
+        new_scores = []
+        pointers = []
+        for candidate, emission in zip(candidates, emissions):
+            best_score = -math.inf
+            best_pointer = 0
+            for k, previous in enumerate(previous_candidates):
+                route = index.route_distance(previous, candidate)
+                if route is None:
+                    continue
+                score = scores[k] - abs(route - straight) / beta
+                if score > best_score:
+                    best_score, best_pointer = score, k
+            new_scores.append(best_score + emission)
+            pointers.append(best_pointer)
+
+        if all(score == -math.inf for score in new_scores):
+            flush()
+            scores = emissions
+            back = [(point, candidates, [0] * len(candidates))]
+        else:
+            scores = new_scores
+            back.append((point, candidates, pointers))
+        previous_xy = xy
+
+    flush()
+    return matched
+
+
+def merge_intervals(intervals: list) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def summarize(index: SegmentIndex, points: list, matched: list, off_route: list) -> dict:
+    """Build coverage, timing and off-route reports from the matched points."""
+    stages = {}
+
+    def stage_entry(number):
+        return stages.setdefault(number, {"intervals": [], "first": None, "last": None, "along": []})
+
+    for (i, (_, stage, along)), next_match in zip(matched, matched[1:] + [None]):
+        entry = stage_entry(stage)
+        entry["along"].append(along)
+        if entry["first"] is None:
+            entry["first"] = i
+        entry["last"] = i
+        if next_match is None or next_match[0] != i + 1:
+            continue
+        _, next_stage, next_along = next_match[1]
+        if next_stage == stage:
+            entry["intervals"].append((min(along, next_along), max(along, next_along)))
+        elif index.route_distance((0, stage, along), (0, next_stage, next_along)) is not None:
+            # Crossing a stage junction: cover up to the shared endpoint on both sides
+            length = index.stage_lengths[stage]
+            next_length = index.stage_lengths[next_stage]
+            forward = index.next_stage[stage] == next_stage
+            entry["intervals"].append((along, length) if forward else (0.0, along))
+            stage_entry(next_stage)["intervals"].append((0.0, next_along) if forward else (next_along, next_length))
+
+    report = {}
+    for number in sorted(stages):
+        entry = stages[number]
+        length = index.stage_lengths[number]
+        intervals = merge_intervals(entry["intervals"])
+        covered = sum(end - start for start, end in intervals)
+        if covered < 1.0:
+            # Only touched at a junction shared with the neighbouring stage
+            continue
+        along = entry["along"]
+        stage_report = {
+            "coveredMeters": round(covered, 1),
+            "coveragePercent": round(covered / length * 100, 1) if length else 0.0,
+            "intervalsKm": [[round(start / 1000, 3), round(end / 1000, 3)] for start, end in intervals],
+            "direction": "forward" if along[-1] >= along[0] else "reverse",
+            "firstPoint": entry["first"],
+            "lastPoint": entry["last"],
+        }
+        start_time, end_time = points[entry["first"]][3], points[entry["last"]][3]
+        if start_time and end_time:
+            stage_report["startTime"] = start_time.isoformat()
+            stage_report["endTime"] = end_time.isoformat()
+            stage_report["durationSeconds"] = round((end_time - start_time).total_seconds())
+        report[str(number)] = stage_report
+
+    intervals = []
+    for i, distance in off_route:
+        if intervals and intervals[-1]["endPoint"] == i - 1:
+            intervals[-1]["endPoint"] = i
+            intervals[-1]["maxDistanceMeters"] = max(intervals[-1]["maxDistanceMeters"], distance)
+        else:
+            intervals.append({"startPoint": i, "endPoint": i, "maxDistanceMeters": distance})
+    for interval in intervals:
+        # No trail within the 2 km search (e.g. tracking left on while driving): null, not Infinity
+        distance = interval["maxDistanceMeters"]
+        interval["maxDistanceMeters"] = None if math.isinf(distance) else round(distance, 1)
+        start_time, end_time = points[interval["startPoint"]][3], points[interval["endPoint"]][3]
+        if start_time and end_time:
+            interval["startTime"] = start_time.isoformat()
+            interval["endTime"] = end_time.isoformat()
+
+    return {"stages": report, "offRoute": intervals}
+
+
+def nearest_trail_distance(index: SegmentIndex, x: float, y: float, radius: float) -> float:
+    """Distance to the trail for an off-route point, searching outward up to 2 km (math.inf beyond)."""
+    search = radius * 2
+    while search <= 2000:
+        candidates = index.candidates(x, y, search)
+        if candidates:
+            return candidates[0][0]
+        search *= 2
+    return math.inf
+
+
+def match_session(index: SegmentIndex, path: str, sigma: float, radius: float, beta: float) -> dict:
+    """Match one GPX file and return its report."""
+    points = read_gpx_points(path)
+    positions = []
+    off_route = []
+    chains = [[]]
+    for i, (lon, lat, _, _) in enumerate(points):
+        xy = project(lon, lat)
+        candidates = index.candidates(xy[0], xy[1], radius)
+        positions.append((xy, candidates))
+        if candidates:
+            chains[-1].append(i)
+        else:
+            off_route.append((i, nearest_trail_distance(index, xy[0], xy[1], radius)))
+            if chains[-1]:
+                chains.append([])
+
+    matched = []
+    for chain in chains:
+        if chain:
+            matched.extend(viterbi(index, chain, positions, sigma, beta))
+
+    report = {"file": path, "points": len(points), "matchedPoints": len(matched)}
+    report.update(summarize(index, points, matched, off_route))
+    return report
+
+
+_index = None
+_settings = None
+
+
+def _init_worker(sigma, radius, beta):
+    global _index, _settings
+    _index = SegmentIndex(trail_data.load_stages())
+    _settings = (sigma, radius, beta)
+
+
+def _match_worker(path: str) -> dict:
+    try:
+        return match_session(_index, path, *_settings)
+    except (ET.ParseError, OSError, ValueError, TypeError) as e:
+        return {"file": path, "error": str(e)}
+
+
+def find_gpx_files(directory: str) -> list:
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(os.path.join(root, name) for name in names if name.lower().endswith(".gpx"))
+    return sorted(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map-match session GPX exports against the stages")
+    parser.add_argument("gpx_dir")
+    parser.add_argument("--output", help="JSON Lines report (default: <gpx_dir>/match_results.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sigma", type=float, default=DEFAULT_SIGMA, help="GPS noise in meters")
+    parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS, help="off-route threshold in meters")
+    parser.add_argument("--beta", type=float, default=DEFAULT_BETA, help="transition tolerance in meters")
+    args = parser.parse_args()
+
+    files = find_gpx_files(args.gpx_dir)
+    if not files:
+        print(f"No GPX files found in {args.gpx_dir}")
+        sys.exit(1)
+    output = args.output or os.path.join(args.gpx_dir, "match_results.jsonl")
+
+    print(f"Matching {len(files)} sessions with {args.workers} workers...")
+    start = time.perf_counter()
+    sessions_per_stage = {}
+    errors = 0
+    total_points = 0
+    with open(output, 'w', encoding='utf-8') as f, \
+            ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                initargs=(args.sigma, args.radius, args.beta)) as pool:
+        chunk_size = max(1, len(files) // (args.workers * 8))
+        for report in pool.map(_match_worker, files, chunksize=chunk_size):
+            f.write(json.dumps(report, ensure_ascii=False, allow_nan=False) + "\n")
+            if "error" in report:
+                errors += 1
+                print(f"  ERROR {report['file']}: {report['error']}")
+                continue
+            total_points += report["points"]
+            for number in report["stages"]:
+                sessions_per_stage.setdefault(int(number), []).append(report["stages"][number]["coveragePercent"])
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'='*60}")
+    print(f"{len(files) - errors} sessions, {total_points} points in {elapsed:.1f}s "
+          f"({total_points / elapsed:.0f} points/s)")
+    for number in sorted(sessions_per_stage):
+        coverages = sorted(sessions_per_stage[number])
+        print(f"  Route {number:>2}: {len(coverages)} sessions, median coverage {coverages[len(coverages) // 2]:.1f}%")
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Prebuilt multilingual full-text search index for the POIs.
+
+Usage:
+    python3 poi_search_index.py build [--output PATH]
+    python3 poi_search_index.py search <language> <query ...> [--limit 10]
+    python3 poi_search_index.py benchmark [--runs 200]
+
+build reads the POI names and descriptions in the six languages
+(pois_all_translations_complete.json) and writes one inverted index per
+language to the app resource composeResources/files/poi_search_index.json:
+- text is folded before tokenizing: lower case, accents removed (à -> a,
+  ò -> o, ç -> c), the Catalan middle dot joined (l·l -> ll), apostrophes
+  split ("d'en" -> "d", "en") and every other punctuation a separator;
+  one-letter tokens are dropped
+- terms: the sorted term table of the language, so a prefix is a binary
+  search for the first and last term that start with it
+- postings: per term a flat [poi delta, weight, poi delta, weight, ...] list
+  (ascending POI indexes into "pois", delta-coded); the weight adds
+  FIELD_WEIGHTS per occurrence, a name match counting far more than one in
+  the description
+
+PoiSearchIndex is the reference query engine the app's search mirrors: every
+query token must match (the last one as a prefix, while typing), and the POIs
+are ranked by the sum of the matched weights times the term's idf.
+
+benchmark compares the index with scanning every folded name and description
+for the same queries.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import bisect
+import argparse
+import unicodedata
+
+import trail_data
+
+DEFAULT_OUTPUT = os.path.join(trail_data.APP_FILES_DIR, "poi_search_index.json")
+FIELD_WEIGHTS = {"names": 10, "descriptions": 1}
+# Matches of a longer term through a prefix rank below exact matches
+PREFIX_FACTOR = 0.5
+MIN_TOKEN_LENGTH = 2
+BENCHMARK_QUERIES = [
+    ("ca", "cala morell"), ("ca", "binimel"), ("ca", "torre de defensa"), ("ca", "far"),
+    ("es", "faro de favaritx"), ("es", "talayot"), ("en", "watch tower"), ("en", "lighthouse"),
+    ("de", "kuste"), ("fr", "phare"), ("it", "spiaggia"), ("ca", "s'albufera"),
+]
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """Lower case without accents; the Catalan l·l becomes ll."""
+    text = text.replace("\u00b7", "").replace("\u2027", "").casefold()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list:
+    return [token for token in _SEPARATORS.split(fold(text)) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def build_index(pois: list) -> dict:
+    pois = sorted(pois, key=lambda p: int(p["id"]))
+    index = {"fieldWeights": FIELD_WEIGHTS, "pois": [poi["id"] for poi in pois], "languages": {}}
+    for language in trail_data.LANGUAGES:
+        weights = {}
+        for doc, poi in enumerate(pois):
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(poi[field].get(language) or ""):
+                    postings = weights.setdefault(token, {})
+                    postings[doc] = postings.get(doc, 0) + weight
+
+        terms = sorted(weights)
+        postings = []
+        for term in terms:
+            flat, previous = [], 0
+            for doc, weight in sorted(weights[term].items()):
+                flat += [doc - previous, weight]
+                previous = doc
+            postings.append(flat)
+        index["languages"][language] = {"terms": terms, "postings": postings}
+    return index
+
+
+class PoiSearchIndex:
+    """Query engine over a poi_search_index.json."""
+
+    def __init__(self, data: dict):
+        self.pois = data["pois"]
+        self.languages = data["languages"]
+        self._decoded = {}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_OUTPUT):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def postings(self, language: str, position: int) -> dict:
+        """{poi index: weight} of the term at `position`, decoded once."""
+        key = (language, position)
+        if key not in self._decoded:
+            flat = self.languages[language]["postings"][position]
+            decoded, doc = {}, 0
+            for i in range(0, len(flat), 2):
+                doc += flat[i]
+                decoded[doc] = flat[i + 1]
+            self._decoded[key] = decoded
+        return self._decoded[key]
+
+    def term_range(self, language: str, prefix: str) -> range:
+        """Positions of the terms starting with `prefix` in the sorted term table."""
+        terms = self.languages[language]["terms"]
+        start = bisect.bisect_left(terms, prefix)
+        return range(start, bisect.bisect_left(terms, prefix + "\uffff", start))
+
+    def search(self, language: str, query: str, limit: int = 10) -> list:
+        """[(poi id, score)], best first; every token must match, the last one as a prefix."""
+        if language not in self.languages:
+            raise ValueError(f"Unknown language {language!r} (index has: {', '.join(self.languages)})")
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        terms = self.languages[language]["terms"]
+        count = len(self.pois)
+
+        scores = None
+        for n, token in enumerate(tokens):
+            if n == len(tokens) - 1:
+                positions = self.term_range(language, token)
+            else:
+                position = bisect.bisect_left(terms, token)
+                positions = range(position, position + 1) if position < len(terms) and terms[position] == token else ()
+
+            matched = {}
+            for position in positions:
+                postings = self.postings(language, position)
+                factor = math.log(1 + count / len(postings)) * (1.0 if terms[position] == token else PREFIX_FACTOR)
+                for doc, weight in postings.items():
+                    # The best-matching term counts per query token
+                    matched[doc] = max(matched.get(doc, 0.0), weight * factor)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {doc: score + matched[doc] for doc, score in scores.items() if doc in matched}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.pois[doc], round(score, 2)) for doc, score in ranked]
+
+
+def scan_search(pois: list, language: str, query: str) -> set:
+    """Reference without an index: fold and tokenize every name and description for each query."""
+    tokens = tokenize(query)
+    found = set()
+    for poi in pois:
+        words = set()
+        for field in FIELD_WEIGHTS:
+            words.update(tokenize(poi[field].get(language) or ""))
+        if all(token in words for token in tokens[:-1]) and any(w.startswith(tokens[-1]) for w in words):
+            found.add(poi["id"])
+    return found
+
+
+def benchmark(pois: list, index: PoiSearchIndex, runs: int):
+    print(f"  {'query':<26}{'hits':>5}{'index µs':>10}{'scan µs':>10}")
+    total_index = total_scan = 0.0
+    for language, query in BENCHMARK_QUERIES:
+        start = time.perf_counter()
+        for _ in range(runs):
+            hits = index.search(language, query, limit=len(pois))
+        index_us = (time.perf_counter() - start) / runs * 1e6
+
+        scan_runs = max(1, runs // 20)
+        start = time.perf_counter()
+        for _ in range(scan_runs):
+            scanned = scan_search(pois, language, query)
+        scan_us = (time.perf_counter() - start) / scan_runs * 1e6
+
+        if {poi_id for poi_id, _ in hits} != scanned:
+            raise RuntimeError(f"{language} {query!r}: index and scan disagree")
+        total_index += index_us
+        total_scan += scan_us
+        print(f"  {language + ' ' + repr(query):<26}{len(hits):>5}{index_us:>10.0f}{scan_us:>10.0f}")
+    queries = len(BENCHMARK_QUERIES)
+    print(f"Mean per query: {total_index / queries:.0f} µs with the index, {total_scan / queries:.0f} µs scanning "
+          f"({total_scan / total_index:.0f}x); same results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multilingual full-text search index for the POIs")
+    parser.add_argument("command", choices=["build", "search", "benchmark"])
+    parser.add_argument("query", nargs="*", help="search: <language> <query ...>")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="index file to write (build) or read")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        pois = trail_data.load_pois()
+        data = build_index(pois)
+        trail_data.atomic_write(args.output, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        for language, table in data["languages"].items():
+            postings = sum(len(p) // 2 for p in table["postings"])
+            print(f"  {language}: {len(table['terms']):>5} terms, {postings:>6} postings")
+        print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+        return
+
+    try:
+        index = PoiSearchIndex.load(args.output)
+    except OSError as e:
+        print(f"ERROR: {e} (run `build` first)")
+        sys.exit(1)
+
+    if args.command == "benchmark":
+        benchmark(trail_data.load_pois(), index, args.runs)
+        return
+
+    if len(args.query) < 2:
+        parser.error("search takes a language and a query")
+    try:
+        results = index.search(args.query[0], " ".join(args.query[1:]), args.limit)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    names = {poi["id"]: poi["names"] for poi in trail_data.load_pois()}
+    for poi_id, score in results:
+        print(f"  {score:>7.2f}  {poi_id}  {names[poi_id].get(args.query[0], '')}")
+    if not results:
+        print("  no results")
+
+
+if __name__ == "__main__":
+    main()
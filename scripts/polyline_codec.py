@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Encoded-polyline codec for stage coordinates (with elevation).
+
+Usage:
+    python3 polyline_codec.py export [--precision 6] [--elevation-precision 1] [--output PATH]
+    python3 polyline_codec.py verify [--precision 6] [--elevation-precision 1]
+    python3 polyline_codec.py benchmark [--iterations 20]
+
+Format (an extension of the Google encoded-polyline algorithm):
+- Every value is quantized to an integer (lat/lon at 10^-precision degrees,
+  elevation at 10^-elevation_precision meters), delta-encoded against the
+  previous point, zigzag-mapped and written as 5-bit varint chunks offset
+  into printable ASCII (chr(63 + chunk)).
+- The first varint is a header: precision | elevation_precision << 4 | dimensions << 8
+  so the decoder needs no out-of-band parameters.
+- Points are stored as (lat, lon[, ele]) and decoded back to [lon, lat, ele]
+  to match the GeoJSON order used in gpxData. A line is 2D or 3D as a whole:
+  encoding one where only some points have an elevation is an error.
+
+Quantizing absolute values before taking deltas keeps the error of every point
+within half a quantization step (no drift along the line).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import trail_data
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "route_polylines.json")
+
+DEFAULT_PRECISION = 6            # 1e-6 degrees (~0.1 m)
+DEFAULT_ELEVATION_PRECISION = 1  # 0.1 m
+
+
+def _encode_unsigned(value: int, out: list):
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def _encode_signed(value: int, out: list):
+    _encode_unsigned(~(value << 1) if value < 0 else value << 1, out)
+
+
+def encode(coords: list, precision: int = DEFAULT_PRECISION,
+           elevation_precision: int = DEFAULT_ELEVATION_PRECISION) -> str:
+    """Encode [lon, lat(, ele)] coordinates; raises ValueError if only some points have an elevation."""
+    with_elevation = sum(len(c) > 2 for c in coords)
+    if 0 < with_elevation < len(coords):
+        raise ValueError(f"{len(coords) - with_elevation} of {len(coords)} points have no elevation")
+    dimensions = 3 if with_elevation else 2
+    factor = 10 ** precision
+    elevation_factor = 10 ** elevation_precision
+
+    out = []
+    _encode_unsigned(precision | (elevation_precision << 4) | (dimensions << 8), out)
+
+    prev_lat = prev_lon = prev_ele = 0
+    for c in coords:
+        lat = round(c[1] * factor)
+        lon = round(c[0] * factor)
+        _encode_signed(lat - prev_lat, out)
+        _encode_signed(lon - prev_lon, out)
+        prev_lat, prev_lon = lat, lon
+        if dimensions == 3:
+            ele = round(c[2] * elevation_factor)
+            _encode_signed(ele - prev_ele, out)
+            prev_ele = ele
+    return "".join(out)
+
+
+def decode(encoded: str) -> list:
+    """Decode a string produced by encode() back to [lon, lat(, ele)] coordinates."""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1F) << shift
+        if chunk < 0x20:
+            values.append(value)
+            value = shift = 0
+        else:
+            shift += 5
+
+    header = values[0]
+    precision = header & 0xF
+    elevation_precision = (header >> 4) & 0xF
+    dimensions = header >> 8
+    factor = 10 ** precision
+    elevation_factor = 10 ** elevation_precision
+
+    coords = []
+    lat = lon = ele = 0
+    for i in range(1, len(values), dimensions):
+        d_lat, d_lon = values[i], values[i + 1]
+        lat += ~(d_lat >> 1) if d_lat & 1 else d_lat >> 1
+        lon += ~(d_lon >> 1) if d_lon & 1 else d_lon >> 1
+        if dimensions == 3:
+            d_ele = values[i + 2]
+            ele += ~(d_ele >> 1) if d_ele & 1 else d_ele >> 1
+            coords.append([lon / factor, lat / factor, ele / elevation_factor])
+        else:
+            coords.append([lon / factor, lat / factor])
+    return coords
+
+
+def max_errors(original: list, decoded: list) -> tuple:
+    """Largest absolute (degree, elevation) difference between two coordinate lists."""
+    if len(original) != len(decoded):
+        raise ValueError(f"Point count changed: {len(original)} -> {len(decoded)}")
+    degree_error = 0.0
+    elevation_error = 0.0
+    for a, b in zip(original, decoded):
+        degree_error = max(degree_error, abs(a[0] - b[0]), abs(a[1] - b[1]))
+        if len(a) > 2:
+            elevation_error = max(elevation_error, abs(a[2] - b[2]))
+    return degree_error, elevation_error
+
+
+def geojson_text(coords: list) -> str:
+    """The gpxData form written by extract_all_routes.update_route_data."""
+    return json.dumps({"type": "LineString", "coordinates": coords}, separators=(',', ':'))
+
+
+def verify(stages: list, precision: int, elevation_precision: int) -> bool:
+    """Round-trip every stage and check the error bounds (half a quantization step)."""
+    degree_bound = 0.5 * 10 ** -precision + 1e-12
+    elevation_bound = 0.5 * 10 ** -elevation_precision + 1e-9
+    ok = True
+
+    print(f"Error bounds: {degree_bound:.2e} deg, {elevation_bound:.2e} m")
+    lines = [(f"Route {s['number']}", s["coordinates"]) for s in stages]
+    lines.append(("Complete loop", trail_data.combined_coordinates(stages)))
+    # Edge cases: empty line, single point, 2D line, negative/antimeridian values
+    lines.append(("Edge: empty", []))
+    lines.append(("Edge: single point", [[4.2573604472, 39.8975369761, 7.5]]))
+    lines.append(("Edge: 2D", [[4.25, 39.89], [4.26, 39.88]]))
+    lines.append(("Edge: extremes", [[-179.9999999, -89.9999999, -412.3], [179.9999999, 89.9999999, 8848.86]]))
+
+    for name, coords in lines:
+        decoded = decode(encode(coords, precision, elevation_precision))
+        degree_error, elevation_error = max_errors(coords, decoded)
+        passed = degree_error <= degree_bound and elevation_error <= elevation_bound
+        ok = ok and passed
+        if not passed or not name.startswith("Route"):
+            status = "OK" if passed else "FAIL"
+            print(f"  {status:<4} {name}: {degree_error:.2e} deg, {elevation_error:.3f} m")
+
+    print("All round trips within bounds" if ok else "Round-trip errors exceed the bounds")
+    return ok
+
+
+def benchmark(stages: list, iterations: int, precision: int, elevation_precision: int):
+    """Compare size and decode time against the GeoJSON gpxData text."""
+    texts = [geojson_text(s["coordinates"]) for s in stages]
+    encoded = [encode(s["coordinates"], precision, elevation_precision) for s in stages]
+
+    json_size = sum(len(t) for t in texts)
+    polyline_size = sum(len(e) for e in encoded)
+    print(f"Size: GeoJSON {json_size / 1024:.1f} KB, polyline {polyline_size / 1024:.1f} KB "
+          f"({polyline_size / json_size * 100:.1f}%)")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            json.loads(text)["coordinates"]
+    json_time = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in encoded:
+            decode(text)
+    polyline_time = (time.perf_counter() - start) / iterations
+
+    points = sum(len(s["coordinates"]) for s in stages)
+    print(f"Decode all {len(stages)} stages ({points} points), mean of {iterations} runs:")
+    print(f"  json.loads: {json_time * 1000:.2f} ms")
+    print(f"  polyline:   {polyline_time * 1000:.2f} ms")
+
+
+def export(stages: list, output: str, precision: int, elevation_precision: int):
+    """Write {stage number: encoded polyline} plus the complete loop as JSON."""
+    data = {
+        "precision": precision,
+        "elevationPrecision": elevation_precision,
+        "routes": {str(s["number"]): encode(s["coordinates"], precision, elevation_precision) for s in stages},
+        "complete": encode(trail_data.combined_coordinates(stages), precision, elevation_precision),
+    }
+    trail_data.atomic_write(output, json.dumps(data, separators=(',', ':')))
+    print(f"Saved {len(stages)} encoded stages to {output} ({os.path.getsize(output) / 1024:.1f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoded-polyline codec for stage coordinates")
+    parser.add_argument("command", choices=["export", "verify", "benchmark"])
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help="lat/lon decimal digits (default: %(default)s)")
+    parser.add_argument("--elevation-precision", type=int, default=DEFAULT_ELEVATION_PRECISION,
+                        help="elevation decimal digits (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if not (0 <= args.precision <= 15 and 0 <= args.elevation_precision <= 15):
+        print("Precisions must be between 0 and 15")
+        sys.exit(1)
+
+    stages = trail_data.load_stages()
+    if args.command == "export":
+        export(stages, args.output, args.precision, args.elevation_precision)
+    elif args.command == "verify":
+        if not verify(stages, args.precision, args.elevation_precision):
+            sys.exit(1)
+    else:
+        benchmark(stages, args.iterations, args.precision, args.elevation_precision)
+
+
+if __name__ == "__main__":
+    main()
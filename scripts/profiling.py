@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Shared timing/memory instrumentation for the data scripts.
+
+Usage in a script:
+
+    from profiling import span, profiled_main
+
+    with span("download"):
+        ...
+
+    if __name__ == "__main__":
+        profiled_main(main)
+
+Then run any instrumented script with an extra flag:
+
+    python3 extract_all_routes.py all --profile
+    python3 extract_all_routes.py all --profile=/tmp/profiles
+
+Without --profile the spans only cost two perf_counter() calls and nothing is
+printed. With --profile the script runs under cProfile, tracemalloc and a
+wall-clock stack sampler, and on exit:
+- prints the span table (calls, total/mean time, peak traced memory) and the
+  top functions by cumulative time
+- writes <name>.prof (pstats; `python3 -m pstats` or snakeviz) and
+  <name>.collapsed (collapsed stacks for flamegraph.pl or speedscope)
+to scripts/profiles/ (or the given directory).
+
+Spans and cProfile only see the current process: scripts that fan work out
+to worker processes check enabled() and stay in-process while profiling.
+"""
+
+import os
+import sys
+import time
+import signal
+from contextlib import ContextDecorator
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFILE_DIR = os.path.join(SCRIPTS_DIR, "profiles")
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_FUNCTIONS = 15
+
+# span path -> [calls, total seconds, peak traced bytes]
+_spans = {}
+_stack = []
+# tracemalloc module while profiled_main() traces, else None: the profilers
+# (pstats alone pulls in dataclasses and inspect) only load with --profile
+_tracemalloc = None
+
+
+class span(ContextDecorator):
+    """
+    Named timing span, usable as a context manager or decorator.
+
+    Nested spans are recorded under their parent's path ("process_route/extract").
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        parent_path = _stack[-1][0] if _stack else None
+        self.path = f"{parent_path}/{self.name}" if parent_path else self.name
+        if _tracemalloc:
+            # reset_peak() clears the parent's peak too: remember it first
+            if _stack:
+                _stack[-1][1] = max(_stack[-1][1], _tracemalloc.get_traced_memory()[1])
+            _tracemalloc.reset_peak()
+        # Registered on entry so the report lists parents before their children
+        _spans.setdefault(self.path, [0, 0.0, 0])
+        _stack.append([self.path, 0])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _, peak = _stack.pop()
+        if _tracemalloc:
+            peak = max(peak, _tracemalloc.get_traced_memory()[1])
+            if _stack:
+                _stack[-1][1] = max(_stack[-1][1], peak)
+        entry = _spans[self.path]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], peak)
+        return False
+
+
+class StackSampler:
+    """Wall-clock sampler of the main thread's Python stack (SIGALRM, Unix only)."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.counts = {}
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack = ";".join(reversed(names))
+        self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def start(self) -> bool:
+        if not hasattr(signal, "setitimer"):
+            return False
+        signal.signal(signal.SIGALRM, self._sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        return True
+
+    def stop(self):
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0, 0)
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the process (0 where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def enabled() -> bool:
+    """True inside profiled_main() with --profile: work done in other processes is not recorded."""
+    return _tracemalloc is not None
+
+
+def print_span_report():
+    if not _spans:
+        return
+    print(f"\n{'='*60}")
+    print("Spans")
+    print('='*60)
+    width = max(len(path) for path in _spans) + 2
+    print(f"{'span':<{width}}{'calls':>6}{'total s':>10}{'mean ms':>10}{'peak':>12}")
+    for path, (calls, total, peak) in _spans.items():
+        print(f"{path:<{width}}{calls:>6}{total:>10.3f}{total / calls * 1000:>10.1f}{format_bytes(peak):>12}")
+
+
+def _pop_profile_argument():
+    """Remove --profile[=DIR] from sys.argv; return the output directory or None."""
+    for i, arg in enumerate(sys.argv[1:], 1):
+        if arg == "--profile" or arg.startswith("--profile="):
+            del sys.argv[i]
+            return arg.split("=", 1)[1] if "=" in arg else DEFAULT_PROFILE_DIR
+    return None
+
+
+def profiled_main(main, name: str = None):
+    """Run `main()`, under the profilers if --profile was given on the command line."""
+    global _tracemalloc
+    output_dir = _pop_profile_argument()
+    if output_dir is None:
+        return main()
+
+    import pstats
+    import cProfile
+    import tracemalloc
+
+    name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    tracemalloc.start()
+    _tracemalloc = tracemalloc
+    sampling = sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        with span(name):
+            return main()
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        _tracemalloc = None
+        tracemalloc.stop()
+
+        print_span_report()
+
+        stats_path = os.path.join(output_dir, f"{name}.prof")
+        profiler.dump_stats(stats_path)
+        print(f"\nTop {TOP_FUNCTIONS} functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        print(f"Wall time: {elapsed:.2f}s, peak traced memory: {format_bytes(traced_peak)}, "
+              f"peak RSS: {format_bytes(peak_rss_bytes())}")
+        print(f"cProfile stats: {stats_path}")
+        if sampling:
+            collapsed_path = os.path.join(output_dir, f"{name}.collapsed")
+            sampler.write_collapsed(collapsed_path)
+            print(f"Collapsed stacks: {collapsed_path} ({sum(sampler.counts.values())} samples)")
@@ -4,10 +4,16 @@ Scrape POI coordinates from camidecavalls.com interactive map.
 Extracts the correct latitude/longitude for all POIs.
 """
 
+import os
+import sys
 import json
 import re
 from urllib.request import Request, urlopen
 
+import trail_data
+
+OUTPUT_PATH = os.path.join(trail_data.SCRIPTS_DIR, "camidecavalls_pois", "coordinates_from_map.json")
+
 def scrape_map_coordinates():
     """
     Scrape coordinates from the interactive map JavaScript.
@@ -57,7 +63,7 @@ def scrape_map_coordinates():
     return coordinates
 
 
-if __name__ == '__main__':
+def main():
     print("🗺️  Camí de Cavalls - POI Coordinates Scraper")
     print("=" * 50)
 
@@ -65,9 +71,8 @@ if __name__ == '__main__':
         coords = scrape_map_coordinates()
 
         # Save to JSON
-        output_file = 'scripts/camidecavalls_pois/coordinates_from_map.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(coords, f, ensure_ascii=False, indent=2)
+        output_file = OUTPUT_PATH
+        trail_data.atomic_write(output_file, json.dumps(coords, ensure_ascii=False, indent=2))
 
         print(f"\n✅ Saved {len(coords)} POI coordinates to {output_file}")
 
@@ -83,3 +88,9 @@ if __name__ == '__main__':
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
+        # Non-zero exit so build_data.py restores the output and does not run fix_pois on it
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ The website uses session cookies to manage language selection:
 2. Then visit Contingut.aspx?IdPub=Y to get translated content
 """
 
+import os
 import json
 import re
 import time
@@ -16,6 +17,11 @@ from urllib.error import URLError
 from http.cookiejar import CookieJar
 from html import unescape
 
+import trail_data
+from profiling import span, profiled_main
+
+POIS_DIR = os.path.join(trail_data.SCRIPTS_DIR, "camidecavalls_pois")
+
 # Retry configuration
 MAX_RETRIES = 5
 INITIAL_RETRY_DELAY = 2  # seconds
@@ -117,7 +123,8 @@ def fetch_poi_page(poi_id, language='ca', opener=None, retry_count=0):
         # STEP 1: Set language cookie by visiting portal.aspx with IDIOMA parameter
         portal_url = f'https://www.camidecavalls.com/portal.aspx?IDIOMA={idioma}'
         req = Request(portal_url, headers=headers)
-        opener.open(req, timeout=15)
+        with span("download"):
+            opener.open(req, timeout=15)
 
         # Small delay to ensure cookie is set
         time.sleep(0.2)
@@ -125,11 +132,13 @@ def fetch_poi_page(poi_id, language='ca', opener=None, retry_count=0):
         # STEP 2: Now fetch POI page with the language cookie set
         poi_url = f'https://www.camidecavalls.com/Contingut.aspx?IdPub={poi_id}'
         req = Request(poi_url, headers=headers)
-        response = opener.open(req, timeout=15)
-        html = response.read().decode('utf-8', errors='ignore')
+        with span("download"):
+            response = opener.open(req, timeout=15)
+            html = response.read().decode('utf-8', errors='ignore')
 
         # Extract title and description from HTML
-        result = extract_poi_content(html)
+        with span("extract"):
+            result = extract_poi_content(html)
 
         # Basic validation
         if result['title'] and result['description']:
@@ -212,7 +221,7 @@ def update_poi_json(test_mode=True, test_poi_ids=None, force=False):
         test_poi_ids: List of POI IDs to test (e.g., ['9792', '9635', '9637'])
         force: If True, re-download even POIs that already have complete descriptions
     """
-    json_path = 'scripts/camidecavalls_pois/pois_all_translations_complete.json'
+    json_path = trail_data.POIS_PATH
 
     # Load existing POI data
     print(f"📖 Loading {json_path}...")
@@ -310,19 +319,19 @@ def update_poi_json(test_mode=True, test_poi_ids=None, force=False):
 
     # Save updated JSON (only in test mode to a separate file)
     if test_mode:
-        output_path = 'scripts/camidecavalls_pois/pois_test_updated.json'
+        output_path = os.path.join(POIS_DIR, 'pois_test_updated.json')
         print(f"\n💾 Saving test results to {output_path}...")
     else:
         # Backup original
-        backup_path = 'scripts/camidecavalls_pois/pois_all_translations_complete.json.backup'
+        backup_path = json_path + '.backup'
         import shutil
         shutil.copy(json_path, backup_path)
         print(f"\n💾 Backed up original to {backup_path}")
         output_path = json_path
         print(f"💾 Saving updated data to {json_path}...")
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(pois, f, ensure_ascii=False, indent=2)
+    with span("write"):
+        trail_data.atomic_write(output_path, json.dumps(pois, ensure_ascii=False, indent=2))
 
     # Print statistics
     print(f"\n" + "="*50)
@@ -352,7 +361,7 @@ def update_poi_json(test_mode=True, test_poi_ids=None, force=False):
 
         # Save detailed report
         if not test_mode:
-            report_path = 'scripts/camidecavalls_pois/translation_report.json'
+            report_path = os.path.join(POIS_DIR, 'translation_report.json')
             print(f"\n   Detailed report saved to: {report_path}")
             with open(report_path, 'w', encoding='utf-8') as f:
                 json.dump(stats['missing_translations'], f, ensure_ascii=False, indent=2)
@@ -360,7 +369,7 @@ def update_poi_json(test_mode=True, test_poi_ids=None, force=False):
     print("="*50)
 
 
-if __name__ == '__main__':
+def main():
     import sys
 
     # Test with specific POIs first
@@ -392,3 +401,7 @@ if __name__ == '__main__':
         print("   Use --full flag to process all POIs")
         print("   Use --force flag to re-download POIs with existing descriptions")
         update_poi_json(test_mode=True, test_poi_ids=test_pois, force=force_mode)
+
+
+if __name__ == '__main__':
+    profiled_main(main)
@@ -0,0 +1,14 @@
+"""Import-time budget of the entry point and the command modules (cli.py check-imports)."""
+
+import importlib.util
+
+import cli
+
+
+def test_command_modules_exist():
+    modules = {module for commands in cli.COMMANDS.values() for module, _, _ in commands.values()}
+    assert [module for module in sorted(modules) if importlib.util.find_spec(module) is None] == []
+
+
+def test_imports_within_budget():
+    assert cli.check_imports(cli.DEFAULT_BUDGET_MS, cli.DEFAULT_COMMAND_BUDGET_MS)
@@ -0,0 +1,58 @@
+"""Lookup error bounds of the uniform-distance elevation grids (elevation_grid.py check)."""
+
+import pytest
+
+import trail_data
+import elevation_grid
+from elevation_grid import ElevationGrid, ProfileLookup
+
+
+@pytest.fixture(scope="module")
+def stages():
+    return trail_data.load_stages()
+
+
+def test_stage_grids_within_max_error(stages):
+    assert elevation_grid.check(stages, elevation_grid.DEFAULT_STEP_METERS,
+                                elevation_grid.DEFAULT_MAX_ERROR_METERS)
+
+
+def test_check_fails_above_a_coarse_step(stages):
+    assert not elevation_grid.check(stages, 500, elevation_grid.DEFAULT_MAX_ERROR_METERS)
+
+
+def test_lookups_interpolate_and_clamp():
+    grid = ElevationGrid.from_profile([(0.0, 10.0), (0.05, 20.0), (0.1, 0.0)], step_km=0.01)
+    assert grid.at(0.025) == pytest.approx(15.0)
+    assert grid.at(0.075) == pytest.approx(10.0)
+    assert grid.at(-1.0) == 10.0
+    assert grid.at(5.0) == 0.0
+
+
+def test_encode_decode_round_trip(stages):
+    series = [(number, ElevationGrid.from_coordinates(coords))
+              for number, coords, _ in elevation_grid.stage_series(stages[:3])]
+    step_meters, grids = elevation_grid.decode(elevation_grid.encode(series, elevation_grid.DEFAULT_STEP_METERS))
+    assert step_meters == elevation_grid.DEFAULT_STEP_METERS
+    for number, grid in series:
+        assert len(grids[number].elevations) == len(grid.elevations)
+        assert max(abs(a - b) for a, b in zip(grids[number].elevations, grid.elevations)) <= 0.05 + 1e-9
+
+
+def linear_search(profile, km):
+    """The per-point search ProfileLookup replaces in extract_all_routes.py and update_test_gpx.py."""
+    if km <= profile[0][0]:
+        return profile[0][1]
+    if km >= profile[-1][0]:
+        return profile[-1][1]
+    for (km1, elev1), (km2, elev2) in zip(profile, profile[1:]):
+        if km1 <= km <= km2:
+            return elev1 if km2 == km1 else elev1 + (km - km1) / (km2 - km1) * (elev2 - elev1)
+
+
+def test_profile_lookup_matches_linear_search(stages):
+    lookup = ProfileLookup.from_coordinates(stages[0]["coordinates"])
+    profile = lookup.profile + [(lookup.profile[-1][0], 0.0)]
+    lookup = ProfileLookup(profile)
+    queries = [km for km, _ in profile] + [k * 0.0137 for k in range(-5, int(profile[-1][0] / 0.0137) + 5)]
+    assert [lookup.at(km) for km in queries] == [linear_search(profile, km) for km in queries]
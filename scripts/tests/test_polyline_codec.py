@@ -0,0 +1,32 @@
+"""Round trips of the encoded-polyline codec (polyline_codec.py verify)."""
+
+import pytest
+
+import trail_data
+import polyline_codec
+
+
+@pytest.fixture(scope="module")
+def stages():
+    return trail_data.load_stages()
+
+
+def test_stages_round_trip_within_bounds(stages):
+    assert polyline_codec.verify(stages, polyline_codec.DEFAULT_PRECISION,
+                                 polyline_codec.DEFAULT_ELEVATION_PRECISION)
+
+
+@pytest.mark.parametrize("precision, elevation_precision", [(5, 0), (7, 2)])
+def test_other_precisions_round_trip_within_bounds(stages, precision, elevation_precision):
+    assert polyline_codec.verify(stages[:2], precision, elevation_precision)
+
+
+def test_decode_keeps_dimensions():
+    assert polyline_codec.decode(polyline_codec.encode([[4.25, 39.89], [4.26, 39.88]])) == \
+        [[4.25, 39.89], [4.26, 39.88]]
+    assert polyline_codec.decode(polyline_codec.encode([[4.25, 39.89, 12.3]])) == [[4.25, 39.89, 12.3]]
+
+
+def test_mixed_dimensions_are_rejected():
+    with pytest.raises(ValueError):
+        polyline_codec.encode([[4.25, 39.89, 12.3], [4.26, 39.88]])
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Columnar, memory-mappable store for recorded session tracks.
+
+Usage:
+    python3 track_store.py <store_dir> ingest <gpx files or directories...>
+    python3 track_store.py <store_dir> list [--bbox MIN_LON MIN_LAT MAX_LON MAX_LAT]
+    python3 track_store.py <store_dir> stats [--bbox MIN_LON MIN_LAT MAX_LON MAX_LAT]
+
+GPX files are parsed once (session exports from the app with <trkpt>, the
+test-routes <rtept>/<wpt> formats) and appended to a directory of flat
+little-endian columns, so analytics never touch XML again:
+
+    lat.f64, lon.f64   coordinates (float64)
+    ele.f32            elevation (float32, NaN when missing)
+    time.f64           Unix time in seconds (float64, NaN when missing)
+    index.bin          one fixed-size record per session: point offset and
+                       count, bounding box and precomputed summary stats
+    sessions.jsonl     one line per session: name, source file, SHA-1
+
+The layout is append-only. A session is written to the columns first and its
+index record last, so an interrupted ingest leaves at most some unreferenced
+trailing column bytes, which the next ingest truncates. Files already in the
+store (same SHA-1) are skipped.
+
+Reading maps every column with mmap and exposes it as a typed memoryview;
+per-session slices are zero-copy. Bounding-box filters and aggregates work on
+index.bin alone; per-point queries only read the columns they need.
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import struct
+import hashlib
+import argparse
+import xml.etree.ElementTree as ET
+
+import trail_data
+from match_sessions import read_gpx_points
+from generate_route_stats import elevation_gain_loss, DEFAULT_HYSTERESIS
+
+COLUMNS = {"lat": "d", "lon": "d", "ele": "f", "time": "d"}
+COLUMN_FILES = {"lat": "lat.f64", "lon": "lon.f64", "ele": "ele.f32", "time": "time.f64"}
+INDEX_FILE = "index.bin"
+SESSIONS_FILE = "sessions.jsonl"
+
+# offset, count, min_lon, min_lat, max_lon, max_lat, distance (m), duration (s),
+# gain (m), loss (m), min ele, max ele, max speed (km/h)
+INDEX_RECORD = struct.Struct("<QI11d")
+INDEX_FIELDS = [
+    "offset", "count", "minLon", "minLat", "maxLon", "maxLat", "distanceMeters", "durationSeconds",
+    "elevationGainMeters", "elevationLossMeters", "minAltitudeMeters", "maxAltitudeMeters", "maxSpeedKmh",
+]
+
+# Speeds between points closer than this in time are GPS jitter, not movement
+MIN_SPEED_INTERVAL_SECONDS = 2.0
+
+if sys.byteorder != "little":
+    raise SystemExit("track_store.py maps the columns as native little-endian arrays")
+
+
+def track_summary(lat, lon, ele, times, hysteresis: float = DEFAULT_HYSTERESIS) -> dict:
+    """Distance, duration, elevation and speed summary of one track (NaN = missing value)."""
+    count = len(lat)
+    distance = 0.0
+    max_speed = 0.0
+    for i in range(1, count):
+        step = trail_data.haversine_distance(lon[i - 1], lat[i - 1], lon[i], lat[i]) * 1000
+        distance += step
+        dt = times[i] - times[i - 1]
+        if dt >= MIN_SPEED_INTERVAL_SECONDS:
+            max_speed = max(max_speed, step / dt * 3.6)
+
+    valid_times = [t for t in times if not math.isnan(t)]
+    elevations = [e for e in ele if not math.isnan(e)]
+    gain, loss = elevation_gain_loss(elevations, hysteresis)
+    return {
+        "minLon": min(lon, default=math.nan),
+        "minLat": min(lat, default=math.nan),
+        "maxLon": max(lon, default=math.nan),
+        "maxLat": max(lat, default=math.nan),
+        "distanceMeters": distance,
+        "durationSeconds": max(valid_times) - min(valid_times) if valid_times else 0.0,
+        "elevationGainMeters": gain,
+        "elevationLossMeters": loss,
+        "minAltitudeMeters": min(elevations, default=math.nan),
+        "maxAltitudeMeters": max(elevations, default=math.nan),
+        "maxSpeedKmh": max_speed,
+    }
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TrackStore:
+    """A store directory: append sessions, query them through memory-mapped columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._maps = {}
+        self._load_index()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_index(self):
+        self.records = []
+        index_path = self._file(INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            self.records = [dict(zip(INDEX_FIELDS, values))
+                            for values in INDEX_RECORD.iter_unpack(data[:usable])]
+
+        lines = []
+        sessions_path = self._file(SESSIONS_FILE)
+        if os.path.exists(sessions_path):
+            with open(sessions_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        self.sessions = [json.loads(line) for line in lines[:len(self.records)]]
+        self._uncommitted_sessions = len(lines) > len(self.records)
+        self.point_count = self.records[-1]["offset"] + self.records[-1]["count"] if self.records else 0
+
+    # Writing
+
+    def _truncate_uncommitted(self):
+        """Drop bytes written by an interrupted ingest (beyond the last index record)."""
+        for name, code in COLUMNS.items():
+            path = self._file(COLUMN_FILES[name])
+            size = self.point_count * struct.calcsize(code)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        index_path = self._file(INDEX_FILE)
+        if os.path.exists(index_path):
+            os.truncate(index_path, len(self.records) * INDEX_RECORD.size)
+        if self._uncommitted_sessions:
+            with open(self._file(SESSIONS_FILE), 'w', encoding='utf-8') as f:
+                for session in self.sessions:
+                    f.write(json.dumps(session, ensure_ascii=False) + "\n")
+
+    def ingest(self, paths: list) -> int:
+        """Append every GPX file not already stored, skipping unreadable ones. Returns the number of sessions added."""
+        self.close()
+        self._truncate_uncommitted()
+        known = {session["sha1"] for session in self.sessions}
+        added = 0
+
+        columns = {name: open(self._file(COLUMN_FILES[name]), 'ab') for name in COLUMNS}
+        index = open(self._file(INDEX_FILE), 'ab')
+        sessions = open(self._file(SESSIONS_FILE), 'a', encoding='utf-8')
+        try:
+            for path in paths:
+                try:
+                    sha1 = file_sha1(path)
+                    if sha1 in known:
+                        continue
+                    points = read_gpx_points(path)
+                except (ET.ParseError, OSError, ValueError) as e:
+                    # One unreadable export must not stop the others from being stored
+                    print(f"  ERROR: skipping {path}: {e}")
+                    continue
+                if not points:
+                    print(f"  WARNING: no points in {path}")
+                    continue
+
+                lon = [p[0] for p in points]
+                lat = [p[1] for p in points]
+                ele = [p[2] if p[2] is not None else math.nan for p in points]
+                times = [p[3].timestamp() if p[3] is not None else math.nan for p in points]
+                values = {"lat": lat, "lon": lon, "ele": ele, "time": times}
+                for name, code in COLUMNS.items():
+                    columns[name].write(struct.pack(f"<{len(points)}{code}", *values[name]))
+                    columns[name].flush()
+
+                summary = track_summary(lat, lon, ele, times)
+                record = {"offset": self.point_count, "count": len(points), **summary}
+                session = {"name": os.path.splitext(os.path.basename(path))[0], "source": path, "sha1": sha1}
+                sessions.write(json.dumps(session, ensure_ascii=False) + "\n")
+                sessions.flush()
+                # The index record commits the session
+                index.write(INDEX_RECORD.pack(*(record[field] for field in INDEX_FIELDS)))
+                index.flush()
+
+                self.records.append(record)
+                self.sessions.append(session)
+                self.point_count += len(points)
+                known.add(sha1)
+                added += 1
+        finally:
+            for f in columns.values():
+                f.close()
+            index.close()
+            sessions.close()
+        return added
+
+    # Reading
+
+    def column(self, name: str) -> memoryview:
+        """The whole column as a typed memoryview over a read-only memory map."""
+        if name not in self._maps:
+            path = self._file(COLUMN_FILES[name])
+            if not self.point_count:
+                return memoryview(b"").cast(COLUMNS[name])
+            f = open(path, 'rb')
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            size = self.point_count * struct.calcsize(COLUMNS[name])
+            self._maps[name] = (f, mapped, memoryview(mapped)[:size].cast(COLUMNS[name]))
+        return self._maps[name][2]
+
+    def track(self, session: int, columns=("lat", "lon", "ele", "time")) -> dict:
+        """Zero-copy slices of the requested columns for one session."""
+        record = self.records[session]
+        start, end = record["offset"], record["offset"] + record["count"]
+        return {name: self.column(name)[start:end] for name in columns}
+
+    def filter_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                    points: bool = False) -> list:
+        """
+        Sessions whose bounding box intersects the query box (index only).
+
+        With `points`, only sessions with at least one point inside the box are kept.
+        """
+        matches = [
+            i for i, r in enumerate(self.records)
+            if r["minLon"] <= max_lon and r["maxLon"] >= min_lon
+            and r["minLat"] <= max_lat and r["maxLat"] >= min_lat
+        ]
+        if not points:
+            return matches
+        inside = []
+        for i in matches:
+            track = self.track(i, ("lat", "lon"))
+            if any(min_lon <= lon <= max_lon and min_lat <= lat <= max_lat
+                   for lat, lon in zip(track["lat"], track["lon"])):
+                inside.append(i)
+        return inside
+
+    def summary(self, session: int) -> dict:
+        """The precomputed stats of a session, with its name."""
+        return {"name": self.sessions[session]["name"], **self.records[session]}
+
+    def recompute(self, session: int, hysteresis: float = DEFAULT_HYSTERESIS) -> dict:
+        """Compute the stats of a session again from its columns (e.g. with another hysteresis)."""
+        track = self.track(session)
+        return track_summary(track["lat"], track["lon"], track["ele"], track["time"], hysteresis)
+
+    def aggregate(self, sessions=None) -> dict:
+        """Totals and extremes over a set of sessions (default: all), from the index only."""
+        records = [self.records[i] for i in (range(len(self.records)) if sessions is None else sessions)]
+        distance = sum(r["distanceMeters"] for r in records)
+        duration = sum(r["durationSeconds"] for r in records)
+        # Sessions without timestamps have no duration and do not count towards the speed
+        timed_distance = sum(r["distanceMeters"] for r in records if r["durationSeconds"] > 0)
+        altitudes = [r["maxAltitudeMeters"] for r in records if not math.isnan(r["maxAltitudeMeters"])]
+        return {
+            "sessions": len(records),
+            "points": sum(r["count"] for r in records),
+            "distanceMeters": distance,
+            "durationSeconds": duration,
+            "averageSpeedKmh": timed_distance / duration * 3.6 if duration else 0.0,
+            "maxSpeedKmh": max((r["maxSpeedKmh"] for r in records), default=0.0),
+            "elevationGainMeters": sum(r["elevationGainMeters"] for r in records),
+            "elevationLossMeters": sum(r["elevationLossMeters"] for r in records),
+            "maxAltitudeMeters": max(altitudes, default=math.nan),
+        }
+
+    def close(self):
+        for f, mapped, view in self._maps.values():
+            try:
+                view.release()
+                mapped.close()
+            except BufferError:
+                # Track slices are still referenced; the map is freed with the last of them
+                pass
+            f.close()
+        self._maps = {}
+
+
+def find_gpx_files(paths: list) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.lower().endswith(".gpx"))
+        elif path.lower().endswith(".gpx"):
+            files.append(path)
+    return sorted(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar store for recorded session tracks")
+    parser.add_argument("store")
+    parser.add_argument("command", choices=["ingest", "list", "stats"])
+    parser.add_argument("paths", nargs="*", help="GPX files or directories (ingest)")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"))
+    args = parser.parse_args()
+
+    store = TrackStore(args.store)
+
+    if args.command == "ingest":
+        files = find_gpx_files(args.paths)
+        added = store.ingest(files)
+        print(f"Added {added} of {len(files)} files (the others were already stored, empty or unreadable)")
+        print(f"Store: {len(store.records)} sessions, {store.point_count} points")
+        return
+
+    selected = store.filter_bbox(*args.bbox, points=True) if args.bbox else None
+    if args.command == "list":
+        for i in selected if selected is not None else range(len(store.records)):
+            s = store.summary(i)
+            print(f"{i:>6}  {s['name']:<30} {s['count']:>6} pts  {s['distanceMeters'] / 1000:>6.2f} km  "
+                  f"{s['durationSeconds'] / 60:>6.1f} min  +{s['elevationGainMeters']:.0f}/-{s['elevationLossMeters']:.0f} m")
+    else:
+        totals = store.aggregate(selected)
+        print(f"Sessions:       {totals['sessions']}")
+        print(f"Points:         {totals['points']}")
+        print(f"Distance:       {totals['distanceMeters'] / 1000:.2f} km")
+        print(f"Duration:       {totals['durationSeconds'] / 3600:.2f} h")
+        print(f"Average speed:  {totals['averageSpeedKmh']:.2f} km/h")
+        print(f"Max speed:      {totals['maxSpeedKmh']:.2f} km/h")
+        print(f"Elevation:      +{totals['elevationGainMeters']:.0f} / -{totals['elevationLossMeters']:.0f} m")
+        print(f"Max altitude:   {totals['maxAltitudeMeters']:.1f} m")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Shared loaders for the trail data used by the build scripts.
+
+Reads the stages (metadata + gpxData coordinates) from RouteData.kt and the
+POI set from the scraped multilingual JSON, so the generators do not each need
+their own copy of the regex (the geodesy helpers live in geodesy.py). The
+per-trail settings (stages, calibration, sources) come from trails.json.
+"""
+
+import os
+import re
+import json
+import tempfile
+
+from geodesy import haversine_distance
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPTS_DIR)
+ROUTE_DATA_PATH = os.path.join(
+    PROJECT_DIR,
+    "composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/data/RouteData.kt"
+)
+POIS_PATH = os.path.join(SCRIPTS_DIR, "camidecavalls_pois", "pois_all_translations_complete.json")
+APP_FILES_DIR = os.path.join(PROJECT_DIR, "composeApp/src/commonMain/composeResources/files")
+APP_POIS_PATH = os.path.join(APP_FILES_DIR, "pois.json")
+# Derived data the app does not bundle yet (gitignored); complete_route.json and
+# poi_search_index.json are the generated app resources
+GENERATED_DIR = os.path.join(SCRIPTS_DIR, "generated")
+SQLDELIGHT_DIR = os.path.join(PROJECT_DIR, "composeApp/src/commonMain/sqldelight")
+# Trails the pipeline knows: stages in order, profile calibration, sources and outputs
+REGISTRY_PATH = os.path.join(SCRIPTS_DIR, "trails.json")
+DEFAULT_TRAIL = "camidecavalls"
+
+LANGUAGES = ["ca", "es", "en", "de", "fr", "it"]
+
+# Route(...) blocks in RouteData.kt, up to and including the gpxData literal
+ROUTE_BLOCK_PATTERN = re.compile(r'Route\(\s*id = (\d+),(.*?)gpxData = """(.*?)"""', re.DOTALL)
+INT_FIELDS = [
+    "number", "elevationGainMeters", "elevationLossMeters", "maxAltitudeMeters",
+    "minAltitudeMeters", "asphaltPercentage", "estimatedDurationMinutes",
+]
+STRING_FIELDS = [
+    "name", "startPoint", "endPoint", "description",
+    "descriptionCa", "descriptionEs", "descriptionEn", "descriptionDe", "descriptionFr", "descriptionIt",
+]
+KOTLIN_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "\\": "\\", '"': '"', "'": "'", "$": "$"}
+
+
+def cumulative_distances(coords: list) -> list:
+    """Return the cumulative distance in km at every coordinate."""
+    cumulative_dist = [0.0]
+    for i in range(1, len(coords)):
+        lon1, lat1 = coords[i-1][0], coords[i-1][1]
+        lon2, lat2 = coords[i][0], coords[i][1]
+        cumulative_dist.append(cumulative_dist[-1] + haversine_distance(lon1, lat1, lon2, lat2))
+    return cumulative_dist
+
+
+def unescape_kotlin_string(text: str) -> str:
+    """Decode the escapes of a single-line Kotlin string literal."""
+    def replace(match):
+        escape = match.group(1)
+        if escape.startswith("u"):
+            return chr(int(escape[1:], 16))
+        return KOTLIN_ESCAPES.get(escape, escape)
+    return re.sub(r'\\(u[0-9a-fA-F]{4}|.)', replace, text)
+
+
+def parse_stages(content: str) -> list:
+    """Parse every Route(...) entry of a RouteData.kt source string."""
+    stages = []
+    for match in ROUTE_BLOCK_PATTERN.finditer(content):
+        fields = match.group(2)
+        stage = {"id": int(match.group(1))}
+        for field in INT_FIELDS:
+            value = re.search(rf'\b{field} = (-?\d+)', fields)
+            stage[field] = int(value.group(1)) if value else None
+        for field in STRING_FIELDS:
+            value = re.search(rf'\b{field} = "((?:[^"\\]|\\.)*)"', fields)
+            stage[field] = unescape_kotlin_string(value.group(1)) if value else None
+        distance = re.search(r'\bdistanceKm = ([\d.]+)', fields)
+        stage["distanceKm"] = float(distance.group(1)) if distance else None
+        difficulty = re.search(r'\bdifficulty = Difficulty\.(\w+)', fields)
+        stage["difficulty"] = difficulty.group(1) if difficulty else None
+        stage["gpxData"] = match.group(3).strip()
+        stage["coordinates"] = json.loads(stage["gpxData"])["coordinates"]
+        stages.append(stage)
+    return sorted(stages, key=lambda s: s["number"])
+
+
+def load_stages(path: str = ROUTE_DATA_PATH) -> list:
+    """Load every stage from RouteData.kt, ordered by stage number."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_stages(f.read())
+
+
+def replace_stage_coordinates(content: str, number: int, coords: list) -> str:
+    """Return RouteData.kt source with the gpxData of stage `number` replaced."""
+    for match in ROUTE_BLOCK_PATTERN.finditer(content):
+        stage_number = re.search(r'\bnumber = (\d+)', match.group(2))
+        if stage_number and int(stage_number.group(1)) == number:
+            gpx_json = json.dumps({"type": "LineString", "coordinates": coords}, separators=(',', ':'))
+            return content[:match.start(3)] + gpx_json + content[match.end(3):]
+    raise ValueError(f"Route {number} not found in RouteData.kt")
+
+
+def write_stage_coordinates(updates: dict, path: str = ROUTE_DATA_PATH):
+    """Replace the gpxData of several stages ({number: coordinates}) in RouteData.kt."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    for number, coords in sorted(updates.items()):
+        content = replace_stage_coordinates(content, number, coords)
+    atomic_write(path, content)
+
+
+def atomic_write(path: str, text: str):
+    """Write a text file through a temporary file in the same directory, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # mkstemp creates the file as 0600: keep the mode of the file being replaced
+        os.chmod(tmp_path, os.stat(path).st_mode if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_trail(trail_id: str = DEFAULT_TRAIL, path: str = REGISTRY_PATH) -> dict:
+    """
+    One trail of the registry, with its stages in order and its paths made absolute.
+
+    Path templates ("{number}") stay templates; raises ValueError for an unknown
+    trail or duplicate stage numbers.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        trails = {trail["id"]: trail for trail in json.load(f)["trails"]}
+    if trail_id not in trails:
+        raise ValueError(f"Unknown trail {trail_id!r} (registry has: {', '.join(sorted(trails))})")
+    trail = trails[trail_id]
+
+    numbers = [stage["number"] for stage in trail["stages"]]
+    if len(set(numbers)) != len(numbers):
+        raise ValueError(f"Trail {trail_id!r} has duplicate stage numbers")
+    trail["routeData"] = os.path.join(PROJECT_DIR, trail["routeData"])
+    for group in ("sources", "outputs"):
+        for key, value in trail.get(group, {}).items():
+            if "://" not in value:
+                trail[group][key] = os.path.join(PROJECT_DIR, value)
+    trail["stagesByNumber"] = {stage["number"]: stage for stage in trail["stages"]}
+    return trail
+
+
+def load_pois(path: str = POIS_PATH) -> list:
+    """Load the multilingual POI list."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def combined_coordinates(stages: list) -> list:
+    """Join the stage coordinates in order, dropping the endpoint shared by consecutive stages."""
+    combined = []
+    for stage in stages:
+        coords = stage["coordinates"]
+        if combined and coords and combined[-1][:2] == coords[0][:2]:
+            coords = coords[1:]
+        combined.extend(coords)
+    return combined
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Linear referencing of the POIs and stage boundaries along the complete loop.
+
+Usage:
+    python3 trail_positions.py build [--output PATH]
+    python3 trail_positions.py next <poi_id|km> [--type BEACH] [--backward] [--count 3]
+    python3 trail_positions.py distance <poi_id|km> <poi_id|km>
+
+build projects every POI onto the nearest stage segment (grid index of
+geodesy.py) and gives it a km position on the combined loop, measured
+from the start of stage 1 along the stage order, with the same Haversine
+distances as route_stats.json. The stage boundaries are placed exactly at the
+cumulative stage lengths. The output has:
+- loopKm and the start/end km of every stage
+- entries: every boundary and POI sorted by km (kind, ref, km, stage, offset
+  from the trail in meters, POI type)
+- forwardMeters: along-trail distance matrix in entry order, walking in the
+  stage direction and wrapping from stage 20 back to stage 1. Walking the
+  other way from i to j is forwardMeters[j][i].
+
+"Next beach from here" is then a binary search over the entry km values and
+"how far along the trail from A to B" a table lookup (see TrailPositions).
+Run it after RouteData.kt or pois.json change (build_data.py does).
+"""
+
+import os
+import sys
+import json
+import bisect
+import argparse
+
+import trail_data
+from geodesy import SegmentIndex, project
+
+DEFAULT_OUTPUT = os.path.join(trail_data.GENERATED_DIR, "trail_positions.json")
+# Coarser than for map matching: POIs can be a few km from the trail
+CELL_SIZE = 250.0
+SEARCH_RADIUS = 250.0
+MAX_SEARCH_RADIUS = 16000.0
+
+
+def stage_calibration(stage: dict) -> tuple:
+    """(projected along-stage meters, Haversine km) at every coordinate of the stage."""
+    points = [project(c[0], c[1]) for c in stage["coordinates"]]
+    projected = [0.0]
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        projected.append(projected[-1] + ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5)
+    return projected, trail_data.cumulative_distances(stage["coordinates"])
+
+
+def to_haversine_km(calibration: tuple, along: float) -> float:
+    """Convert a projected along-stage distance into Haversine km (linear within the segment)."""
+    projected, kilometers = calibration
+    i = min(max(bisect.bisect_right(projected, along) - 1, 0), len(projected) - 2)
+    span = projected[i + 1] - projected[i]
+    t = (along - projected[i]) / span if span > 0 else 0.0
+    return kilometers[i] + t * (kilometers[i + 1] - kilometers[i])
+
+
+def locate(index: SegmentIndex, lon: float, lat: float):
+    """Nearest trail position (offset meters, stage number, projected along) or None if farther than the max radius."""
+    x, y = project(lon, lat)
+    radius = SEARCH_RADIUS
+    while radius <= MAX_SEARCH_RADIUS:
+        candidates = index.candidates(x, y, radius)
+        if candidates:
+            return candidates[0]
+        radius *= 2
+    return None
+
+
+def build_positions(stages: list, pois: list) -> dict:
+    index = SegmentIndex(stages, CELL_SIZE)
+    calibrations = {stage["number"]: stage_calibration(stage) for stage in stages}
+
+    stage_ranges = []
+    stage_start = {}
+    entries = []
+    start_km = 0.0
+    for stage in stages:
+        stage_start[stage["number"]] = start_km
+        length_km = calibrations[stage["number"]][1][-1]
+        stage_ranges.append({"number": stage["number"], "startKm": round(start_km, 4),
+                             "endKm": round(start_km + length_km, 4)})
+        entries.append({"kind": "stage", "ref": str(stage["number"]), "km": start_km,
+                        "stage": stage["number"], "offsetMeters": 0})
+        start_km += length_km
+    loop_km = start_km
+
+    unplaced = []
+    for poi in pois:
+        found = locate(index, poi["longitude"], poi["latitude"])
+        if found is None:
+            unplaced.append(poi["id"])
+            continue
+        offset, number, along = found
+        km = (stage_start[number] + to_haversine_km(calibrations[number], along)) % loop_km
+        entries.append({"kind": "poi", "ref": poi["id"], "type": poi["type"], "km": km,
+                        "stage": number, "offsetMeters": round(offset)})
+
+    entries.sort(key=lambda e: (e["km"], e["kind"] != "stage", int(e["ref"])))
+    kilometers = [e["km"] for e in entries]
+    for entry in entries:
+        entry["km"] = round(entry["km"], 4)
+
+    loop_meters = loop_km * 1000
+    forward = [[round(((b - a) * 1000) % loop_meters) for b in kilometers] for a in kilometers]
+    return {
+        "loopKm": round(loop_km, 4),
+        "stages": stage_ranges,
+        "entries": entries,
+        "forwardMeters": forward,
+        "unplaced": unplaced,
+    }
+
+
+class TrailPositions:
+    """Queries over a trail_positions.json: binary search on km, table lookup for distances."""
+
+    def __init__(self, data: dict):
+        self.loop_km = data["loopKm"]
+        self.entries = data["entries"]
+        self.kilometers = [e["km"] for e in self.entries]
+        self.forward = data["forwardMeters"]
+        self.by_ref = {(e["kind"], e["ref"]): i for i, e in enumerate(self.entries)}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_OUTPUT):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def poi(self, poi_id: str) -> int:
+        return self.by_ref[("poi", poi_id)]
+
+    def following(self, km: float, backward: bool = False, kind: str = None, poi_type: str = None):
+        """Entries in walking order from `km` (exclusive), wrapping around the loop once."""
+        count = len(self.entries)
+        if backward:
+            start = bisect.bisect_left(self.kilometers, km) - 1
+            order = ((start - k) % count for k in range(count))
+        else:
+            start = bisect.bisect_right(self.kilometers, km)
+            order = ((start + k) % count for k in range(count))
+        for i in order:
+            entry = self.entries[i]
+            if entry["km"] == km or (kind and entry["kind"] != kind) or (poi_type and entry.get("type") != poi_type):
+                continue
+            yield i
+
+    def along_km(self, from_km: float, to_km: float, backward: bool = False) -> float:
+        forward = (to_km - from_km) % self.loop_km
+        return (self.loop_km - forward) % self.loop_km if backward else forward
+
+    def distance_meters(self, i: int, j: int, backward: bool = False) -> int:
+        return self.forward[j][i] if backward else self.forward[i][j]
+
+
+def resolve(positions: TrailPositions, ref: str) -> tuple:
+    """(km, entry index) of a POI id, or (km, None) of a km position such as "12.5km"."""
+    if ("poi", ref) in positions.by_ref:
+        i = positions.poi(ref)
+        return positions.kilometers[i], i
+    try:
+        return float(ref.removesuffix("km")) % positions.loop_km, None
+    except ValueError:
+        raise ValueError(f"{ref} is neither a POI id nor a km position")
+
+
+def describe(entry: dict) -> str:
+    if entry["kind"] == "stage":
+        return f"start of stage {entry['ref']}"
+    return f"POI {entry['ref']} ({entry['type']}, stage {entry['stage']}, {entry['offsetMeters']} m off the trail)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Along-trail km positions of the POIs and stage boundaries")
+    parser.add_argument("command", choices=["build", "next", "distance"])
+    parser.add_argument("refs", nargs="*", help="POI ids or km positions")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="positions file to write (build) or read")
+    parser.add_argument("--type", help="only POIs of this type (BEACH, NATURAL, HISTORIC)")
+    parser.add_argument("--backward", action="store_true", help="walk against the stage direction")
+    parser.add_argument("--count", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        stages = trail_data.load_stages()
+        pois = trail_data.load_pois(trail_data.APP_POIS_PATH)
+        data = build_positions(stages, pois)
+        trail_data.atomic_write(args.output, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        offsets = sorted(e["offsetMeters"] for e in data["entries"] if e["kind"] == "poi")
+        print(f"Loop: {data['loopKm']:.2f} km, {len(stages)} stage boundaries, {len(offsets)} POIs placed")
+        print(f"Offset from the trail: median {offsets[len(offsets) // 2]} m, max {offsets[-1]} m")
+        if data["unplaced"]:
+            print(f"WARNING: {len(data['unplaced'])} POIs farther than {MAX_SEARCH_RADIUS / 1000:.0f} km "
+                  f"from the trail: {', '.join(data['unplaced'])}")
+        print(f"Saved to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+        return
+
+    expected = {"next": 1, "distance": 2}[args.command]
+    if len(args.refs) != expected:
+        parser.error(f"{args.command} takes {expected} POI id(s) or km position(s)")
+    try:
+        positions = TrailPositions.load(args.output)
+        resolved = [resolve(positions, ref) for ref in args.refs]
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    direction = "backward" if args.backward else "forward"
+    if args.command == "next":
+        km = resolved[0][0]
+        found = positions.following(km, args.backward, "poi" if args.type else None, args.type)
+        for _, i in zip(range(args.count), found):
+            entry = positions.entries[i]
+            print(f"  {positions.along_km(km, entry['km'], args.backward):>7.2f} km {direction}  "
+                  f"(loop km {entry['km']:.2f})  {describe(entry)}")
+        return
+
+    (km_a, i), (km_b, j) = resolved
+    for backward in (False, True):
+        if i is not None and j is not None:
+            km = positions.distance_meters(i, j, backward) / 1000
+        else:
+            km = positions.along_km(km_a, km_b, backward)
+        print(f"  {'backward' if backward else 'forward':<9}{km:>8.2f} km")
+
+
+if __name__ == "__main__":
+    main()
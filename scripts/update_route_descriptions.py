@@ -3,13 +3,16 @@
 Script to update RouteData.kt with multilingual route descriptions from JSON.
 """
 
+import os
 import json
 import re
 
+import trail_data
+from generate_data_versions import write_data_versions
+
 # Paths
-JSON_PATH = "/Users/stefanorussello/Documents/Projects/KotlinMultiplatform/CamíDeCavalls/scripts/camidecavalls_pois/routes_descriptions_complete.json"
-ROUTE_DATA_PATH = "/Users/stefanorussello/Documents/Projects/KotlinMultiplatform/CamíDeCavalls/composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/data/RouteData.kt"
-DATABASE_USE_CASE_PATH = "/Users/stefanorussello/Documents/Projects/KotlinMultiplatform/CamíDeCavalls/composeApp/src/commonMain/kotlin/com/followmemobile/camidecavalls/domain/usecase/route/InitializeDatabaseUseCase.kt"
+JSON_PATH = os.path.join(trail_data.SCRIPTS_DIR, "camidecavalls_pois", "routes_descriptions_complete.json")
+ROUTE_DATA_PATH = trail_data.ROUTE_DATA_PATH
 
 def escape_kotlin_string(text):
     """Escape special characters for Kotlin strings."""
@@ -94,42 +97,11 @@ def update_route_data(descriptions_map):
 
     # Write updated content
     print(f"\nWriting updated content to {ROUTE_DATA_PATH}...")
-    with open(ROUTE_DATA_PATH, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+    trail_data.atomic_write(ROUTE_DATA_PATH, new_content)
 
     print("RouteData.kt updated successfully!")
     return True
 
-def update_database_version():
-    """Increment DATABASE_VERSION from 9 to 10."""
-    print(f"\nUpdating DATABASE_VERSION in {DATABASE_USE_CASE_PATH}...")
-    with open(DATABASE_USE_CASE_PATH, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Update version from 9 to 10
-    old_line = 'private const val DATABASE_VERSION = 9'
-    new_line = 'private const val DATABASE_VERSION = 10'
-
-    if old_line in content:
-        new_content = content.replace(old_line, new_line)
-
-        # Also add a comment about version 10
-        version_9_comment = '// Version 9: Reordered Route 11 coordinates to fix 7.7km jump (start/end were swapped)'
-        version_10_comment = '// Version 10: Added multilingual route descriptions (CA, ES, EN, DE, FR, IT)'
-        new_content = new_content.replace(
-            version_9_comment,
-            version_9_comment + '\n        ' + version_10_comment
-        )
-
-        with open(DATABASE_USE_CASE_PATH, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-
-        print("DATABASE_VERSION updated from 9 to 10")
-        return True
-    else:
-        print(f"Warning: Could not find DATABASE_VERSION = 9 in file")
-        return False
-
 def main():
     print("=" * 60)
     print("Updating RouteData.kt with multilingual descriptions")
@@ -145,8 +117,9 @@ def main():
         print("=" * 60)
         return
 
-    # Update DATABASE_VERSION
-    update_database_version()
+    # Regenerate the data content hashes so the app re-seeds the route table
+    print("\nUpdating DataVersions.kt...")
+    write_data_versions()
 
     print("\n" + "=" * 60)
     print("✓ All updates completed successfully!")
@@ -154,7 +127,7 @@ def main():
     print("\nSummary:")
     print(f"  - Updated {len(descriptions_map)} routes with 6 language descriptions each")
     print(f"  - Total descriptions added: {len(descriptions_map) * 6} = 120 descriptions")
-    print(f"  - DATABASE_VERSION incremented to 10")
+    print(f"  - DataVersions.kt regenerated (route data hashes)")
     print("\nNext steps:")
     print("  1. Compile the project (Android + iOS)")
     print("  2. Test that localized descriptions appear correctly")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Integrity checks for the stage geometry in RouteData.kt (and the test GPX files).
+
+Usage:
+    python3 validate_route_data.py [--gpx] [--strict] [--max-step 1000] [--distance-tolerance 0.25]
+
+All stages are loaded once into flat coordinate columns (array('d') plus
+per-stage offsets, as in track_store.py) and every segment length is computed
+in a single pass over the columns; the checks then only compare numbers.
+
+Errors (exit 1):
+- teleport: a segment longer than --max-step meters (Route 11 once had its
+  two halves swapped, a 7.7 km jump)
+- continuity: stage N does not end where stage N+1 starts (20 -> 1 included)
+- reversed: the stage's start and end are swapped relative to its neighbours
+- bounds: a coordinate outside Menorca (e.g. swapped lat/lon)
+- numbering: stages are not numbered 1..N
+
+Warnings (exit 1 only with --strict):
+- duplicate: consecutive identical points
+- elevation: points without an elevation value
+- spike: a point more than --spike meters above or below both neighbours
+- distance: the geometry length disagrees with the stored distanceKm
+
+With --gpx the test-routes GPX files (android, ios, emulator, simulator) get
+the per-track checks and must start/end where their stage does and have its
+length.
+"""
+
+import os
+import sys
+import glob
+import math
+import time
+import argparse
+from array import array
+
+import trail_data
+from geodesy import EARTH_RADIUS_KM, haversine_distance
+
+DEFAULT_MAX_STEP = 1000
+DEFAULT_SPIKE = 15
+DEFAULT_DISTANCE_TOLERANCE = 0.25
+CONTINUITY_METERS = 25
+DUPLICATE_METERS = 0.01
+GPX_LENGTH_TOLERANCE = 0.02
+# lon_min, lat_min, lon_max, lat_max
+MENORCA_BOUNDS = (3.75, 39.75, 4.35, 40.12)
+TEST_ROUTES_DIR = os.path.join(trail_data.PROJECT_DIR, "test-routes")
+GPX_PATTERNS = [
+    "android/route_{n}.gpx",
+    "ios/route_{n}.gpx",
+    "android/emulator/route_{n}_emulator.gpx",
+    "ios/simulator/route_{n}_simulator.gpx",
+]
+
+
+class Tracks:
+    """Several coordinate lines stored as flat lon/lat/ele columns with offsets."""
+
+    def __init__(self, names: list, lines: list):
+        self.names = names
+        self.lon = array('d')
+        self.lat = array('d')
+        self.ele = array('d')
+        self.offsets = [0]
+        for line in lines:
+            for point in line:
+                self.lon.append(point[0])
+                self.lat.append(point[1])
+                self.ele.append(point[2] if len(point) > 2 and point[2] is not None else math.nan)
+            self.offsets.append(len(self.lon))
+        self.steps = segment_lengths(self.lon, self.lat)
+
+    def __len__(self):
+        return len(self.names)
+
+    def span(self, i: int) -> range:
+        return range(self.offsets[i], self.offsets[i + 1])
+
+    def length(self, i: int) -> float:
+        """Length in meters; the segment index equals its first point's index."""
+        return sum(self.steps[self.offsets[i]:self.offsets[i + 1] - 1])
+
+    def point(self, k: int) -> tuple:
+        return self.lon[k], self.lat[k]
+
+
+def segment_lengths(lon: array, lat: array) -> array:
+    """Haversine length in meters from every point to the next one (across line boundaries too)."""
+    radius = EARTH_RADIUS_KM * 1000
+    lat_rad = [math.radians(v) for v in lat]
+    cos_lat = [math.cos(v) for v in lat_rad]
+    half_lon = [math.radians(v) / 2 for v in lon]
+    sin, asin, sqrt = math.sin, math.asin, math.sqrt
+    return array('d', (
+        2 * radius * asin(sqrt(min(1.0, sin((lat2 - lat1) / 2) ** 2 + c1 * c2 * sin(lon2 - lon1) ** 2)))
+        for lat1, lat2, c1, c2, lon1, lon2 in zip(lat_rad, lat_rad[1:], cos_lat, cos_lat[1:], half_lon, half_lon[1:])
+    ))
+
+
+def distance(a: tuple, b: tuple) -> float:
+    """Meters between two (lon, lat) points."""
+    return haversine_distance(a[0], a[1], b[0], b[1]) * 1000
+
+
+def check_track(tracks: Tracks, i: int, max_step: float, spike: float, issues: list):
+    """Per-line checks: bounds, teleports, duplicates and elevation spikes."""
+    name = tracks.names[i]
+    points = tracks.span(i)
+    if len(points) < 2:
+        issues.append(("error", name, f"only {len(points)} points"))
+        return
+    lon, lat, ele, steps = tracks.lon, tracks.lat, tracks.ele, tracks.steps
+    first = points.start
+    lon_min, lat_min, lon_max, lat_max = MENORCA_BOUNDS
+
+    outside = [k for k in points if not (lon_min <= lon[k] <= lon_max and lat_min <= lat[k] <= lat_max)]
+    if outside:
+        issues.append(("error", name, f"{len(outside)} points outside Menorca, first #{outside[0] - first} "
+                                      f"({lat[outside[0]]:.5f}, {lon[outside[0]]:.5f})"))
+    missing = [k for k in points if math.isnan(ele[k])]
+    if missing:
+        issues.append(("warning", name, f"{len(missing)} points without elevation, first #{missing[0] - first}"))
+
+    for k in range(first, points.stop - 1):
+        if steps[k] > max_step:
+            issues.append(("error", name, f"teleport of {steps[k]:.0f} m between points #{k - first} and #{k + 1 - first}"))
+
+    duplicates = [k for k in range(first, points.stop - 1) if steps[k] < DUPLICATE_METERS]
+    if duplicates:
+        listed = ", ".join(f"#{k + 1 - first}" for k in duplicates[:5])
+        issues.append(("warning", name, f"{len(duplicates)} duplicate consecutive points ({listed})"))
+
+    for k in range(first + 1, points.stop - 1):
+        rise, fall = ele[k] - ele[k - 1], ele[k] - ele[k + 1]
+        if (rise > spike and fall > spike) or (rise < -spike and fall < -spike):
+            issues.append(("warning", name, f"elevation spike at point #{k - first}: "
+                                            f"{ele[k - 1]:.1f} -> {ele[k]:.1f} -> {ele[k + 1]:.1f} m"))
+
+
+def check_stages(stages: list, max_step: float, spike: float, distance_tolerance: float) -> tuple:
+    """All RouteData.kt checks; returns (issues, Tracks)."""
+    issues = []
+    numbers = [stage["number"] for stage in stages]
+    if numbers != list(range(1, len(stages) + 1)):
+        issues.append(("error", "RouteData.kt", f"stage numbers are {numbers}, expected 1..{len(stages)}"))
+
+    tracks = Tracks([f"stage {n}" for n in numbers], [stage["coordinates"] for stage in stages])
+    for i, stage in enumerate(stages):
+        check_track(tracks, i, max_step, spike, issues)
+        if len(tracks.span(i)) < 2:
+            continue
+
+        length_km = tracks.length(i) / 1000
+        stored = stage["distanceKm"]
+        if stored and abs(length_km - stored) > distance_tolerance * stored:
+            issues.append(("warning", tracks.names[i],
+                           f"geometry is {length_km:.2f} km, distanceKm is {stored} ({(length_km / stored - 1) * 100:+.0f}%)"))
+
+    # The stages form a loop: each one starts where the previous one ends
+    for i in range(len(tracks)):
+        j = (i + 1) % len(tracks)
+        if len(tracks.span(i)) < 2 or len(tracks.span(j)) < 2:
+            continue
+        end = tracks.point(tracks.offsets[i + 1] - 1)
+        start = tracks.point(tracks.offsets[j])
+        gap = distance(end, start)
+        if gap > CONTINUITY_METERS:
+            issues.append(("error", tracks.names[i], f"ends {gap:.0f} m away from the start of {tracks.names[j]}"))
+
+    for i in range(len(tracks)):
+        before, after = (i - 1) % len(tracks), (i + 1) % len(tracks)
+        if len(tracks) < 3 or any(len(tracks.span(k)) < 2 for k in (before, i, after)):
+            continue
+        start, end = tracks.point(tracks.offsets[i]), tracks.point(tracks.offsets[i + 1] - 1)
+        previous_end = tracks.point(tracks.offsets[before + 1] - 1)
+        next_start = tracks.point(tracks.offsets[after])
+        forward = distance(previous_end, start) + distance(end, next_start)
+        backward = distance(previous_end, end) + distance(start, next_start)
+        if forward > 2 * CONTINUITY_METERS and backward < forward / 2:
+            issues.append(("error", tracks.names[i], "runs backwards: its start and end are swapped"))
+
+    return issues, tracks
+
+
+def check_gpx(stage_tracks: Tracks, stages: list, max_step: float, spike: float) -> tuple:
+    """Per-track checks on the test GPX files plus endpoints/length against their stage."""
+    from match_sessions import read_gpx_points
+
+    names, lines, stage_index = [], [], []
+    for i, stage in enumerate(stages):
+        for pattern in GPX_PATTERNS:
+            for path in glob.glob(os.path.join(TEST_ROUTES_DIR, pattern.format(n=stage["number"]))):
+                names.append(os.path.relpath(path, TEST_ROUTES_DIR))
+                lines.append(read_gpx_points(path))
+                stage_index.append(i)
+
+    issues = []
+    tracks = Tracks(names, lines)
+    for g, i in enumerate(stage_index):
+        check_track(tracks, g, max_step, spike, issues)
+        if len(tracks.span(g)) < 2 or len(stage_tracks.span(i)) < 2:
+            continue
+        start_gap = distance(tracks.point(tracks.offsets[g]), stage_tracks.point(stage_tracks.offsets[i]))
+        end_gap = distance(tracks.point(tracks.offsets[g + 1] - 1), stage_tracks.point(stage_tracks.offsets[i + 1] - 1))
+        if start_gap > CONTINUITY_METERS or end_gap > CONTINUITY_METERS:
+            issues.append(("error", names[g], f"starts {start_gap:.0f} m / ends {end_gap:.0f} m away from "
+                                              f"{stage_tracks.names[i]}"))
+        gpx_km, stage_km = tracks.length(g) / 1000, stage_tracks.length(i) / 1000
+        if abs(gpx_km - stage_km) > GPX_LENGTH_TOLERANCE * stage_km:
+            issues.append(("error", names[g], f"is {gpx_km:.2f} km, {stage_tracks.names[i]} is {stage_km:.2f} km"))
+    return issues, len(tracks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integrity checks for the RouteData.kt stage geometry")
+    parser.add_argument("--gpx", action="store_true", help="also check the test-routes GPX files")
+    parser.add_argument("--strict", action="store_true", help="exit 1 on warnings too")
+    parser.add_argument("--max-step", type=float, default=DEFAULT_MAX_STEP,
+                        help="longest allowed segment in meters (default: %(default)s)")
+    parser.add_argument("--spike", type=float, default=DEFAULT_SPIKE,
+                        help="elevation spike threshold in meters (default: %(default)s)")
+    parser.add_argument("--distance-tolerance", type=float, default=DEFAULT_DISTANCE_TOLERANCE,
+                        help="allowed relative difference to distanceKm (default: %(default)s)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stages = trail_data.load_stages()
+    issues, tracks = check_stages(stages, args.max_step, args.spike, args.distance_tolerance)
+    checked = f"{len(stages)} stages ({len(tracks.lon)} points)"
+    if args.gpx:
+        gpx_issues, gpx_count = check_gpx(tracks, stages, args.max_step, args.spike)
+        issues += gpx_issues
+        checked += f" and {gpx_count} GPX files"
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for severity, _, _ in issues if severity == "error")
+    warnings = len(issues) - errors
+    for severity, name, message in issues:
+        print(f"{severity.upper():<8}{name}: {message}")
+    print(f"\nChecked {checked} in {elapsed * 1000:.0f} ms: {errors} errors, {warnings} warnings")
+
+    if errors or (args.strict and warnings):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
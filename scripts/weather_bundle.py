@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Batched Open-Meteo forecasts for the stage endpoints, a caching proxy and a local stand-in API.
+
+Usage:
+    python3 weather_bundle.py bundle [--upstream URL] [--output PATH]
+    python3 weather_bundle.py proxy [--port 8765] [--upstream URL] [--ttl 300] [--cache-dir DIR]
+    python3 weather_bundle.py stand-in [--port 8766] [--latency-ms 80]
+    python3 weather_bundle.py benchmark [--popups 400] [--clients 16] [--latency-ms 80]
+
+bundle:    one multi-location request (Open-Meteo accepts comma-separated
+           latitude/longitude lists) for the 20 stage start/end points (the
+           stages form a loop, so every end is the next stage's start), with
+           the same daily fields as the app's WeatherService. Written to
+           scripts/weather_bundle.json.
+proxy:     forwards GET /v1/forecast to the upstream API. Responses are cached
+           per normalized query for --ttl seconds (in memory, and in
+           --cache-dir if given); concurrent identical requests share a single
+           upstream call; when the upstream fails an expired entry is served
+           (as WeatherService does with its stale cache). GET /stats returns
+           the counters. The X-Cache header tells HIT, MISS, COALESCED or STALE.
+stand-in:  a local Open-Meteo replacement for tests: same URL, parameters and
+           response layout, deterministic synthetic forecasts, a fixed
+           --latency-ms per request and a request counter at /stats.
+benchmark: runs --popups forecast requests (a random stage point each) from
+           --clients threads against the stand-in, (1) directly, one request
+           per popup as the app does, (2) through the proxy, and (3) from one
+           prefetched bundle, and reports upstream requests and popup latency.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import trail_data
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+FORECAST_PATH = "/v1/forecast"
+# Same request as WeatherService.kt
+DAILY_FIELDS = "weather_code,temperature_2m_max,temperature_2m_min"
+TIMEZONE = "Europe/Madrid"
+FORECAST_DAYS = 6
+COORDINATE_DECIMALS = 4
+
+DEFAULT_TTL = 300           # seconds, WeatherService.CACHE_TTL
+DEFAULT_PROXY_PORT = 8765
+DEFAULT_STAND_IN_PORT = 8766
+DEFAULT_LATENCY_MS = 80
+UPSTREAM_TIMEOUT = 15
+# listen() backlog of the servers: socketserver's default of 5 makes bursts of more
+# concurrent clients wait for SYN retransmits (~1 s); keep it at least --clients
+LISTEN_BACKLOG = 128
+
+DEFAULT_OUTPUT = os.path.join(trail_data.SCRIPTS_DIR, "weather_bundle.json")
+
+
+# --- Locations and requests --------------------------------------------------
+
+def stage_endpoints(stages: list) -> list:
+    """The distinct stage start/end points: [{latitude, longitude, stageStarts, stageEnds}]."""
+    locations = {}
+
+    def add(coordinate, key, number):
+        lon, lat = round(coordinate[0], COORDINATE_DECIMALS), round(coordinate[1], COORDINATE_DECIMALS)
+        location = locations.setdefault((lat, lon), {"latitude": lat, "longitude": lon,
+                                                     "stageStarts": [], "stageEnds": []})
+        location[key].append(number)
+
+    for stage in stages:
+        add(stage["coordinates"][0], "stageStarts", stage["number"])
+        add(stage["coordinates"][-1], "stageEnds", stage["number"])
+    return list(locations.values())
+
+
+def forecast_query(locations: list, days: int = FORECAST_DAYS) -> dict:
+    """Query parameters of one (multi-location) forecast request."""
+    return {
+        "latitude": ",".join(str(location["latitude"]) for location in locations),
+        "longitude": ",".join(str(location["longitude"]) for location in locations),
+        "daily": DAILY_FIELDS,
+        "timezone": TIMEZONE,
+        "forecast_days": str(days),
+    }
+
+
+def normalize_query(query: str) -> str:
+    """Cache key of a query string: parameters sorted, so the order does not matter."""
+    return urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(query, keep_blank_values=True)))
+
+
+def http_get(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": "camidecavalls-data"})
+    with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+        return response.read()
+
+
+def fetch_bundle(upstream: str, locations: list, days: int = FORECAST_DAYS) -> dict:
+    """One batched request for every location; returns the bundle JSON object."""
+    url = f"{upstream}?{urllib.parse.urlencode(forecast_query(locations, days))}"
+    results = json.loads(http_get(url))
+    # A single location comes back as an object, several as a list in request order
+    if isinstance(results, dict):
+        results = [results]
+    if len(results) != len(locations):
+        raise ValueError(f"expected {len(locations)} forecasts, got {len(results)}")
+    return {
+        "source": upstream,
+        "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "timezone": TIMEZONE,
+        "locations": [{**location, "daily": result["daily"]} for location, result in zip(locations, results)],
+    }
+
+
+# --- Cache and coalescing ----------------------------------------------------
+
+class ResponseCache:
+    """Response bodies with an expiry time, in memory and optionally in a directory."""
+
+    def __init__(self, ttl: float, directory: str = None):
+        self.ttl = ttl
+        self.directory = directory
+        self.entries = {}
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+
+    def get(self, key: str, allow_expired: bool = False):
+        """The cached body, or None if missing (or expired, unless allow_expired)."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None and self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            entry = (stored["expires"], stored["body"].encode('utf-8'))
+            with self.lock:
+                self.entries[key] = entry
+        if entry is None or (entry[0] < time.time() and not allow_expired):
+            return None
+        return entry[1]
+
+    def put(self, key: str, body: bytes):
+        entry = (time.time() + self.ttl, body)
+        with self.lock:
+            self.entries[key] = entry
+        if self.directory:
+            trail_data.atomic_write(self._path(key), json.dumps({"key": key, "expires": entry[0],
+                                                                 "body": body.decode('utf-8')}))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """Runs one call per key at a time; concurrent callers with the same key wait for it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def run(self, key: str, call) -> tuple:
+        """Returns (result, shared): shared is True if another caller made the call."""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = call()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+# --- Servers -----------------------------------------------------------------
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ProxyServer(ThreadingHTTPServer):
+    """Caching, coalescing proxy in front of an Open-Meteo compatible API."""
+
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, port: int, upstream: str, ttl: float = DEFAULT_TTL, cache_dir: str = None):
+        super().__init__(("127.0.0.1", port), _ProxyHandler)
+        self.upstream = upstream
+        self.cache = ResponseCache(ttl, cache_dir)
+        self.coalescer = Coalescer()
+        self.stats = {"requests": 0, "hits": 0, "coalesced": 0, "upstream": 0, "stale": 0, "errors": 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, name: str):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def fetch(self, key: str) -> bytes:
+        self.count("upstream")
+        body = http_get(f"{self.upstream}?{key}")
+        self.cache.put(key, body)
+        return body
+
+
+class _ProxyHandler(_QuietHandler):
+    def do_GET(self):
+        server = self.server
+        path, _, query = self.path.partition("?")
+        if path == "/stats":
+            self.send_body(200, json.dumps(server.stats).encode('utf-8'))
+            return
+        if path != FORECAST_PATH:
+            self.send_body(404, b'{"error": true, "reason": "not found"}')
+            return
+
+        server.count("requests")
+        key = normalize_query(query)
+        body = server.cache.get(key)
+        if body is not None:
+            server.count("hits")
+            self.send_body(200, body, {"X-Cache": "HIT"})
+            return
+        try:
+            body, shared = server.coalescer.run(key, lambda: server.fetch(key))
+        except (urllib.error.URLError, OSError) as e:
+            stale = server.cache.get(key, allow_expired=True)
+            if stale is not None:
+                server.count("stale")
+                self.send_body(200, stale, {"X-Cache": "STALE"})
+            else:
+                server.count("errors")
+                self.send_body(502, json.dumps({"error": True, "reason": str(e)}).encode('utf-8'))
+            return
+        if shared:
+            server.count("coalesced")
+        self.send_body(200, body, {"X-Cache": "COALESCED" if shared else "MISS"})
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local Open-Meteo replacement with deterministic forecasts and a fixed latency."""
+
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, port: int, latency_ms: float = DEFAULT_LATENCY_MS):
+        super().__init__(("127.0.0.1", port), _StandInHandler)
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.locations = 0
+        self.lock = threading.Lock()
+
+
+def synthetic_forecast(latitude: float, longitude: float, days: int) -> dict:
+    """A forecast in the Open-Meteo layout; the same place and day always get the same weather."""
+    start = date.today()
+    daily = {"time": [], "weather_code": [], "temperature_2m_max": [], "temperature_2m_min": []}
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        seed = hashlib.sha1(f"{latitude:.4f},{longitude:.4f},{day}".encode('utf-8')).digest()
+        low = 8 + seed[1] % 12 + seed[2] / 255
+        daily["time"].append(day)
+        daily["weather_code"].append((0, 1, 2, 3, 45, 61, 80, 95)[seed[0] % 8])
+        daily["temperature_2m_max"].append(round(low + 4 + seed[3] % 8, 1))
+        daily["temperature_2m_min"].append(round(low, 1))
+    return {
+        "latitude": latitude, "longitude": longitude, "timezone": TIMEZONE,
+        "daily_units": {"time": "iso8601", "weather_code": "wmo code",
+                        "temperature_2m_max": "°C", "temperature_2m_min": "°C"},
+        "daily": daily,
+    }
+
+
+class _StandInHandler(_QuietHandler):
+    def do_GET(self):
+        server = self.server
+        path, _, query = self.path.partition("?")
+        if path == "/stats":
+            self.send_body(200, json.dumps({"requests": server.requests, "locations": server.locations}).encode('utf-8'))
+            return
+        if path != FORECAST_PATH:
+            self.send_body(404, b'{"error": true, "reason": "not found"}')
+            return
+
+        params = dict(urllib.parse.parse_qsl(query))
+        try:
+            latitudes = [float(v) for v in params["latitude"].split(",")]
+            longitudes = [float(v) for v in params["longitude"].split(",")]
+            days = int(params.get("forecast_days", 7))
+            if len(latitudes) != len(longitudes):
+                raise ValueError("latitude and longitude must have the same number of elements")
+        except (KeyError, ValueError) as e:
+            self.send_body(400, json.dumps({"error": True, "reason": str(e)}).encode('utf-8'))
+            return
+
+        with server.lock:
+            server.requests += 1
+            server.locations += len(latitudes)
+        time.sleep(server.latency)
+        results = [synthetic_forecast(lat, lon, days) for lat, lon in zip(latitudes, longitudes)]
+        self.send_body(200, json.dumps(results[0] if len(results) == 1 else results).encode('utf-8'))
+
+
+def start_server(server: ThreadingHTTPServer) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+def run_popups(fetch_one, locations: list, popups: int, clients: int, seed: int = 1) -> list:
+    """Latencies (s) of `popups` forecast lookups for random locations from `clients` threads."""
+    from concurrent.futures import ThreadPoolExecutor
+    rng = random.Random(seed)
+    picks = [rng.choice(locations) for _ in range(popups)]
+
+    def timed(location):
+        start = time.perf_counter()
+        fetch_one(location)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(clients) as pool:
+        return list(pool.map(timed, picks))
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def benchmark(popups: int, clients: int, latency_ms: float):
+    locations = stage_endpoints(trail_data.load_stages())
+    stand_in = StandInServer(0, latency_ms)
+    start_server(stand_in)
+    upstream = f"http://127.0.0.1:{stand_in.server_port}{FORECAST_PATH}"
+
+    def single_url(base, location):
+        return f"{base}?{urllib.parse.urlencode(forecast_query([location]))}"
+
+    results = []
+
+    # 1. One upstream request per popup (the app today)
+    before = stand_in.requests
+    latencies = run_popups(lambda loc: http_get(single_url(upstream, loc)), locations, popups, clients)
+    results.append(("per-popup requests", stand_in.requests - before, latencies))
+
+    # 2. Through the caching, coalescing proxy
+    proxy = ProxyServer(0, upstream)
+    start_server(proxy)
+    proxy_url = f"http://127.0.0.1:{proxy.server_port}{FORECAST_PATH}"
+    before = stand_in.requests
+    latencies = run_popups(lambda loc: http_get(single_url(proxy_url, loc)), locations, popups, clients)
+    results.append(("proxy (cache + coalescing)", stand_in.requests - before, latencies))
+    proxy_stats = dict(proxy.stats)
+    proxy.shutdown()
+
+    # 3. One batched request, popups read the bundle
+    before = stand_in.requests
+    start = time.perf_counter()
+    bundle = fetch_bundle(upstream, locations)
+    bundle_seconds = time.perf_counter() - start
+    by_point = {(loc["latitude"], loc["longitude"]): loc["daily"] for loc in bundle["locations"]}
+    latencies = run_popups(lambda loc: by_point[(loc["latitude"], loc["longitude"])], locations, popups, clients)
+    results.append(("prefetched bundle", stand_in.requests - before, latencies))
+    stand_in.shutdown()
+
+    print(f"{popups} popups over {len(locations)} stage points, {clients} clients, "
+          f"stand-in latency {latency_ms:.0f} ms")
+    print(f"\n{'mode':<28}{'upstream':>9}{'mean ms':>9}{'p95 ms':>9}")
+    for name, upstream_requests, latencies in results:
+        print(f"{name:<28}{upstream_requests:>9}{sum(latencies) / len(latencies) * 1000:>9.1f}"
+              f"{percentile(latencies, 0.95) * 1000:>9.1f}")
+    print(f"\nProxy: {proxy_stats['hits']} cache hits, {proxy_stats['coalesced']} coalesced, "
+          f"{proxy_stats['upstream']} upstream calls")
+    print(f"Bundle: {len(locations)} locations in one request, {bundle_seconds * 1000:.0f} ms")
+
+
+def serve(server: ThreadingHTTPServer, description: str):
+    print(f"{description} on http://127.0.0.1:{server.server_port}{FORECAST_PATH} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched forecasts, caching proxy and Open-Meteo stand-in")
+    parser.add_argument("command", choices=["bundle", "proxy", "stand-in", "benchmark"])
+    parser.add_argument("--upstream", default=OPEN_METEO_URL, help="forecast API URL (default: %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--days", type=int, default=FORECAST_DAYS)
+    parser.add_argument("--port", type=int, help=f"listen port (proxy: {DEFAULT_PROXY_PORT}, "
+                                                 f"stand-in: {DEFAULT_STAND_IN_PORT})")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="proxy cache TTL in seconds")
+    parser.add_argument("--cache-dir", help="persist the proxy cache in this directory")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="stand-in latency")
+    parser.add_argument("--popups", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.command == "bundle":
+        locations = stage_endpoints(trail_data.load_stages())
+        print(f"Fetching {args.days}-day forecasts for {len(locations)} stage points from {args.upstream}...")
+        try:
+            bundle = fetch_bundle(args.upstream, locations, args.days)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        trail_data.atomic_write(args.output, json.dumps(bundle, ensure_ascii=False, indent=2))
+        print(f"Saved to {args.output}")
+    elif args.command == "proxy":
+        serve(ProxyServer(args.port or DEFAULT_PROXY_PORT, args.upstream, args.ttl, args.cache_dir),
+              f"Proxy to {args.upstream} (TTL {args.ttl:.0f}s)")
+    elif args.command == "stand-in":
+        serve(StandInServer(args.port or DEFAULT_STAND_IN_PORT, args.latency_ms),
+              f"Open-Meteo stand-in ({args.latency_ms:.0f} ms latency)")
+    else:
+        benchmark(args.popups, args.clients, args.latency_ms)
+
+
+if __name__ == "__main__":
+    main()
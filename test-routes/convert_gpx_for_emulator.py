@@ -8,16 +8,23 @@ This script converts <rte>/<rtept> format to <trk>/<trkpt> with proper timestamp
 
 import os
 import re
+import sys
 from datetime import datetime, timedelta
 
+TEST_ROUTES_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_ROUTES_DIR, "..", "scripts"))
+from profiling import span, profiled_main
+from trail_data import atomic_write
+
 # Configuration
-INPUT_DIR = "android"
-OUTPUT_DIR = "android/emulator"
+INPUT_DIR = os.path.join(TEST_ROUTES_DIR, "android")
+OUTPUT_DIR = os.path.join(TEST_ROUTES_DIR, "android/emulator")
 START_TIME = datetime(2025, 1, 1, 10, 0, 0)  # Start at 10:00:00
 INTERVAL_SECONDS = 3  # Time between each point (simulates ~walking speed)
 
+@span("convert")
 def convert_gpx(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with span("read"), open(input_file, 'r', encoding='utf-8') as f:
         content = f.read()
 
     # Extract route name
@@ -59,8 +66,8 @@ def convert_gpx(input_file, output_file):
 </gpx>
 '''
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(output)
+    with span("write"):
+        atomic_write(output_file, output)
 
     total_duration = (len(points) - 1) * INTERVAL_SECONDS
     minutes = total_duration // 60
@@ -87,4 +94,4 @@ def convert_all():
     print(f"\nConverted {converted} files to {OUTPUT_DIR}/")
 
 if __name__ == "__main__":
-    convert_all()
+    profiled_main(convert_all)
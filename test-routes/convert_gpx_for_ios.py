@@ -10,16 +10,23 @@ Xcode requires:
 
 import os
 import re
+import sys
 from datetime import datetime, timedelta
 
+TEST_ROUTES_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_ROUTES_DIR, "..", "scripts"))
+from profiling import span, profiled_main
+from trail_data import atomic_write
+
 # Configuration
-INPUT_DIR = "ios"
-OUTPUT_DIR = "ios/simulator"
+INPUT_DIR = os.path.join(TEST_ROUTES_DIR, "ios")
+OUTPUT_DIR = os.path.join(TEST_ROUTES_DIR, "ios/simulator")
 START_TIME = datetime(2025, 1, 1, 10, 0, 0)
 INTERVAL_SECONDS = 3  # Time between each waypoint (simulates walking speed)
 
+@span("convert")
 def convert_gpx_for_ios(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with span("read"), open(input_file, 'r', encoding='utf-8') as f:
         content = f.read()
 
     # Extract route name
@@ -64,8 +71,8 @@ def convert_gpx_for_ios(input_file, output_file):
 
     output += '</gpx>\n'
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(output)
+    with span("write"):
+        atomic_write(output_file, output)
 
     total_duration = (len(points) - 1) * INTERVAL_SECONDS
     minutes = total_duration // 60
@@ -104,11 +111,13 @@ def convert_all():
 
     print(f"\nConverted {converted} files to {OUTPUT_DIR}/")
 
-if __name__ == "__main__":
-    import sys
+def main():
     if len(sys.argv) > 1:
         # Convert single route if number provided
         convert_single(sys.argv[1])
     else:
         # Convert all routes
         convert_all()
+
+if __name__ == "__main__":
+    profiled_main(main)